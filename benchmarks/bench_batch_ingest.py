@@ -0,0 +1,97 @@
+"""
+Throughput of batch ingestion by number of parse workers.
+
+Generates `--files` distinct PDFs of `--pages` pages and ingests them with
+`ingest_workflow.run_batch_ingest_workflow` into a fresh on-disk SQLite
+database, once parsing in the calling thread and once per process pool size
+in `--workers`. Parsing dominates, so files/s should grow close to linearly
+with the workers up to the number of cores.
+
+Everything runs offline; the local hashing embedder is used.
+
+Usage:
+    python -m benchmarks.bench_batch_ingest --files 200 --pages 20 --workers 1 2 4 8
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from benchmarks.bench_hot_paths import make_pdf  # noqa: E402
+from src.academic_agent.database.database import build_engine  # noqa: E402
+from src.academic_agent.database.models import Base  # noqa: E402
+from src.academic_agent.llm.embeddings import HashingEmbedder  # noqa: E402
+from src.academic_agent.workflows.ingest_workflow import BatchFile, run_batch_ingest_workflow  # noqa: E402
+
+
+def make_files(count: int, pages: int, tmp_dir: str) -> list[BatchFile]:
+    """Builds `count` PDFs that differ in their first byte of text, so none is deduplicated."""
+    path = os.path.join(tmp_dir, "base.pdf")
+    make_pdf(path, pages)
+    import fitz
+
+    files = []
+    for i in range(count):
+        with fitz.open(path) as doc:
+            doc[0].insert_text((50, 40), f"Tese {i}")
+            data = doc.tobytes()
+        files.append(BatchFile(f"tese-{i}.pdf", data, hashlib.sha256(data).hexdigest()))
+    return files
+
+
+def run_once(files: list[BatchFile], workers: int, tmp_dir: str) -> float:
+    """Ingests the batch into a new database and returns the elapsed seconds."""
+    engine = build_engine(f"sqlite:///{os.path.join(tmp_dir, f'batch-{workers}.db')}")
+    Base.metadata.create_all(bind=engine)
+    try:
+        with sessionmaker(bind=engine)() as db:
+            if workers == 0:
+                start = time.perf_counter()
+                results = run_batch_ingest_workflow(db, files, embedder=HashingEmbedder())
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    # Start the workers before the clock does
+                    list(executor.map(abs, range(workers)))
+                    start = time.perf_counter()
+                    results = run_batch_ingest_workflow(db, files, embedder=HashingEmbedder(), executor=executor)
+            elapsed = time.perf_counter() - start
+        failed = [r for r in results if r.status != "created"]
+        if failed:
+            raise RuntimeError(f"{len(failed)} files were not created: {failed[0]}")
+        return elapsed
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"Generating {args.files} PDFs of {args.pages} pages...", flush=True)
+        files = make_files(args.files, args.pages, tmp_dir)
+
+        print(f"\n{'workers':>8} {'seconds':>9} {'files/s':>9} {'speedup':>8}")
+        baseline = None
+        for workers in [0, *sorted(set(args.workers))]:
+            elapsed = run_once(files, workers, tmp_dir)
+            baseline = baseline or elapsed
+            label = "thread" if workers == 0 else str(workers)
+            print(f"{label:>8} {elapsed:>9.2f} {args.files / elapsed:>9.1f} {baseline / elapsed:>7.2f}x", flush=True)
+    print(f"\n{os.cpu_count()} cores available.")
+
+
+if __name__ == "__main__":
+    main()
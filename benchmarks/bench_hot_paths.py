@@ -0,0 +1,246 @@
+"""
+Micro-benchmarks of the ingestion hot paths.
+
+Generates PDF and DOCX fixtures of a given number of pages and measures each
+stage of ingestion on them separately:
+
+    parse    `iter_text_segments` (what `read_text_from_file` joins)  pages/s
+    chunk    `extract_chunks` on the already parsed pages            chunks/s
+    embed    the local hashing embedder on the chunks                 chunks/s
+    persist  `crud.create_document_with_chunks` on on-disk SQLite     rows/s
+    ingest   `ingest_workflow.run_ingest_workflow`, end to end        pages/s
+
+Each stage is timed `--repeat` times (the median is reported) and then run
+once more under tracemalloc for its peak Python memory; allocations made
+inside PyMuPDF's C code are not visible to tracemalloc.
+
+Results are printed as a table and, with `--output`, written as JSON together
+with the interpreter, platform, git commit and tokenizer used. Pass a
+previous JSON file to `--compare` to print the speedup of every measurement.
+
+Everything runs offline; no API is called.
+
+Usage:
+    python -m benchmarks.bench_hot_paths --pages 10 100 500 2000 --output results.json
+    python -m benchmarks.bench_hot_paths --pages 100 --stages parse chunk --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.academic_agent.database import crud  # noqa: E402
+from src.academic_agent.database.database import build_engine  # noqa: E402
+from src.academic_agent.database.models import Base  # noqa: E402
+from src.academic_agent.llm.embeddings import HashingEmbedder  # noqa: E402
+from src.academic_agent.search.vector_index import pack_vector  # noqa: E402
+from src.academic_agent.utils.chunking import _get_encoding, extract_chunks  # noqa: E402
+from src.academic_agent.utils.file_parser import iter_text_segments  # noqa: E402
+from src.academic_agent.validation import schemas  # noqa: E402
+from src.academic_agent.workflows import ingest_workflow  # noqa: E402
+
+STAGES = ("parse", "chunk", "embed", "persist", "ingest")
+FORMATS = ("pdf", "docx")
+
+SENTENCE = "A metodologia adotada combina revisão bibliográfica e análise empírica dos dados coletados. "
+PARAGRAPHS_PER_PAGE = 5
+SENTENCES_PER_PARAGRAPH = 5
+
+
+def _page_paragraphs(page: int) -> list[str]:
+    paragraphs = [f"{page}. Seção {page}"]
+    paragraphs += [f"{page}.{p} " + SENTENCE * SENTENCES_PER_PARAGRAPH for p in range(PARAGRAPHS_PER_PAGE)]
+    return paragraphs
+
+
+def make_pdf(path: str, pages: int) -> None:
+    import fitz
+
+    with fitz.open() as doc:
+        for page_number in range(1, pages + 1):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 545, 792), "\n\n".join(_page_paragraphs(page_number)), fontsize=9)
+        doc.save(path)
+
+
+def make_docx(path: str, pages: int) -> None:
+    import docx
+    from docx.enum.text import WD_BREAK
+
+    document = docx.Document()
+    for page_number in range(1, pages + 1):
+        paragraphs = _page_paragraphs(page_number)
+        for text in paragraphs[:-1]:
+            document.add_paragraph(text)
+        last = document.add_paragraph(paragraphs[-1])
+        if page_number < pages:
+            last.add_run().add_break(WD_BREAK.PAGE)
+    document.save(path)
+
+
+def fixture_path(fixtures_dir: str, file_format: str, pages: int) -> str:
+    """Returns the fixture of the given format and size, generating it if missing."""
+    path = os.path.join(fixtures_dir, f"bench-{pages}p.{file_format}")
+    if not os.path.exists(path):
+        (make_pdf if file_format == "pdf" else make_docx)(path, pages)
+    return path
+
+
+def measure(fn: Callable[[], object], repeat: int) -> tuple[float, int]:
+    """Returns the median wall time of `fn` and its peak traced memory in bytes."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def run_format(file_format: str, pages: int, fixtures_dir: str, db_dir: str, stages: list[str], repeat: int) -> list[dict]:
+    path = fixture_path(fixtures_dir, file_format, pages)
+    segments = list(iter_text_segments(path))
+    _, chunks = extract_chunks(segments)
+    embedder = HashingEmbedder()
+    vectors = embedder.embed([chunk.text for chunk in chunks])
+    chunks_in = [
+        schemas.TextChunkCreate(content=chunk.text, token_count=chunk.token_count, embedding=pack_vector(vectors[i]))
+        for i, chunk in enumerate(chunks)
+    ]
+
+    engine = build_engine(f"sqlite:///{os.path.join(db_dir, f'{file_format}-{pages}.db')}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def persist():
+        with session_factory() as db:
+            crud.create_document_with_chunks(db, schemas.DocumentCreate(title="bench", content="..."), chunks_in)
+
+    def ingest():
+        with session_factory() as db:
+            ingest_workflow.run_ingest_workflow(db, path, title="bench", embedder=embedder)
+
+    # stage -> (function, unit, units processed per call)
+    plan: dict[str, tuple[Callable[[], object], str, int]] = {
+        "parse": (lambda: list(iter_text_segments(path)), "pages", pages),
+        "chunk": (lambda: extract_chunks(segments), "chunks", len(chunks)),
+        "embed": (lambda: embedder.embed([chunk.text for chunk in chunks]), "chunks", len(chunks)),
+        "persist": (persist, "rows", len(chunks_in) + 1),
+        "ingest": (ingest, "pages", pages),
+    }
+
+    results = []
+    try:
+        for stage in stages:
+            fn, unit, count = plan[stage]
+            seconds, peak = measure(fn, repeat)
+            results.append({
+                "stage": stage,
+                "format": file_format,
+                "pages": pages,
+                "unit": unit,
+                "count": count,
+                "seconds": seconds,
+                "throughput": count / seconds if seconds else None,
+                "peak_memory_kib": peak / 1024,
+            })
+    finally:
+        engine.dispose()
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(result: dict) -> tuple:
+    return result["stage"], result["format"], result["pages"]
+
+
+def print_results(results: list[dict], baseline: Optional[list[dict]] = None) -> None:
+    previous = {_key(result): result for result in baseline or []}
+    header = f"{'stage':<8} {'format':<6} {'pages':>6} {'count':>7} {'median (s)':>11} {'throughput':>18} {'peak (KiB)':>11}"
+    if baseline is not None:
+        header += f" {'vs base':>8}"
+    print(header)
+    for result in results:
+        line = (
+            f"{result['stage']:<8} {result['format']:<6} {result['pages']:>6} {result['count']:>7} "
+            f"{result['seconds']:>11.4f} {result['throughput']:>11.0f} {result['unit'] + '/s':<6} "
+            f"{result['peak_memory_kib']:>11.0f}"
+        )
+        if baseline is not None:
+            before = previous.get(_key(result))
+            line += f" {before['seconds'] / result['seconds']:>7.2f}x" if before else f" {'-':>8}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixtures-dir", help="reuse generated fixtures across runs (default: a temporary directory)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fixtures_dir = args.fixtures_dir or tmp_dir
+        os.makedirs(fixtures_dir, exist_ok=True)
+        for pages in args.pages:
+            for file_format in args.formats:
+                results += run_format(file_format, pages, fixtures_dir, tmp_dir, args.stages, args.repeat)
+
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "benchmark": "hot_paths",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "tokenizer": "tiktoken" if _get_encoding() is not None else "chars/4",
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cold-start benchmark: how long importing the API takes.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters, reports
+the median total import time and the slowest top-level packages, and checks
+that the heavy optional backends (the OpenAI SDK, PyMuPDF, python-docx) are
+not imported at all. Exits with status 1 when the median exceeds the budget
+or a lazy backend got imported, so it can gate CI.
+
+Importing must not touch the database either; the script points DATABASE_URL
+at a temporary file and fails if the file gets created.
+
+Usage:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --budget-ms 1500 --runs 5
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (app startup or the first parsed file), never at import.
+LAZY_MODULES = ("openai", "fitz", "docx")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure(env: dict) -> dict[str, int]:
+    """Imports the app once and returns the cumulative microseconds of each module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=os.path.join(ROOT, "src"),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(2)), len(match.group(3)))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", 2000)))
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to show")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "import.db")
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "OPENAI_API_KEY": "fake"}
+        runs = [measure(env) for _ in range(args.runs)]
+        if os.path.exists(db_path):
+            failures.append("importing the app created the database file")
+
+    totals = [run["main"][0] / 1000 for run in runs]
+    median = statistics.median(totals)
+    print(f"import main: median {median:.0f} ms over {args.runs} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+
+    # Direct children of `main` (one level of indentation) in the last run
+    top_level = sorted(
+        ((name, cumulative) for name, (cumulative, depth) in runs[-1].items() if depth == 3),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    print(f"\n{'module':<40} {'cumulative (ms)':>16}")
+    for name, cumulative in top_level[:args.top]:
+        print(f"{name:<40} {cumulative / 1000:>16.1f}")
+
+    imported = [name for name in LAZY_MODULES if name in runs[-1]]
+    if imported:
+        failures.append(f"lazy modules imported eagerly: {', '.join(imported)}")
+    if median > args.budget_ms:
+        failures.append(f"median import time {median:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+An offline OpenAI-compatible server for load tests.
+
+It serves the three endpoints the API uses:
+
+    POST /v1/chat/completions   canned completion, or SSE chunks with "stream": true
+    POST /v1/embeddings         deterministic vectors (float or base64 encoding)
+    GET  /stats                 request, error and rate-limit counters
+
+Every request waits for a latency drawn from a configurable distribution
+(the time to first token, for streams). Streams then emit one word per
+`1 / token_rate` seconds. A fraction of requests can be answered with a 500
+error, and a fraction (or every request above `max_concurrent` in flight)
+with a 429 carrying a Retry-After header, as the real API does when a rate
+limit is hit.
+
+Point the API at it with OPENAI_BASE_URL=http://127.0.0.1:8001/v1.
+
+Usage:
+    python -m benchmarks.fake_llm_server --port 8001 --latency 0.5
+    python -m benchmarks.fake_llm_server --latency 0.8 --latency-dist lognormal --jitter 0.5 \\
+        --token-rate 50 --error-rate 0.01 --rate-limit-rate 0.02 --max-concurrent 64
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import struct
+import time
+import uuid
+from typing import Callable, Optional
+
+from aiohttp import web
+
+DEFAULT_COMPLETION = "Resumo gerado pelo servidor de testes."
+DEFAULT_EMBEDDING_DIMENSIONS = 1536
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+def make_latency_sampler(
+    mean: float, distribution: str = "fixed", jitter: float = 0.0, rng: Optional[random.Random] = None
+) -> Callable[[], float]:
+    """
+    Returns a function drawing request latencies in seconds.
+
+    Args:
+        mean (float): The mean latency.
+        distribution (str): "fixed", "uniform" (mean ± jitter * mean),
+            "exponential" or "lognormal" (with `jitter` as the sigma of the
+            underlying normal, giving the long tail of real API latencies).
+        jitter (float): The spread of the distribution, see above.
+        rng (Optional[random.Random]): Source of randomness, for reproducible runs.
+    """
+    rng = rng or random.Random()
+    if distribution == "fixed" or mean <= 0:
+        return lambda: max(mean, 0.0)
+    if distribution == "uniform":
+        return lambda: rng.uniform(mean * (1 - jitter), mean * (1 + jitter))
+    if distribution == "exponential":
+        return lambda: rng.expovariate(1 / mean)
+    if distribution == "lognormal":
+        # Choose mu so the distribution's mean is `mean`.
+        mu = math.log(mean) - jitter ** 2 / 2
+        return lambda: rng.lognormvariate(mu, jitter)
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+
+def _count_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _fake_embedding(text: str, dimensions: int) -> list[float]:
+    """A deterministic unit vector derived from the text's hash."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = sum(x * x for x in vector) ** 0.5 or 1.0
+    return [x / norm for x in vector]
+
+
+def _error(status: int, message: str, error_type: str, headers: Optional[dict] = None) -> web.Response:
+    return web.json_response(
+        {"error": {"message": message, "type": error_type, "param": None, "code": None}},
+        status=status,
+        headers=headers,
+    )
+
+
+def create_app(
+    latency: float = 0.5,
+    completion: str = DEFAULT_COMPLETION,
+    latency_dist: str = "fixed",
+    jitter: float = 0.0,
+    token_rate: float = 0.0,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    max_concurrent: int = 0,
+    retry_after: float = 1.0,
+    seed: Optional[int] = None,
+) -> web.Application:
+    """
+    Creates the aiohttp application serving fake OpenAI endpoints.
+
+    Args:
+        latency (float): Mean seconds to wait before answering (or before the first streamed token).
+        completion (str): The text returned as the assistant message.
+        latency_dist (str): The latency distribution, see `make_latency_sampler`.
+        jitter (float): The spread of the latency distribution.
+        token_rate (float): Streamed words per second; 0 sends them all at once.
+        error_rate (float): Fraction of requests answered with a 500 error.
+        rate_limit_rate (float): Fraction of requests answered with a 429.
+        max_concurrent (int): Requests in flight above this get a 429; 0 disables the limit.
+        retry_after (float): Seconds advertised in the Retry-After header of 429s.
+        seed (Optional[int]): Seed for latencies and injected failures.
+
+    Returns:
+        web.Application: The configured application.
+    """
+    rng = random.Random(seed)
+    sample_latency = make_latency_sampler(latency, latency_dist, jitter, rng)
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "errors": 0, "rate_limited": 0, "streams": 0}
+
+    def admit() -> Optional[web.Response]:
+        """Counts the request and returns the injected failure for it, if any."""
+        stats["requests"] += 1
+        if (max_concurrent and stats["in_flight"] >= max_concurrent) or rng.random() < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return _error(
+                429, "Rate limit reached (fake server).", "rate_limit_error",
+                headers={"Retry-After": f"{retry_after:g}", "retry-after-ms": str(int(retry_after * 1000))},
+            )
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return _error(500, "Injected server error (fake server).", "server_error")
+        return None
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        rejection = admit()
+        if rejection is not None:
+            return rejection
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(sample_latency())
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+            model = body.get("model", "fake-model")
+            prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) for m in body.get("messages", []))
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": _count_tokens(completion),
+                "total_tokens": prompt_tokens + _count_tokens(completion),
+            }
+
+            if not body.get("stream"):
+                if token_rate:
+                    await asyncio.sleep(len(completion.split()) / token_rate)
+                return web.json_response({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": completion},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                })
+
+            stats["streams"] += 1
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+            await response.prepare(request)
+
+            async def send(delta: dict, finish_reason: Optional[str] = None, extra: Optional[dict] = None) -> None:
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    **(extra or {}),
+                }
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+            words = completion.split(" ")
+            for i, word in enumerate(words):
+                if i and token_rate:
+                    await asyncio.sleep(1 / token_rate)
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                await send(delta)
+            await send({}, finish_reason="stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                await send({}, extra={"choices": [], "usage": usage})
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            stats["in_flight"] -= 1
+
+    async def embeddings(request: web.Request) -> web.Response:
+        body = await request.json()
+        rejection = admit()
+        if rejection is not None:
+            return rejection
+
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dimensions = int(body.get("dimensions") or DEFAULT_EMBEDDING_DIMENSIONS)
+        as_base64 = body.get("encoding_format") == "base64"
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(sample_latency())
+            data = []
+            for i, text in enumerate(inputs):
+                vector = _fake_embedding(str(text), dimensions)
+                if as_base64:
+                    embedding = base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode("ascii")
+                else:
+                    embedding = vector
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            tokens = sum(_count_tokens(str(text)) for text in inputs)
+            return web.json_response({
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "fake-embedding-model"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        finally:
+            stats["in_flight"] -= 1
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/v1/embeddings", embeddings)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+async def start_server(host: str = "127.0.0.1", port: int = 0, **app_kwargs) -> tuple[web.AppRunner, str]:
+    """
+    Starts the fake server on the running event loop.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free port.
+        **app_kwargs: Forwarded to `create_app`.
+
+    Returns:
+        tuple[web.AppRunner, str]: The runner (call `cleanup()` to stop it) and
+                                   the OpenAI-style base URL (`http://host:port/v1`).
+    """
+    runner = web.AppRunner(create_app(**app_kwargs))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean latency in seconds")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--jitter", type=float, default=0.0, help="spread of the latency distribution")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="streamed words per second (0: no delay)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="429 above this many requests in flight")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--completion", default=DEFAULT_COMPLETION)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    app = create_app(
+        latency=args.latency,
+        completion=args.completion,
+        latency_dist=args.latency_dist,
+        jitter=args.jitter,
+        token_rate=args.token_rate,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_concurrent=args.max_concurrent,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+End-to-end load harness for the API.
+
+Drives `/documents/`, `/summarize/` and `/format-abnt/` at fixed request
+rates and reports, for each endpoint and rate, the achieved throughput, the
+p50/p95/p99 latency of successful requests and the responses by status.
+
+By default everything runs locally and offline: the harness starts the fake
+OpenAI server (`benchmarks.fake_llm_server`) and the API under uvicorn in
+subprocesses, with a temporary SQLite database, the LLM response cache off
+(so every request reaches the "LLM") and OPENAI_BASE_URL pointing at the
+fake server. Use `--api-url` to load an API that is already running instead.
+
+The load is open-loop: request i is sent at `i / rps` seconds whether or not
+earlier requests have finished, and its latency is measured from that
+scheduled time. A server that falls behind therefore shows up as growing
+latencies instead of silently lowering the offered rate.
+
+Usage:
+    python -m benchmarks.load_harness --rps 5 10 20 --duration 10
+    python -m benchmarks.load_harness --endpoints summarize --rps 50 100 --workers 4 \\
+        --llm-args="--latency 0.8 --latency-dist lognormal --jitter 0.5 --rate-limit-rate 0.02"
+    python -m benchmarks.load_harness --api-url http://localhost:8000 --rps 10 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = ("documents", "summarize", "format-abnt")
+
+PARAGRAPH = "A metodologia adotada combina revisão bibliográfica e análise empírica dos dados coletados. " * 6
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_pdf(pages: int, tag: str) -> bytes:
+    """Builds a small PDF whose text includes `tag`, so each upload has a distinct hash."""
+    import fitz
+
+    with fitz.open() as doc:
+        for page_number in range(1, pages + 1):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 545, 792), f"{tag} - página {page_number}\n\n{PARAGRAPH}", fontsize=10)
+        return doc.tobytes()
+
+
+def percentile(values: list[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of `values` (0 < p <= 100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def _wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while True:
+            try:
+                if (await http.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:g}s")
+            await asyncio.sleep(0.2)
+
+
+def _start_process(args: list[str], env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w", encoding="utf-8")
+    return subprocess.Popen(args, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _stop_process(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def run_level(
+    send: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+    http: httpx.AsyncClient,
+    rps: float,
+    duration: float,
+) -> dict:
+    """Sends `rps * duration` requests on an open-loop schedule and summarizes the outcome."""
+    total = max(1, int(rps * duration))
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    start = time.perf_counter()
+    finished_at = start
+
+    async def fire(i: int) -> None:
+        nonlocal finished_at
+        scheduled = start + i / rps
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        try:
+            response = await send(http, i)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        now = time.perf_counter()
+        finished_at = max(finished_at, now)
+        statuses[status] += 1
+        if status.startswith("2"):
+            latencies.append(now - scheduled)
+
+    await asyncio.gather(*(fire(i) for i in range(total)))
+    elapsed = finished_at - start
+    return {
+        "target_rps": rps,
+        "sent": total,
+        "ok": len(latencies),
+        "throughput_rps": len(latencies) / elapsed if elapsed else None,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "statuses": dict(statuses),
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return seconds * 1000 if seconds is not None else None
+
+
+def build_senders(document_id: int, uploads: list[bytes], abnt_file: bytes) -> dict:
+    """Returns the request function of each endpoint."""
+
+    async def documents(http: httpx.AsyncClient, i: int) -> httpx.Response:
+        content = uploads[i % len(uploads)]
+        return await http.post("/documents/", files={"file": (f"load-{i}.pdf", content, "application/pdf")})
+
+    async def summarize(http: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await http.post("/summarize/", json={"document_id": document_id})
+
+    async def format_abnt(http: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await http.post("/format-abnt/", files={"file": ("abnt.pdf", abnt_file, "application/pdf")})
+
+    return {"documents": documents, "summarize": summarize, "format-abnt": format_abnt}
+
+
+def _fmt(value: Optional[float], spec: str) -> str:
+    return format(value, spec) if value is not None else "-"
+
+
+def print_results(results: list[dict]) -> None:
+    print(f"\n{'endpoint':<12} {'rps':>6} {'sent':>6} {'ok/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}  statuses")
+    for result in results:
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(result["statuses"].items()))
+        print(
+            f"{result['endpoint']:<12} {result['target_rps']:>6g} {result['sent']:>6} "
+            f"{_fmt(result['throughput_rps'], '.1f'):>8} {_fmt(result['p50_ms'], '.0f'):>9} "
+            f"{_fmt(result['p95_ms'], '.0f'):>9} {_fmt(result['p99_ms'], '.0f'):>9}  {statuses}"
+        )
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    processes = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            api_url = args.api_url
+            if not api_url:
+                llm_port, api_port = _free_port(), _free_port()
+                llm_url = f"http://127.0.0.1:{llm_port}"
+                processes.append(_start_process(
+                    [sys.executable, "-m", "benchmarks.fake_llm_server", "--port", str(llm_port), *shlex.split(args.llm_args)],
+                    dict(os.environ), os.path.join(tmp_dir, "llm.log"),
+                ))
+                await _wait_until_ready(f"{llm_url}/stats")
+
+                env = {
+                    **os.environ,
+                    "DATABASE_URL": f"sqlite:///{os.path.join(tmp_dir, 'load.db')}",
+                    "OPENAI_BASE_URL": f"{llm_url}/v1",
+                    "OPENAI_API_KEY": "fake",
+                    "LLM_CACHE_ENABLED": "false",
+                    "EMBEDDING_BACKEND": args.embedding_backend,
+                }
+                api_url = f"http://127.0.0.1:{api_port}"
+                processes.append(_start_process(
+                    [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", "src", "--port", str(api_port),
+                     "--workers", str(args.workers), "--log-level", "warning"],
+                    env, os.path.join(tmp_dir, "api.log"),
+                ))
+                await _wait_until_ready(f"{api_url}/documents/?limit=1", timeout=60)
+
+            # Distinct uploads, built before the clock starts so they don't skew the timings
+            most_documents = int(max(args.rps) * args.duration) if "documents" in args.endpoints else 0
+            run_id = os.urandom(4).hex()
+            uploads = [make_pdf(args.pages, f"{run_id}-{i}") for i in range(min(most_documents, args.max_uploads))]
+            abnt_file = make_pdf(args.pages, f"{run_id}-abnt")
+
+            limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+            async with httpx.AsyncClient(base_url=api_url, timeout=args.timeout, limits=limits) as http:
+                seed = await http.post("/documents/", files={"file": ("seed.pdf", make_pdf(args.pages, f"{run_id}-seed"), "application/pdf")})
+                seed.raise_for_status()
+                senders = build_senders(seed.json()["id"], uploads, abnt_file)
+
+                results = []
+                for endpoint in args.endpoints:
+                    for rps in args.rps:
+                        print(f"{endpoint} at {rps:g} req/s for {args.duration:g}s...", flush=True)
+                        result = await run_level(senders[endpoint], http, rps, args.duration)
+                        results.append({"endpoint": endpoint, **result})
+            return results
+        finally:
+            for process in reversed(processes):
+                _stop_process(process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--rps", type=float, nargs="+", default=[5.0, 10.0, 20.0], help="target request rates")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per endpoint and rate")
+    parser.add_argument("--pages", type=int, default=3, help="pages of each uploaded PDF")
+    parser.add_argument("--max-uploads", type=int, default=2000, help="distinct PDFs to upload; reused beyond this")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--api-url", help="load a running API instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started API")
+    parser.add_argument("--embedding-backend", default="hashing", help="EMBEDDING_BACKEND of the started API")
+    parser.add_argument("--llm-args", default="--latency 0.5", help="arguments for the fake LLM server")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "load_harness", "args": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
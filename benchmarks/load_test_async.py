@@ -0,0 +1,112 @@
+"""
+Load test for the async LLM request path.
+
+Starts the fake LLM server, points the API's `AsyncOpenAI` client at it and
+fires batches of concurrent `/summarize/` requests through the ASGI app. For
+comparison it also runs the synchronous workflow on Starlette's threadpool,
+which is how the endpoints behaved before they were made async.
+
+With a fixed LLM latency, the async wall time should stay close to one
+latency regardless of concurrency, while the threadpool path grows in steps
+of `concurrency / threadpool size`. The fake server, the API and the client
+share one process, so on small machines their CPU overhead shows up in the
+absolute numbers; the ratio between the two columns is what matters.
+
+Usage:
+    python -m benchmarks.load_test_async --latency 2 --concurrency 10 50 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from benchmarks.fake_llm_server import start_server  # noqa: E402
+
+
+async def _run_async_endpoint(app, document_id: int, concurrency: int) -> float:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as http:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            http.post("/summarize/", json={"document_id": document_id})
+            for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+    failed = [r for r in responses if r.status_code != 200]
+    if failed:
+        raise RuntimeError(f"{len(failed)} requests failed: {failed[0].text}")
+    return elapsed
+
+
+async def _run_threadpool_baseline(base_url: str, session_factory, document_id: int, concurrency: int) -> float:
+    from openai import OpenAI
+    from starlette.concurrency import run_in_threadpool
+
+    from academic_agent.validation import schemas
+    from academic_agent.workflows.summarization_workflow import run_summarization_workflow
+
+    sync_client = OpenAI(base_url=base_url, api_key="fake")
+    params = schemas.SummarizationWorkflowParams(document_id=document_id)
+
+    def call():
+        db = session_factory()
+        try:
+            return run_summarization_workflow(sync_client, db, params)
+        finally:
+            db.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[run_in_threadpool(call) for _ in range(concurrency)])
+    return time.perf_counter() - start
+
+
+async def run(latency: float, levels: list[int]):
+    from openai import AsyncOpenAI
+
+    import main
+    from academic_agent.database import crud, database
+    from academic_agent.validation import schemas
+
+    runner, base_url = await start_server(latency=latency)
+    try:
+        main.app.state.llm_client = AsyncOpenAI(base_url=base_url, api_key="fake")
+        database.init_db()
+        db = database.SessionLocal()
+        try:
+            document = crud.create_document(db, schemas.DocumentCreate(title="bench", content="Texto " * 200))
+            document_id = document.id
+        finally:
+            db.close()
+
+        print(f"fake LLM latency: {latency:.3f}s")
+        print(f"{'concurrency':>12} {'async (s)':>10} {'threadpool (s)':>15} {'speedup':>8}")
+        for concurrency in levels:
+            async_time = await _run_async_endpoint(main.app, document_id, concurrency)
+            pool_time = await _run_threadpool_baseline(base_url, database.SessionLocal, document_id, concurrency)
+            print(f"{concurrency:>12} {async_time:>10.3f} {pool_time:>15.3f} {pool_time / async_time:>7.1f}x")
+    finally:
+        await runner.cleanup()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=2.0, help="Fake LLM latency in seconds.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        asyncio.run(run(args.latency, args.concurrency))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,8 +1,56 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
 import openai
-from typing import Any, Dict, Optional
-from src.academic_agent.workflows.writing_workflow import run_writing_workflow
-from src.academic_agent.workflows.abnt_workflow import run_abnt_workflow
-from src.academic_agent.workflows.summarization_workflow import run_summarization_workflow
+from src.academic_agent.validation import schemas
+from src.academic_agent.workflows.writing_workflow import arun_writing_workflow, run_writing_workflow
+from src.academic_agent.workflows.abnt_workflow import arun_abnt_workflow, run_abnt_workflow
+from src.academic_agent.workflows.summarization_workflow import (
+    arun_summarization_workflow,
+    run_summarization_workflow,
+)
+
+# Uma tarefa de um lote: o nome da tarefa e os seus parâmetros, como em `run_task`.
+Task = Tuple[str, Dict[str, Any]]
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+class TaskResult(NamedTuple):
+    """
+    O resultado de uma tarefa executada em lote.
+
+    Attributes:
+        index (int): A posição da tarefa na lista recebida.
+        task_name (str): O nome da tarefa.
+        result (Any): O resultado do workflow, ou None se a tarefa falhou.
+        error (Optional[Exception]): O erro que interrompeu a tarefa, se houver.
+        seconds (float): O tempo de execução da tarefa, em segundos.
+    """
+    index: int
+    task_name: str
+    result: Any = None
+    error: Optional[Exception] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _abnt_params(params: Any) -> schemas.ABNTWorkflowParams:
+    """Aceita os parâmetros do workflow ABNT como dicionário ou já validados."""
+    return params if isinstance(params, schemas.ABNTWorkflowParams) else schemas.ABNTWorkflowParams(**params)
+
+
+def _summarization_params(params: Any) -> schemas.SummarizationWorkflowParams:
+    """Aceita os parâmetros do workflow de sumarização como dicionário ou já validados."""
+    if isinstance(params, schemas.SummarizationWorkflowParams):
+        return params
+    return schemas.SummarizationWorkflowParams(**params)
+
 
 class AcademicAgent:
     """
@@ -11,9 +59,14 @@ class AcademicAgent:
     Esta classe é o núcleo do sistema, responsável por gerenciar a execução de tarefas
     acadêmicas, interagir com a API da OpenAI e garantir que os dados sejam validados
     e estruturados corretamente.
+
+    Todas as tarefas compartilham o mesmo cliente da OpenAI (e o seu pool de
+    conexões HTTP); `run_tasks` e `arun_tasks` executam lotes de tarefas
+    concorrentemente sobre ele. Use o agente como gerenciador de contexto
+    (`with` ou `async with`), ou chame `close`/`aclose`, para fechar os clientes.
     """
 
-    def __init__(self, openai_api_key: Optional[str] = None):
+    def __init__(self, openai_api_key: Optional[str] = None, session_factory: Optional[Callable[[], Any]] = None):
         """
         Inicializa o AcademicAgent.
 
@@ -21,11 +74,66 @@ class AcademicAgent:
             openai_api_key (Optional[str]): A chave da API da OpenAI. Se não for fornecida,
                                              o sistema tentará usar a variável de ambiente
                                              OPENAI_API_KEY.
+            session_factory (Optional[Callable[[], Any]]): Cria as sessões do banco usadas
+                                             pela sumarização e pela formatação ABNT, que
+                                             guardam e reutilizam os seus resultados.
+                                             Por padrão, `database.SessionLocal`, cujas
+                                             tabelas são criadas no primeiro uso.
         """
         if openai_api_key:
             openai.api_key = openai_api_key
-        
-        self.client = openai.OpenAI()
+
+        self.client = openai.OpenAI(max_retries=0)  # O governor de LLM faz as novas tentativas
+        self.async_client: Optional[openai.AsyncOpenAI] = None  # Criado no primeiro uso assíncrono
+        self._session_factory = session_factory
+
+        # Mapeamento de tarefas para funções de workflow, com uma assinatura única: (params) -> resultado
+        self._workflows: Dict[str, Callable[[Any], Any]] = {
+            "writing": lambda params: run_writing_workflow(self.client, params),
+            "abnt_formatting": self._run_abnt,
+            "summarization": self._run_summarization,
+        }
+        self._async_workflows: Dict[str, Callable[[Any], Any]] = {
+            "writing": lambda params: arun_writing_workflow(self._get_async_client(), params),
+            "abnt_formatting": self._arun_abnt,
+            "summarization": self._arun_summarization,
+        }
+
+    def _new_session(self):
+        if self._session_factory is None:
+            # Fora da API (lifespan) ninguém inicializou o banco: cria as tabelas no primeiro uso.
+            from src.academic_agent.database import database
+
+            database.init_db()
+            self._session_factory = database.SessionLocal
+        return self._session_factory()
+
+    def _get_async_client(self) -> "openai.AsyncOpenAI":
+        if self.async_client is None:
+            self.async_client = openai.AsyncOpenAI(max_retries=0)
+        return self.async_client
+
+    def _run_summarization(self, params: Any) -> str:
+        with self._new_session() as db:
+            return run_summarization_workflow(self.client, db, _summarization_params(params))
+
+    async def _arun_summarization(self, params: Any) -> str:
+        with self._new_session() as db:
+            return await arun_summarization_workflow(self._get_async_client(), db, _summarization_params(params))
+
+    def _run_abnt(self, params: Any) -> str:
+        with self._new_session() as db:
+            return run_abnt_workflow(self.client, _abnt_params(params), db=db)
+
+    async def _arun_abnt(self, params: Any) -> str:
+        with self._new_session() as db:
+            return await arun_abnt_workflow(self._get_async_client(), _abnt_params(params), db=db)
+
+    def _get_workflow(self, workflows: Dict[str, Callable[[Any], Any]], task_name: str) -> Callable[[Any], Any]:
+        workflow_func = workflows.get(task_name)
+        if workflow_func is None:
+            raise ValueError(f"Tarefa desconhecida: {task_name}")
+        return workflow_func
 
     def run_task(self, task_name: str, params: Dict[str, Any]) -> Any:
         """
@@ -35,28 +143,154 @@ class AcademicAgent:
         com base no nome da tarefa fornecida.
 
         Args:
-            task_name (str): O nome da tarefa a ser executada (ex: 'writing', 'revisao').
+            task_name (str): O nome da tarefa a ser executada ('writing',
+                             'abnt_formatting' ou 'summarization').
             params (Dict[str, Any]): Um dicionário de parâmetros para a tarefa.
 
         Returns:
             Any: O resultado da execução da tarefa.
-        
+
         Raises:
             ValueError: Se o nome da tarefa for desconhecido.
         """
-        # Mapeamento de tarefas para funções de workflow
-        workflows = {
-            "writing": run_writing_workflow,
-            "abnt_formatting": run_abnt_workflow,
-            "summarization": run_summarization_workflow
-        }
+        return self._get_workflow(self._workflows, task_name)(params)
 
-        workflow_func = workflows.get(task_name)
-        
-        if workflow_func:
-            return workflow_func(self.client, params)
-        else:
-            raise ValueError(f"Tarefa desconhecida: {task_name}")
+    def _run_timed(self, index: int, task_name: str, params: Dict[str, Any]) -> TaskResult:
+        start = time.perf_counter()
+        try:
+            result = self.run_task(task_name, params)
+        except Exception as e:
+            return TaskResult(index, task_name, error=e, seconds=time.perf_counter() - start)
+        return TaskResult(index, task_name, result=result, seconds=time.perf_counter() - start)
+
+    def iter_tasks(
+        self, tasks: Sequence[Task], max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ) -> Iterator[TaskResult]:
+        """
+        Executa várias tarefas concorrentemente, entregando cada resultado assim que fica pronto.
+
+        Args:
+            tasks (Sequence[Task]): Pares (nome da tarefa, parâmetros).
+            max_concurrency (int): Número máximo de tarefas em execução ao mesmo tempo.
+
+        Yields:
+            TaskResult: Os resultados, na ordem em que as tarefas terminam. Use
+                        `index` para relacioná-los às tarefas.
+        """
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = [
+                executor.submit(self._run_timed, index, task_name, params)
+                for index, (task_name, params) in enumerate(tasks)
+            ]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # Se o consumidor parar antes do fim, as tarefas ainda não iniciadas são descartadas
+                for future in futures:
+                    future.cancel()
+
+    def run_tasks(
+        self, tasks: Sequence[Task], max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ) -> List[TaskResult]:
+        """
+        Executa várias tarefas concorrentemente sobre o cliente compartilhado.
+
+        Uma tarefa que falha não interrompe as demais: o erro fica no seu resultado.
+
+        Args:
+            tasks (Sequence[Task]): Pares (nome da tarefa, parâmetros).
+            max_concurrency (int): Número máximo de tarefas em execução ao mesmo tempo.
+
+        Returns:
+            List[TaskResult]: Os resultados, na mesma ordem das tarefas.
+        """
+        return sorted(self.iter_tasks(tasks, max_concurrency), key=lambda result: result.index)
+
+    async def arun_task(self, task_name: str, params: Dict[str, Any]) -> Any:
+        """
+        Versão assíncrona de `run_task`.
+
+        Raises:
+            ValueError: Se o nome da tarefa for desconhecido.
+        """
+        return await self._get_workflow(self._async_workflows, task_name)(params)
+
+    async def _arun_timed(self, index: int, task_name: str, params: Dict[str, Any]) -> TaskResult:
+        start = time.perf_counter()
+        try:
+            result = await self.arun_task(task_name, params)
+        except Exception as e:
+            return TaskResult(index, task_name, error=e, seconds=time.perf_counter() - start)
+        return TaskResult(index, task_name, result=result, seconds=time.perf_counter() - start)
+
+    async def aiter_tasks(
+        self, tasks: Sequence[Task], max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ) -> AsyncIterator[TaskResult]:
+        """
+        Versão assíncrona de `iter_tasks`: as tarefas rodam no event loop, com
+        no máximo `max_concurrency` em execução ao mesmo tempo.
+
+        Yields:
+            TaskResult: Os resultados, na ordem em que as tarefas terminam.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(index: int, task_name: str, params: Dict[str, Any]) -> TaskResult:
+            async with semaphore:
+                return await self._arun_timed(index, task_name, params)
+
+        pending = [asyncio.create_task(run(index, name, params)) for index, (name, params) in enumerate(tasks)]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                yield await next_done
+        finally:
+            # Se o consumidor parar antes do fim, as tarefas restantes são canceladas
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def arun_tasks(
+        self, tasks: Sequence[Task], max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ) -> List[TaskResult]:
+        """
+        Versão assíncrona de `run_tasks`.
+
+        Returns:
+            List[TaskResult]: Os resultados, na mesma ordem das tarefas.
+        """
+        results = [result async for result in self.aiter_tasks(tasks, max_concurrency)]
+        return sorted(results, key=lambda result: result.index)
+
+    def close(self) -> None:
+        """
+        Fecha o cliente síncrono da OpenAI e o seu pool de conexões.
+
+        O cliente assíncrono, se foi criado, só pode ser fechado de dentro de
+        um event loop: use `aclose`.
+        """
+        self.client.close()
+
+    async def aclose(self) -> None:
+        """
+        Fecha os clientes da OpenAI (o assíncrono, se foi criado, e o síncrono).
+        """
+        if self.async_client is not None:
+            await self.async_client.close()
+            self.async_client = None
+        self.client.close()
+
+    def __enter__(self) -> "AcademicAgent":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "AcademicAgent":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
 
     def __repr__(self) -> str:
         """
@@ -0,0 +1,115 @@
+"""
+Compressed storage of document bodies.
+
+A body is split into blocks of `CONTENT_BLOCK_CHARS` characters and each
+block is compressed with zlib on its own, behind a small header holding the
+compressed size of every block. A full read decompresses every block, while
+`read_slice` only decompresses the blocks a character range overlaps, so a
+chunk stored as an offset range into the body costs at most a couple of
+blocks to read.
+
+Layout: magic, block size in characters, total characters and block count,
+then one uint32 compressed size per block, then the compressed blocks.
+"""
+
+import os
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+MAGIC = b"ACZ1"
+_HEADER = struct.Struct("<4sIQI")  # magic, block_chars, total_chars, block_count
+
+COMPRESSION_LEVEL = int(os.getenv("CONTENT_COMPRESSION_LEVEL", 6))
+BLOCK_CHARS = int(os.getenv("CONTENT_BLOCK_CHARS", 64 * 1024))
+
+# Decompressed blocks of one body, by block number; see `read_slice`.
+BlockCache = Dict[int, str]
+
+
+def compress_text(text: str, level: Optional[int] = None, block_chars: Optional[int] = None) -> bytes:
+    """
+    Compresses a text into independently decompressible blocks.
+
+    Args:
+        text (str): The text to compress.
+        level (Optional[int]): The zlib level; `CONTENT_COMPRESSION_LEVEL` by default.
+        block_chars (Optional[int]): Characters per block; `CONTENT_BLOCK_CHARS` by default.
+
+    Returns:
+        bytes: The compressed body.
+    """
+    level = COMPRESSION_LEVEL if level is None else level
+    block_chars = block_chars or BLOCK_CHARS
+    blocks = [
+        zlib.compress(text[start:start + block_chars].encode("utf-8"), level)
+        for start in range(0, len(text), block_chars)
+    ]
+    sizes = struct.pack(f"<{len(blocks)}I", *(len(block) for block in blocks))
+    return _HEADER.pack(MAGIC, block_chars, len(text), len(blocks)) + sizes + b"".join(blocks)
+
+
+def _layout(blob: bytes) -> Tuple[int, int, List[int]]:
+    """Returns the block size, the total characters and the start offset of every block (plus the end)."""
+    magic, block_chars, total_chars, count = _HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not a compressed document body.")
+    offsets = [_HEADER.size + 4 * count]
+    for size in struct.unpack_from(f"<{count}I", blob, _HEADER.size):
+        offsets.append(offsets[-1] + size)
+    return block_chars, total_chars, offsets
+
+
+def text_length(blob: bytes) -> int:
+    """Returns the number of characters of a compressed body without decompressing it."""
+    return _HEADER.unpack_from(blob)[2]
+
+
+def decompress_text(blob: bytes) -> str:
+    """
+    Decompresses a whole body.
+
+    Args:
+        blob (bytes): A body made by `compress_text`.
+
+    Returns:
+        str: The original text.
+    """
+    _, _, offsets = _layout(blob)
+    view = memoryview(blob)
+    return "".join(
+        zlib.decompress(view[start:end]).decode("utf-8") for start, end in zip(offsets, offsets[1:])
+    )
+
+
+def read_slice(blob: bytes, start: int, end: int, cache: Optional[BlockCache] = None) -> str:
+    """
+    Returns `text[start:end]` of a compressed body, decompressing only the blocks it overlaps.
+
+    Args:
+        blob (bytes): A body made by `compress_text`.
+        start (int): The first character offset.
+        end (int): The character offset after the last one.
+        cache (Optional[BlockCache]): Keeps the decompressed blocks between calls
+            on the same body, e.g. when reading many chunks of one document.
+
+    Returns:
+        str: The characters in [start, end).
+    """
+    block_chars, total_chars, offsets = _layout(blob)
+    start, end = max(0, start), min(end, total_chars)
+    if start >= end:
+        return ""
+
+    first, last = start // block_chars, (end - 1) // block_chars
+    view = memoryview(blob)
+    parts = []
+    for number in range(first, last + 1):
+        block = cache.get(number) if cache is not None else None
+        if block is None:
+            block = zlib.decompress(view[offsets[number]:offsets[number + 1]]).decode("utf-8")
+            if cache is not None:
+                cache[number] = block
+        parts.append(block)
+    base = first * block_chars
+    return "".join(parts)[start - base:end - base]
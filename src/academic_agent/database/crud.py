@@ -2,10 +2,21 @@
 CRUD (Create, Read, Update, Delete) operations for the database.
 """
 
-from sqlalchemy.orm import Session
-from . import models
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload, undefer
+from . import fulltext, models
+from .writer import single_writer
 from ..validation import schemas
 
+# Chunks are usually read back from their document's compressed body, so
+# chunk queries load the bodies of the documents involved in one extra query.
+_WITH_DOCUMENT_BODY = selectinload(models.TextChunk.document).undefer(models.Document.body)
+
 # --- Session Management ---
 
 def get_db():
@@ -21,13 +32,17 @@ def get_db():
 
 # --- Document Operations ---
 
-def create_document(db: Session, document: schemas.DocumentCreate) -> models.Document:
+@single_writer
+def create_document(db: Session, document: schemas.DocumentCreate, commit: bool = True) -> models.Document:
     """
     Creates a new document in the database.
 
     Args:
         db (Session): The database session.
         document (schemas.DocumentCreate): The document data to create.
+        commit (bool): Whether to commit the transaction. When False the row is
+                       only flushed, so its ID is available but the caller owns
+                       the transaction.
 
     Returns:
         models.Document: The newly created document object.
@@ -35,13 +50,80 @@ def create_document(db: Session, document: schemas.DocumentCreate) -> models.Doc
     db_document = models.Document(
         title=document.title,
         source=document.source,
-        content=document.content
+        content=document.content,
+        content_hash=document.content_hash,
     )
     db.add(db_document)
-    db.commit()
+    db.flush()
+    fulltext.index_documents(db, [(db_document.id, db_document.title, document.content)])
+    if commit:
+        db.commit()
+        db.refresh(db_document)
+    return db_document
+
+@single_writer
+def create_document_with_chunks(
+    db: Session, document: schemas.DocumentCreate, chunks: Iterable[schemas.TextChunkCreate]
+) -> models.Document:
+    """
+    Creates a document and all of its text chunks in a single transaction.
+
+    Either the document and every chunk are committed, or nothing is.
+
+    Args:
+        db (Session): The database session.
+        document (schemas.DocumentCreate): The document data to create.
+        chunks (Iterable[schemas.TextChunkCreate]): The chunks of the document.
+
+    Returns:
+        models.Document: The newly created document object.
+    """
+    try:
+        db_document = create_document(db, document, commit=False)
+        create_text_chunks_bulk(
+            db, chunks, document_id=db_document.id, commit=False, document_content=document.content
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     db.refresh(db_document)
     return db_document
 
+@single_writer
+def create_documents_with_chunks(
+    db: Session, items: Sequence[Tuple[schemas.DocumentCreate, Sequence[schemas.TextChunkCreate]]]
+) -> list[models.Document]:
+    """
+    Creates many documents and their text chunks in a single transaction.
+
+    The chunks of every document go in one executemany INSERT, so a batch
+    upload costs one commit instead of one per file. Either everything is
+    committed, or nothing is.
+
+    Args:
+        db (Session): The database session.
+        items (Sequence[Tuple[schemas.DocumentCreate, Sequence[schemas.TextChunkCreate]]]):
+            Each document with its chunks.
+
+    Returns:
+        list[models.Document]: The new documents, in input order.
+    """
+    try:
+        db_documents = [create_document(db, document, commit=False) for document, _ in items]
+        _insert_chunk_rows(db, [
+            (chunk, _chunk_row(chunk, db_document.id, document.content))
+            for db_document, (document, chunks) in zip(db_documents, items)
+            for chunk in chunks
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for db_document in db_documents:
+        db.refresh(db_document)
+    return db_documents
+
 def get_document(db: Session, document_id: int) -> models.Document | None:
     """
     Retrieves a document by its ID.
@@ -55,6 +137,65 @@ def get_document(db: Session, document_id: int) -> models.Document | None:
     """
     return db.query(models.Document).filter(models.Document.id == document_id).first()
 
+def get_document_by_hash(db: Session, content_hash: str) -> models.Document | None:
+    """
+    Retrieves the document created from a file with the given SHA-256 digest.
+
+    Args:
+        db (Session): The database session.
+        content_hash (str): The hex SHA-256 digest of the uploaded file.
+
+    Returns:
+        Optional[models.Document]: The document object if found, otherwise None.
+    """
+    return db.query(models.Document).filter(models.Document.content_hash == content_hash).first()
+
+def get_documents_after(
+    db: Session, after_id: Optional[int] = None, limit: int = 100, with_content: bool = False
+) -> list[models.Document]:
+    """
+    Retrieves a page of documents in ID order using keyset pagination.
+
+    Unlike OFFSET, seeking past `after_id` uses the primary key index, so
+    every page costs the same however deep it is.
+
+    Args:
+        db (Session): The database session.
+        after_id (Optional[int]): The last ID of the previous page; None for the first page.
+        limit (int): The maximum number of records to return.
+        with_content (bool): Load the deferred (compressed) body in the same query.
+
+    Returns:
+        List[models.Document]: A list of document objects.
+    """
+    query = db.query(models.Document)
+    if with_content:
+        query = query.options(undefer(models.Document.body))
+    if after_id is not None:
+        query = query.filter(models.Document.id > after_id)
+    return query.order_by(models.Document.id).limit(limit).all()
+
+def count_chunks_by_document(db: Session, document_ids: Sequence[int]) -> dict[int, int]:
+    """
+    Counts the text chunks of several documents in one query.
+
+    Args:
+        db (Session): The database session.
+        document_ids (Sequence[int]): The IDs of the documents.
+
+    Returns:
+        Dict[int, int]: The number of chunks of each document (0 if it has none).
+    """
+    counts = dict.fromkeys(document_ids, 0)
+    if document_ids:
+        rows = (
+            db.query(models.TextChunk.document_id, func.count(models.TextChunk.id))
+            .filter(models.TextChunk.document_id.in_(document_ids))
+            .group_by(models.TextChunk.document_id)
+        )
+        counts.update({document_id: count for document_id, count in rows})
+    return counts
+
 def get_documents(db: Session, skip: int = 0, limit: int = 100) -> list[models.Document]:
     """
     Retrieves a list of documents with pagination.
@@ -73,17 +214,93 @@ def get_documents(db: Session, skip: int = 0, limit: int = 100) -> list[models.D
 
 def get_text_chunks_by_document(db: Session, document_id: int) -> list[models.TextChunk]:
     """
-    Retrieves all text chunks for a specific document.
+    Retrieves all text chunks for a specific document, in document order.
+
+    Args:
+        db (Session): The database session.
+        document_id (int): The ID of the parent document.
+
+    Returns:
+        List[models.TextChunk]: A list of text chunk objects.
+    """
+    return (
+        db.query(models.TextChunk)
+        .options(_WITH_DOCUMENT_BODY)
+        .filter(models.TextChunk.document_id == document_id)
+        .order_by(models.TextChunk.id)
+        .all()
+    )
+
+def get_text_chunks_after(
+    db: Session, document_id: int, after_id: Optional[int] = None, limit: int = 100
+) -> list[models.TextChunk]:
+    """
+    Retrieves a page of a document's text chunks in document order using keyset pagination.
 
     Args:
         db (Session): The database session.
         document_id (int): The ID of the parent document.
+        after_id (Optional[int]): The last chunk ID of the previous page; None for the first page.
+        limit (int): The maximum number of records to return.
 
     Returns:
         List[models.TextChunk]: A list of text chunk objects.
     """
-    return db.query(models.TextChunk).filter(models.TextChunk.document_id == document_id).all()
+    query = (
+        db.query(models.TextChunk)
+        .options(_WITH_DOCUMENT_BODY)
+        .filter(models.TextChunk.document_id == document_id)
+    )
+    if after_id is not None:
+        query = query.filter(models.TextChunk.id > after_id)
+    return query.order_by(models.TextChunk.id).limit(limit).all()
+
+def get_text_chunks_by_ids(db: Session, chunk_ids: Sequence[int]) -> list[models.TextChunk]:
+    """
+    Retrieves text chunks by ID, in the order the IDs are given.
+
+    Args:
+        db (Session): The database session.
+        chunk_ids (Sequence[int]): The IDs of the chunks. Unknown IDs are skipped.
+
+    Returns:
+        List[models.TextChunk]: A list of text chunk objects.
+    """
+    if not chunk_ids:
+        return []
+    query = db.query(models.TextChunk).options(_WITH_DOCUMENT_BODY).filter(models.TextChunk.id.in_(chunk_ids))
+    by_id = {chunk.id: chunk for chunk in query}
+    return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
+
+def iter_chunk_embeddings(
+    db: Session, document_id: Optional[int] = None, batch_size: int = 1000
+) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Streams the (id, document_id, embedding) of every chunk that has an embedding.
 
+    Only these three columns are loaded, without building ORM objects, so the
+    vector index can be filled without reading the chunk texts.
+
+    Args:
+        db (Session): The database session.
+        document_id (Optional[int]): Restricts the rows to one document.
+        batch_size (int): How many rows to fetch from the driver at a time.
+
+    Yields:
+        Tuple[int, int, bytes]: The chunk ID, its document ID and its packed embedding.
+    """
+    query = (
+        db.query(models.TextChunk.id, models.TextChunk.document_id, models.TextChunk.embedding)
+        .filter(models.TextChunk.embedding.isnot(None))
+        .order_by(models.TextChunk.id)
+    )
+    if document_id is not None:
+        query = query.filter(models.TextChunk.document_id == document_id)
+    query = query.yield_per(batch_size)
+    for chunk_id, chunk_document_id, embedding in query:
+        yield chunk_id, chunk_document_id, embedding
+
+@single_writer
 def create_text_chunk(db: Session, chunk: schemas.TextChunkCreate, document_id: int) -> models.TextChunk:
     """
     Creates a new text chunk associated with a document.
@@ -101,6 +318,392 @@ def create_text_chunk(db: Session, chunk: schemas.TextChunkCreate, document_id:
         document_id=document_id
     )
     db.add(db_chunk)
+    db.flush()
+    fulltext.index_chunks(db, [(db_chunk.id, chunk.content)])
     db.commit()
     db.refresh(db_chunk)
-    return db_chunk 
\ No newline at end of file
+    return db_chunk 
+
+@single_writer
+def create_text_chunks_bulk(
+    db: Session,
+    chunks: Iterable[schemas.TextChunkCreate],
+    document_id: int,
+    commit: bool = True,
+    document_content: Optional[str] = None,
+) -> int:
+    """
+    Inserts many text chunks for a document with a single executemany INSERT.
+
+    Unlike `create_text_chunk`, no ORM objects are built or refreshed, so the
+    cost is one round trip (and one commit) regardless of the number of chunks.
+    The chunks are added to the keyword index in the same transaction.
+
+    Args:
+        db (Session): The database session.
+        chunks (Iterable[schemas.TextChunkCreate]): The chunk data to create.
+        document_id (int): The ID of the parent document.
+        commit (bool): Whether to commit the transaction after the insert.
+        document_content (Optional[str]): The text of the document. Chunks that
+            are a range of it are stored as offsets only.
+
+    Returns:
+        int: The number of chunks inserted.
+    """
+    rows = [(chunk, _chunk_row(chunk, document_id, document_content)) for chunk in chunks]
+    _insert_chunk_rows(db, rows)
+    if commit:
+        db.commit()
+    return len(rows)
+
+def _chunk_row(chunk: schemas.TextChunkCreate, document_id: int, document_content: Optional[str]) -> dict:
+    """
+    Builds the insert row of a chunk.
+
+    The text is left out when it is exactly the [char_start, char_end) range
+    of the document, so it is not stored twice.
+    """
+    row = {**chunk.model_dump(exclude={"content"}), "document_id": document_id, "stored_content": chunk.content}
+    if (
+        document_content is not None
+        and chunk.char_start is not None
+        and document_content[chunk.char_start:chunk.char_end] == chunk.content
+    ):
+        row["stored_content"] = None
+    return row
+
+def _insert_chunk_rows(db: Session, rows: list[Tuple[schemas.TextChunkCreate, dict]]) -> None:
+    """Inserts text chunk rows with one executemany INSERT and adds them to the keyword index."""
+    if rows:
+        # RETURNING keeps this a single batched statement while giving the new
+        # IDs, in input order, for the keyword index.
+        chunk_ids = db.scalars(
+            insert(models.TextChunk).returning(models.TextChunk.id, sort_by_parameter_order=True),
+            [row for _, row in rows],
+        ).all()
+        fulltext.index_chunks(db, zip(chunk_ids, (chunk.content for chunk, _ in rows)))
+
+# --- Job Operations ---
+
+@single_writer
+def create_job(
+    db: Session, job: schemas.JobCreate, input_file: Optional[bytes] = None
+) -> models.Job:
+    """
+    Queues a new background job.
+
+    Args:
+        db (Session): The database session.
+        job (schemas.JobCreate): The workflow, its parameters, queue and priority.
+        input_file (Optional[bytes]): The uploaded file the workflow reads, if any.
+
+    Returns:
+        models.Job: The newly created job object.
+    """
+    db_job = models.Job(
+        id=uuid.uuid4().hex,
+        kind=job.kind,
+        queue=job.queue,
+        priority=job.priority,
+        params=job.params,
+        input_file=input_file,
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_job(db: Session, job_id: str) -> models.Job | None:
+    """
+    Retrieves a job by its ID.
+
+    Args:
+        db (Session): The database session.
+        job_id (str): The ID of the job to retrieve.
+
+    Returns:
+        Optional[models.Job]: The job object if found, otherwise None.
+    """
+    return db.get(models.Job, job_id)
+
+@single_writer
+def claim_next_job(db: Session, queue: str) -> models.Job | None:
+    """
+    Atomically marks the next queued job of a queue as running and returns it.
+
+    The job with the highest priority wins, then the oldest. The status check
+    in the UPDATE makes concurrent workers (threads or processes) never claim
+    the same job twice.
+
+    Args:
+        db (Session): The database session.
+        queue (str): The queue to take a job from.
+
+    Returns:
+        Optional[models.Job]: The claimed job, or None if the queue is empty.
+    """
+    next_id = (
+        select(models.Job.id)
+        .where(models.Job.queue == queue, models.Job.status == "queued")
+        .order_by(models.Job.priority.desc(), models.Job.created_at, models.Job.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    claimed_id = db.execute(
+        update(models.Job)
+        .where(models.Job.id == next_id, models.Job.status == "queued")
+        .values(status="running", started_at=datetime.now(timezone.utc))
+        .returning(models.Job.id)
+    ).scalar()
+    db.commit()
+    return get_job(db, claimed_id) if claimed_id else None
+
+@single_writer
+def requeue_running_jobs(db: Session, queues: Sequence[str]) -> int:
+    """
+    Puts the jobs left running by a stopped or crashed process back in their queue.
+
+    Jobs whose cancellation was requested end as cancelled instead.
+
+    Args:
+        db (Session): The database session.
+        queues (Sequence[str]): The queues to recover.
+
+    Returns:
+        int: The number of jobs recovered.
+    """
+    cancelled = models.Job.cancel_requested.is_(True)
+    recovered = db.execute(
+        update(models.Job)
+        .where(models.Job.queue.in_(queues), models.Job.status == "running")
+        .values(
+            status=case((cancelled, "cancelled"), else_="queued"),
+            started_at=None,
+            input_file=case((cancelled, None), else_=models.Job.input_file),
+            finished_at=case((cancelled, datetime.now(timezone.utc)), else_=None),
+        )
+    ).rowcount
+    db.commit()
+    return recovered
+
+@single_writer
+def finish_job(
+    db: Session, job_id: str, result: Optional[str] = None, error: Optional[str] = None
+) -> None:
+    """
+    Records the outcome of a running job and drops its input file.
+
+    A job whose cancellation was requested while it ran ends as cancelled and
+    its result is discarded.
+
+    Args:
+        db (Session): The database session.
+        job_id (str): The ID of the job.
+        result (Optional[str]): The workflow output, on success.
+        error (Optional[str]): The error message, on failure.
+    """
+    cancelled = models.Job.cancel_requested.is_(True)
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.status == "running")
+        .values(
+            status=case((cancelled, "cancelled"), else_="failed" if error is not None else "succeeded"),
+            result=case((cancelled, None), else_=result),
+            error=error,
+            input_file=None,
+            finished_at=datetime.now(timezone.utc),
+        )
+    )
+    db.commit()
+
+@single_writer
+def cancel_job(db: Session, job_id: str) -> models.Job | None:
+    """
+    Cancels a job.
+
+    A queued job is cancelled immediately and will never run. A running job
+    cannot be interrupted; it is flagged so its result is discarded and it
+    ends as cancelled. Finished jobs are left as they are.
+
+    Args:
+        db (Session): The database session.
+        job_id (str): The ID of the job to cancel.
+
+    Returns:
+        Optional[models.Job]: The job after the update, or None if not found.
+    """
+    cancelled = db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.status == "queued")
+        .values(status="cancelled", input_file=None, finished_at=datetime.now(timezone.utc))
+    ).rowcount
+    if not cancelled:
+        db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == "running")
+            .values(cancel_requested=True)
+        )
+    db.commit()
+    db.expire_all()
+    return get_job(db, job_id)
+
+# --- Stored Workflow Results ---
+
+def get_document_summary(
+    db: Session, document_id: int, model: str, prompt_version: str
+) -> models.DocumentSummary | None:
+    """
+    Retrieves the stored summary of a document for a model and prompt version.
+
+    The caller compares its `input_hash` with the current text to detect a stale summary.
+
+    Args:
+        db (Session): The database session.
+        document_id (int): The ID of the summarized document.
+        model (str): The model that generated the summary.
+        prompt_version (str): The version of the prompts and parameters used.
+
+    Returns:
+        Optional[models.DocumentSummary]: The stored summary if any, otherwise None.
+    """
+    return db.scalars(
+        select(models.DocumentSummary).where(
+            models.DocumentSummary.document_id == document_id,
+            models.DocumentSummary.model == model,
+            models.DocumentSummary.prompt_version == prompt_version,
+        )
+    ).first()
+
+@single_writer
+def save_document_summary(
+    db: Session, document_id: int, model: str, prompt_version: str, input_hash: str, summary: str
+) -> None:
+    """
+    Stores the summary of a document, replacing a stale one with the same key.
+
+    Args:
+        db (Session): The database session.
+        document_id (int): The ID of the summarized document.
+        model (str): The model that generated the summary.
+        prompt_version (str): The version of the prompts and parameters used.
+        input_hash (str): The SHA-256 of the summarized text.
+        summary (str): The summary.
+    """
+    stored = get_document_summary(db, document_id, model, prompt_version)
+    if stored is None:
+        db.add(models.DocumentSummary(
+            document_id=document_id, model=model, prompt_version=prompt_version,
+            input_hash=input_hash, summary=summary,
+        ))
+    else:
+        stored.input_hash, stored.summary = input_hash, summary
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # A concurrent request stored the same summary first
+
+def get_chunk_summaries(
+    db: Session, content_hashes: Sequence[str], model: str, prompt_version: str
+) -> dict[str, str]:
+    """
+    Retrieves the stored partial summaries of chunk groups.
+
+    Args:
+        db (Session): The database session.
+        content_hashes (Sequence[str]): The content hashes of the chunk groups.
+        model (str): The model that generated the summaries.
+        prompt_version (str): The version of the prompt and parameters used.
+
+    Returns:
+        dict[str, str]: The summary of each content hash found.
+    """
+    if not content_hashes:
+        return {}
+    rows = db.execute(
+        select(models.ChunkSummary.content_hash, models.ChunkSummary.summary).where(
+            models.ChunkSummary.content_hash.in_(set(content_hashes)),
+            models.ChunkSummary.model == model,
+            models.ChunkSummary.prompt_version == prompt_version,
+        )
+    )
+    return {content_hash: summary for content_hash, summary in rows}
+
+@single_writer
+def save_chunk_summaries(db: Session, summaries: dict[str, str], model: str, prompt_version: str) -> None:
+    """
+    Stores partial summaries of chunk groups, replacing the stored ones with the same key.
+
+    Args:
+        db (Session): The database session.
+        summaries (dict[str, str]): The summary of each content hash.
+        model (str): The model that generated the summaries.
+        prompt_version (str): The version of the prompt and parameters used.
+    """
+    if not summaries:
+        return
+    stored_ids = dict(db.execute(
+        select(models.ChunkSummary.content_hash, models.ChunkSummary.id).where(
+            models.ChunkSummary.content_hash.in_(set(summaries)),
+            models.ChunkSummary.model == model,
+            models.ChunkSummary.prompt_version == prompt_version,
+        )
+    ).all())
+    updated = [
+        {"id": stored_ids[content_hash], "summary": summary}
+        for content_hash, summary in summaries.items() if content_hash in stored_ids
+    ]
+    new = [
+        {"content_hash": content_hash, "model": model, "prompt_version": prompt_version, "summary": summary}
+        for content_hash, summary in summaries.items() if content_hash not in stored_ids
+    ]
+    if updated:
+        db.execute(update(models.ChunkSummary), updated)
+    if new:
+        db.execute(insert(models.ChunkSummary), new)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # A concurrent request stored some of them first; they are only a cache
+
+def get_abnt_output(db: Session, content_hash: str, model: str, prompt_version: str) -> str | None:
+    """
+    Retrieves the stored ABNT formatting of a text.
+
+    Args:
+        db (Session): The database session.
+        content_hash (str): The SHA-256 of the text that was formatted.
+        model (str): The model that formatted it.
+        prompt_version (str): The version of the prompts and parameters used.
+
+    Returns:
+        Optional[str]: The formatted text if stored, otherwise None.
+    """
+    return db.scalars(
+        select(models.ABNTOutput.formatted_text).where(
+            models.ABNTOutput.content_hash == content_hash,
+            models.ABNTOutput.model == model,
+            models.ABNTOutput.prompt_version == prompt_version,
+        )
+    ).first()
+
+@single_writer
+def save_abnt_output(db: Session, content_hash: str, model: str, prompt_version: str, formatted_text: str) -> None:
+    """
+    Stores the ABNT formatting of a text, unless one is already stored.
+
+    Args:
+        db (Session): The database session.
+        content_hash (str): The SHA-256 of the text that was formatted.
+        model (str): The model that formatted it.
+        prompt_version (str): The version of the prompts and parameters used.
+        formatted_text (str): The formatted text.
+    """
+    if get_abnt_output(db, content_hash, model, prompt_version) is not None:
+        return
+    db.add(models.ABNTOutput(
+        content_hash=content_hash, model=model, prompt_version=prompt_version, formatted_text=formatted_text
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # A concurrent request stored the same output first
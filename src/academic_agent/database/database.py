@@ -1,36 +1,96 @@
 import os
-from sqlalchemy import create_engine
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
 
-# Carrega as variáveis de ambiente do arquivo .env
-load_dotenv()
+from .writer import enable_single_writer
 
 # --- Configuração do Banco de Dados ---
-# Prioriza a DATABASE_URL do ambiente (para Docker/Produção)
+# Importar este módulo não toca o banco: o engine só conecta no primeiro uso e
+# as tabelas são criadas por `init_db`, chamado no startup da aplicação.
+# Prioriza a DATABASE_URL do ambiente (para Docker/Produção; o .env é
+# carregado pelo ponto de entrada antes deste import)
 # Usa SQLite como fallback (para desenvolvimento local sem Docker)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./academic_agent.db")
 
-# A verificação de 'check_same_thread' é específica para SQLite.
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(
-    DATABASE_URL, connect_args=connect_args
-)
+def _is_sqlite_file(url: str) -> bool:
+    """Indica se a URL aponta para um arquivo SQLite (e não para um banco em memória)."""
+    return url.startswith("sqlite") and url not in ("sqlite://", "sqlite:///:memory:") and "mode=memory" not in url
+
+
+def build_engine(url: str) -> Engine:
+    """
+    Cria o engine com o perfil de produção do dialeto.
+
+    PostgreSQL: pool configurável (DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE_SECONDS) com pre-ping (DB_POOL_PRE_PING), para descartar
+    conexões derrubadas pelo servidor antes de usá-las.
+
+    SQLite em arquivo: modo WAL (leitores não bloqueiam o escritor),
+    synchronous=NORMAL (seguro em WAL, sem fsync a cada commit), busy timeout
+    (SQLITE_BUSY_TIMEOUT_MS) e uma fila de escrita única, para que ingestões
+    concorrentes esperem sua vez em vez de falhar com "database is locked".
+    Desative a fila com SQLITE_SINGLE_WRITER=false.
+
+    Args:
+        url (str): A URL do banco de dados.
+
+    Returns:
+        Engine: O engine configurado.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800)),
+            pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() not in ("0", "false", "no"),
+        )
+
+    # A verificação de 'check_same_thread' é específica para SQLite.
+    busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    engine = create_engine(
+        url, connect_args={"check_same_thread": False, "timeout": busy_timeout_ms / 1000}
+    )
+    if not _is_sqlite_file(url):
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        cursor.close()
+
+    if os.getenv("SQLITE_SINGLE_WRITER", "true").lower() not in ("0", "false", "no"):
+        enable_single_writer(engine)
+    return engine
+
+
+engine = build_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
-def init_db():
+def init_db(bind: Optional[Engine] = None):
     """
     Inicializa o banco de dados.
-    Cria todas as tabelas se elas ainda não existirem.
+    Atualiza as tabelas criadas por versões anteriores (ver `migrations`),
+    cria todas as tabelas se elas ainda não existirem, e os índices que
+    faltarem. Chamado no startup da aplicação (lifespan), nunca na importação.
+
+    Args:
+        bind (Optional[Engine]): O banco a inicializar; por padrão, o `engine` da aplicação.
     """
+    from .migrations import upgrade_schema
     from .models import Base
-    Base.metadata.create_all(bind=engine)
-
-# Se estivermos usando SQLite, é seguro inicializar o DB ao carregar o módulo.
-# Para PostgreSQL, as migrações serão gerenciadas de outra forma (ex: Alembic).
-if DATABASE_URL.startswith("sqlite"):
-    print("Using SQLite database. Initializing database and creating tables...")
-    init_db()
-    print("Database initialized.") 
\ No newline at end of file
+
+    bind = bind if bind is not None else engine
+    upgrade_schema(bind)
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
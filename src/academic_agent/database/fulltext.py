@@ -0,0 +1,322 @@
+"""
+Keyword (full-text) search over documents and text chunks.
+
+The texts live compressed in the database (see `content_store`), so the
+indexes keep no copy of them: on SQLite they are contentless FTS5 tables and
+on PostgreSQL `documents_fts`/`text_chunks_fts` tables holding a `tsvector`
+per row under a GIN index. `crud` adds each new row to the index in the same
+transaction as the insert. Results are ranked with FTS5's built-in BM25 or
+with `ts_rank_cd`, and the snippets are cut from the decompressed texts of
+the page of hits only.
+"""
+
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from sqlalchemy import MetaData, bindparam, event, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import content_store
+
+# Text search configuration used by the PostgreSQL index and queries.
+POSTGRES_TEXT_SEARCH_CONFIG = os.getenv("FULLTEXT_POSTGRES_CONFIG", "portuguese")
+if not re.fullmatch(r"[a-z_]+", POSTGRES_TEXT_SEARCH_CONFIG):
+    raise ValueError(f"Invalid text search configuration: {POSTGRES_TEXT_SEARCH_CONFIG}")
+
+SQLITE_TOKENIZER = "unicode61 remove_diacritics 2"
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+SNIPPET_TOKENS = 16
+
+_SQLITE_DDL = {
+    "text_chunks_fts": (
+        f"CREATE VIRTUAL TABLE text_chunks_fts USING fts5(content, content='', tokenize='{SQLITE_TOKENIZER}')"
+    ),
+    "documents_fts": (
+        f"CREATE VIRTUAL TABLE documents_fts USING fts5(title, content, content='', tokenize='{SQLITE_TOKENIZER}')"
+    ),
+}
+
+_POSTGRES_DDL = {
+    "text_chunks_fts": [
+        "CREATE TABLE text_chunks_fts (id INTEGER PRIMARY KEY REFERENCES text_chunks (id), vector TSVECTOR NOT NULL)",
+        "CREATE INDEX ix_text_chunks_fts_vector ON text_chunks_fts USING GIN (vector)",
+    ],
+    "documents_fts": [
+        "CREATE TABLE documents_fts (id INTEGER PRIMARY KEY REFERENCES documents (id), vector TSVECTOR NOT NULL)",
+        "CREATE INDEX ix_documents_fts_vector ON documents_fts USING GIN (vector)",
+    ],
+}
+
+_INSERT_SQL = {
+    "sqlite": {
+        "documents_fts": "INSERT INTO documents_fts (rowid, title, content) VALUES (:id, :title, :content)",
+        "text_chunks_fts": "INSERT INTO text_chunks_fts (rowid, content) VALUES (:id, :content)",
+    },
+    "postgresql": {
+        "documents_fts": (
+            "INSERT INTO documents_fts (id, vector)"
+            f" VALUES (:id, to_tsvector('{POSTGRES_TEXT_SEARCH_CONFIG}', :title || ' ' || :content))"
+        ),
+        "text_chunks_fts": (
+            "INSERT INTO text_chunks_fts (id, vector)"
+            f" VALUES (:id, to_tsvector('{POSTGRES_TEXT_SEARCH_CONFIG}', :content))"
+        ),
+    },
+}
+
+
+class KeywordHit(NamedTuple):
+    document_id: int
+    chunk_id: Optional[int]
+    title: str
+    snippet: str
+    score: float
+
+
+def register_fulltext_ddl(metadata: MetaData) -> None:
+    """
+    Creates (and drops) the full-text indexes along with the tables of `metadata`.
+
+    Existing databases get their indexes built from the stored rows the
+    first time `create_all` runs after upgrading.
+    """
+
+    @event.listens_for(metadata, "after_create")
+    def _create_fulltext(target, connection: Connection, **kw):
+        dialect = connection.dialect.name
+        if dialect == "sqlite":
+            existing = {
+                name for (name,) in connection.exec_driver_sql(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                )
+            }
+            missing = [name for name in _SQLITE_DDL if name not in existing]
+            for name in missing:
+                connection.exec_driver_sql(_SQLITE_DDL[name])
+        elif dialect == "postgresql":
+            missing = [
+                name for name in _POSTGRES_DDL
+                if connection.exec_driver_sql(f"SELECT to_regclass('{name}')").scalar() is None
+            ]
+            for name in missing:
+                for ddl in _POSTGRES_DDL[name]:
+                    connection.exec_driver_sql(ddl)
+        else:
+            return
+        if "documents_fts" in missing:
+            rows = connection.execute(text("SELECT id, title, body FROM documents")).all()
+            index_documents(connection, [(id, title, content_store.decompress_text(body)) for id, title, body in rows])
+        if "text_chunks_fts" in missing:
+            index_chunks(connection, _chunk_texts(connection).items())
+
+    @event.listens_for(metadata, "before_drop")
+    def _drop_fulltext(target, connection: Connection, **kw):
+        for name in _INSERT_SQL.get(connection.dialect.name, {}):
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {name}")
+
+
+def _dialect(db: Union[Session, Connection]) -> str:
+    return db.dialect.name if isinstance(db, Connection) else db.get_bind().dialect.name
+
+
+def index_documents(db: Union[Session, Connection], rows: Iterable[Tuple[int, str, str]]) -> None:
+    """
+    Adds new documents to the keyword index.
+
+    Args:
+        db (Union[Session, Connection]): The database session; the caller commits.
+        rows (Iterable[Tuple[int, str, str]]): (id, title, content) of each new document.
+    """
+    params = [{"id": doc_id, "title": title, "content": content} for doc_id, title, content in rows]
+    sql = _INSERT_SQL.get(_dialect(db), {}).get("documents_fts")
+    if params and sql:
+        db.execute(text(sql), params)
+
+
+def index_chunks(db: Union[Session, Connection], rows: Iterable[Tuple[int, str]]) -> None:
+    """
+    Adds new text chunks to the keyword index.
+
+    Args:
+        db (Union[Session, Connection]): The database session; the caller commits.
+        rows (Iterable[Tuple[int, str]]): (id, content) of each new chunk.
+    """
+    params = [{"id": chunk_id, "content": content} for chunk_id, content in rows]
+    sql = _INSERT_SQL.get(_dialect(db), {}).get("text_chunks_fts")
+    if params and sql:
+        db.execute(text(sql), params)
+
+
+def _document_bodies(db: Union[Session, Connection], document_ids: Set[int]) -> Dict[int, bytes]:
+    """Loads the compressed bodies of some documents."""
+    if not document_ids:
+        return {}
+    sql = text("SELECT id, body FROM documents WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+    return {doc_id: body for doc_id, body in db.execute(sql, {"ids": sorted(document_ids)})}
+
+
+def _chunk_texts(db: Union[Session, Connection], chunk_ids: Optional[List[int]] = None) -> Dict[int, str]:
+    """
+    Returns the text of some chunks (all of them if `chunk_ids` is None).
+
+    Chunks stored as offsets are sliced out of their document bodies, each
+    block of a body being decompressed at most once.
+    """
+    sql = "SELECT id, document_id, content, char_start, char_end FROM text_chunks"
+    if chunk_ids is None:
+        rows = db.execute(text(sql)).all()
+    elif not chunk_ids:
+        return {}
+    else:
+        statement = text(f"{sql} WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+        rows = db.execute(statement, {"ids": chunk_ids}).all()
+
+    bodies = _document_bodies(db, {row.document_id for row in rows if row.content is None})
+    caches: Dict[int, content_store.BlockCache] = {}
+    return {
+        row.id: row.content if row.content is not None else content_store.read_slice(
+            bodies[row.document_id], row.char_start, row.char_end, caches.setdefault(row.document_id, {})
+        )
+        for row in rows
+    }
+
+
+def _fold(word: str) -> str:
+    """Lowercases a word and strips its diacritics, like the SQLite tokenizer."""
+    decomposed = unicodedata.normalize("NFKD", word.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def make_snippet(content: str, query: str, max_tokens: int = SNIPPET_TOKENS) -> str:
+    """
+    Cuts a short excerpt of `content` around the first word of `query` it contains.
+
+    Matching words are wrapped in brackets and an ellipsis marks text cut off
+    at either end, as in FTS5's `snippet()`.
+
+    Args:
+        content (str): The text of the hit.
+        query (str): The search query.
+        max_tokens (int): The number of words in the excerpt.
+
+    Returns:
+        str: The excerpt.
+    """
+    terms = {_fold(word) for word in WORD_PATTERN.findall(query)}
+    tokens = list(WORD_PATTERN.finditer(content))
+    if not tokens:
+        return ""
+    first_hit = next((i for i, token in enumerate(tokens) if _fold(token.group()) in terms), 0)
+    start = max(0, min(first_hit - max_tokens // 4, len(tokens) - max_tokens))
+    end = min(len(tokens), start + max_tokens)
+
+    parts = ["…"] if start > 0 else []
+    position = tokens[start].start()
+    for token in tokens[start:end]:
+        parts.append(content[position:token.start()])
+        word = token.group()
+        parts.append(f"[{word}]" if _fold(word) in terms else word)
+        position = token.end()
+    if end < len(tokens):
+        parts.append("…")
+    else:
+        parts.append(content[position:])
+    return "".join(parts)
+
+
+def to_match_query(query: str) -> str:
+    """
+    Turns free text into an FTS5 query matching every word, so punctuation
+    and FTS5 operators typed by the user cannot cause syntax errors.
+    """
+    return " ".join(f'"{word}"' for word in WORD_PATTERN.findall(query))
+
+
+def search(
+    db: Session,
+    query: str,
+    scope: str = "chunks",
+    document_id: Optional[int] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[KeywordHit]:
+    """
+    Runs a ranked keyword search.
+
+    Args:
+        db (Session): The database session.
+        query (str): Free text; every word must appear in a hit.
+        scope (str): "chunks" to search text chunks, "documents" for whole documents.
+        document_id (Optional[int]): Restricts a chunk search to one document.
+        limit (int): The maximum number of hits.
+        offset (int): The number of hits to skip, for pagination.
+
+    Returns:
+        List[KeywordHit]: The hits, best first. Higher scores are better.
+    """
+    params = {"document_id": document_id, "limit": limit, "offset": offset}
+    dialect = _dialect(db)
+
+    if dialect == "sqlite":
+        params["query"] = to_match_query(query)
+        if not params["query"]:
+            return []
+        if scope == "documents":
+            sql = (
+                "SELECT d.id, NULL, d.title, -bm25(documents_fts) AS score"
+                " FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid"
+                " WHERE documents_fts MATCH :query"
+                " ORDER BY bm25(documents_fts) LIMIT :limit OFFSET :offset"
+            )
+        else:
+            sql = (
+                "SELECT c.document_id, c.id, d.title, -bm25(text_chunks_fts) AS score"
+                " FROM text_chunks_fts"
+                " JOIN text_chunks c ON c.id = text_chunks_fts.rowid"
+                " JOIN documents d ON d.id = c.document_id"
+                " WHERE text_chunks_fts MATCH :query"
+                " AND (:document_id IS NULL OR c.document_id = :document_id)"
+                " ORDER BY bm25(text_chunks_fts) LIMIT :limit OFFSET :offset"
+            )
+    elif dialect == "postgresql":
+        params["query"] = query
+        config = POSTGRES_TEXT_SEARCH_CONFIG
+        if scope == "documents":
+            sql = (
+                "SELECT d.id, NULL, d.title, ts_rank_cd(f.vector, q) AS score"
+                " FROM documents_fts f JOIN documents d ON d.id = f.id,"
+                f" plainto_tsquery('{config}', :query) q"
+                " WHERE f.vector @@ q"
+                " ORDER BY score DESC, d.id LIMIT :limit OFFSET :offset"
+            )
+        else:
+            sql = (
+                "SELECT c.document_id, c.id, d.title, ts_rank_cd(f.vector, q) AS score"
+                " FROM text_chunks_fts f"
+                " JOIN text_chunks c ON c.id = f.id"
+                " JOIN documents d ON d.id = c.document_id,"
+                f" plainto_tsquery('{config}', :query) q"
+                " WHERE f.vector @@ q"
+                " AND (CAST(:document_id AS INTEGER) IS NULL OR c.document_id = :document_id)"
+                " ORDER BY score DESC, c.id LIMIT :limit OFFSET :offset"
+            )
+    else:
+        raise ValueError(f"Keyword search is not supported on {dialect}.")
+
+    rows = db.execute(text(sql), params).all()
+
+    # The snippets are only cut for the page of hits, from the decompressed texts.
+    if scope == "documents":
+        texts = {
+            doc_id: content_store.decompress_text(body)
+            for doc_id, body in _document_bodies(db, {row[0] for row in rows}).items()
+        }
+        return [KeywordHit(doc_id, None, title, make_snippet(texts[doc_id], query), score)
+                for doc_id, _, title, score in rows]
+    texts = _chunk_texts(db, [row[1] for row in rows])
+    return [KeywordHit(doc_id, chunk_id, title, make_snippet(texts[chunk_id], query), score)
+            for doc_id, chunk_id, title, score in rows]
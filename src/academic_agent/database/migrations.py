@@ -0,0 +1,154 @@
+"""
+Upgrades databases created by older versions to the current models.
+
+`create_all` only creates the tables and indexes that are missing, so the
+columns that changed since are upgraded here, before it runs:
+
+- The document text moved from `documents.content` to the compressed
+  `documents.body` (see `content_store`), and `text_chunks.content` became
+  optional, since chunks of the document text are stored as offsets.
+- The keyword indexes of those versions read the old columns. They are
+  dropped, and `create_all` builds the current ones from the stored rows.
+
+SQLite cannot drop a NOT NULL or add a UNIQUE column in place, so there the
+two tables are rebuilt from the models, which also adds every column
+introduced since. On PostgreSQL they are altered in place. Either way the
+whole upgrade runs in one transaction, so an interrupted upgrade leaves the
+database as it was.
+"""
+
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Connection, Engine, RowMapping
+from sqlalchemy.schema import CreateTable
+
+from . import content_store
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+# Rows read and written at a time while copying a table.
+BATCH_ROWS = 500
+
+_OLD_FULLTEXT_DDL = {
+    "sqlite": ["DROP TABLE IF EXISTS documents_fts", "DROP TABLE IF EXISTS text_chunks_fts"],
+    "postgresql": ["DROP INDEX IF EXISTS ix_documents_fulltext", "DROP INDEX IF EXISTS ix_text_chunks_fulltext"],
+}
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Upgrades a database whose documents still store their text uncompressed.
+
+    A no-op on new and already upgraded databases. Call it before `create_all`.
+
+    Args:
+        engine (Engine): The database to upgrade.
+    """
+    with _sqlite_transaction(engine) if engine.dialect.name == "sqlite" else engine.begin() as connection:
+        inspector = inspect(connection)
+        if not inspector.has_table("documents"):
+            return
+        if "body" in {column["name"] for column in inspector.get_columns("documents")}:
+            return
+
+        dialect = connection.dialect.name
+        logger.warning("Upgrading the database: compressing the stored document texts.")
+        for ddl in _OLD_FULLTEXT_DDL.get(dialect, []):
+            connection.exec_driver_sql(ddl)
+        if dialect == "sqlite":
+            _rebuild_sqlite_table(connection, Base.metadata.tables["documents"], _with_compressed_body)
+            _rebuild_sqlite_table(connection, Base.metadata.tables["text_chunks"])
+        else:
+            _upgrade_in_place(connection)
+
+
+@contextmanager
+def _sqlite_transaction(engine: Engine) -> Iterator[Connection]:
+    """
+    Runs a block in a single SQLite transaction, DDL included.
+
+    pysqlite only begins a transaction before DML, so under `engine.begin()`
+    the DROP, CREATE and ALTER TABLE statements before the first INSERT are
+    committed at once (see "Serializable isolation / Savepoints /
+    Transactional DDL" in SQLAlchemy's SQLite dialect documentation). Here
+    the driver's own handling is turned off and the transaction is begun
+    explicitly. IMMEDIATE takes the write lock up front, so two processes
+    starting together do not both upgrade the file.
+    """
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT")
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        connection.exec_driver_sql("COMMIT")
+
+
+def _with_compressed_body(row: RowMapping, columns: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds the compressed text of an old `documents` row to its copied columns."""
+    return {**columns, "body": content_store.compress_text(row["content"])}
+
+
+def _rebuild_sqlite_table(
+    connection: Connection,
+    table: Table,
+    transform: Optional[Callable[[RowMapping, Dict[str, Any]], Dict[str, Any]]] = None,
+) -> None:
+    """
+    Recreates a SQLite table from its model and copies the rows over.
+
+    The columns both versions have are copied as they are; `transform`, if
+    given, receives each old row and its copied columns and returns the row
+    to insert. The table's indexes are left to `init_db`.
+    """
+    old_columns = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    copied = [name for name in table.columns.keys() if name in old_columns]
+    staging = f"{table.name}_new"
+
+    ddl = str(CreateTable(table).compile(dialect=connection.dialect))
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {staging}")
+    connection.exec_driver_sql(ddl.replace(f"CREATE TABLE {table.name} (", f"CREATE TABLE {staging} (", 1))
+
+    names = ", ".join(copied)
+    if transform is None:
+        connection.exec_driver_sql(f"INSERT INTO {staging} ({names}) SELECT {names} FROM {table.name}")
+    else:
+        rows = connection.execute(text(f"SELECT * FROM {table.name}")).mappings()
+        for batch in rows.partitions(BATCH_ROWS):
+            values = [transform(row, {name: row[name] for name in copied}) for row in batch]
+            keys = list(values[0])
+            connection.execute(
+                text(f"INSERT INTO {staging} ({', '.join(keys)}) VALUES ({', '.join(':' + key for key in keys)})"),
+                values,
+            )
+
+    connection.exec_driver_sql(f"DROP TABLE {table.name}")
+    connection.exec_driver_sql(f"ALTER TABLE {staging} RENAME TO {table.name}")
+
+
+def _upgrade_in_place(connection: Connection) -> None:
+    """Adds the missing columns, compresses the document texts and drops the old column (PostgreSQL)."""
+    inspector = inspect(connection)
+    for table in (Base.metadata.tables["documents"], Base.metadata.tables["text_chunks"]):
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=connection.dialect)
+                unique = " UNIQUE" if column.unique else ""
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{unique}")
+
+    rows = connection.execute(text("SELECT id, content FROM documents"))
+    for batch in rows.partitions(BATCH_ROWS):
+        connection.execute(
+            text("UPDATE documents SET body = :body WHERE id = :id"),
+            [{"id": doc_id, "body": content_store.compress_text(content)} for doc_id, content in batch],
+        )
+    connection.exec_driver_sql("ALTER TABLE documents ALTER COLUMN body SET NOT NULL")
+    connection.exec_driver_sql("ALTER TABLE documents DROP COLUMN content")
+    connection.exec_driver_sql("ALTER TABLE text_chunks ALTER COLUMN content DROP NOT NULL")
@@ -3,34 +3,74 @@ Database models for the Academic Agent.
 """
 
 from datetime import datetime, timezone
+from typing import List, Optional
+
 from sqlalchemy import (
-    Column,
+    Boolean,
+    Index,
     Integer,
     String,
     Text,
+    LargeBinary,
     DateTime,
     ForeignKey,
 )
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from . import content_store
+from .fulltext import register_fulltext_ddl
+
+class Base(DeclarativeBase):
+    pass
 
-Base = declarative_base()
+# Keyword search indexes are created and dropped together with the tables.
+register_fulltext_ddl(Base.metadata)
 
 class Document(Base):
     """
     Represents a single academic document stored in the database.
     
     This could be an article, a chapter, or any piece of text that the user ingests.
+    The full text is stored compressed in `body` (see `content_store`) and read
+    through `content`, or a range of it through `content_slice`.
     """
     __tablename__ = "documents"
 
-    id = Column(Integer, primary_key=True)
-    title = Column(String(255), nullable=False)
-    source = Column(String(255))  # e.g., file path, URL
-    content = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    source: Mapped[Optional[str]] = mapped_column(String(255))  # e.g., file path, URL
+    # Deferred: listing documents must not read every full text. It is loaded on first access.
+    body: Mapped[bytes] = mapped_column(LargeBinary, nullable=False, deferred=True)
+    # SHA-256 of the uploaded file, for deduplication
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), unique=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, default=lambda: datetime.now(timezone.utc), index=True
+    )
 
     # Relationship to text chunks
-    chunks = relationship("TextChunk", back_populates="document")
+    chunks: Mapped[List["TextChunk"]] = relationship("TextChunk", back_populates="document")
+
+    @property
+    def content(self) -> str:
+        """The full text, decompressed on each access."""
+        return content_store.decompress_text(self.body)
+
+    @content.setter
+    def content(self, text: str) -> None:
+        self.body = content_store.compress_text(text)
+
+    def content_slice(self, start: int, end: int) -> str:
+        """
+        Returns `content[start:end]`, decompressing only the blocks of the body it overlaps.
+
+        The decompressed blocks are kept on the instance, so reading every
+        chunk of a document decompresses each block once.
+        """
+        body = self.body
+        cached = self.__dict__.get("_block_cache")
+        if cached is None or cached[0] is not body:
+            cached = self.__dict__["_block_cache"] = (body, {})
+        return content_store.read_slice(body, start, end, cache=cached[1])
 
     def __repr__(self):
         return f"<Document(id={self.id}, title='{self.title}')>"
@@ -40,18 +80,139 @@ class TextChunk(Base):
     Represents a smaller chunk of a larger document.
     
     Breaking down large documents into smaller chunks is essential for processing
-    with LLMs that have context window limitations.
+    with LLMs that have context window limitations. A chunk that is a range of
+    its document's text stores only the offsets; `content` reads it back from
+    the compressed document body.
     """
     __tablename__ = "text_chunks"
 
-    id = Column(Integer, primary_key=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
-    content = Column(Text, nullable=False)
-    embedding = Column(Text) # In the future, this will store vector embeddings for similarity search
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    document_id: Mapped[int] = mapped_column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    # Only set when the text is not the [char_start, char_end) range of the document.
+    stored_content: Mapped[Optional[str]] = mapped_column("content", Text)
+    # Packed little-endian float32 vector, see search.vector_index
+    embedding: Mapped[Optional[bytes]] = mapped_column(LargeBinary, deferred=True)
+
+    # Precomputed by the chunker so workflows can plan LLM batches without re-tokenizing.
+    token_count: Mapped[Optional[int]] = mapped_column(Integer)
+    char_start: Mapped[Optional[int]] = mapped_column(Integer)  # Offset of the chunk in Document.content
+    char_end: Mapped[Optional[int]] = mapped_column(Integer)
+    page_start: Mapped[Optional[int]] = mapped_column(Integer)
+    page_end: Mapped[Optional[int]] = mapped_column(Integer)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     # Relationship back to the parent document
-    document = relationship("Document", back_populates="chunks")
+    document: Mapped[Document] = relationship("Document", back_populates="chunks")
+
+    @property
+    def content(self) -> str:
+        """The text of the chunk, sliced out of the document body unless stored on the row."""
+        if self.stored_content is not None:
+            return self.stored_content
+        assert self.char_start is not None and self.char_end is not None  # Set whenever the text is not stored
+        return self.document.content_slice(self.char_start, self.char_end)
+
+    @content.setter
+    def content(self, text: str) -> None:
+        self.stored_content = text
+
+    def __repr__(self):
+        return f"<TextChunk(id={self.id}, document_id={self.document_id})>"
+
+class Job(Base):
+    """
+    Represents a workflow run executed in the background by the job runner.
+
+    Jobs are claimed by priority (highest first, then oldest) within their
+    queue, and each queue has its own worker limit.
+    """
+    __tablename__ = "jobs"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)  # Random hex ID returned to the client
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)  # Workflow to run, e.g. "abnt" or "summarize"
+    queue: Mapped[str] = mapped_column(String(50), nullable=False)
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # queued, running, succeeded, failed, cancelled
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued")
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    params: Mapped[str] = mapped_column(Text, nullable=False)  # Workflow parameters as JSON
+    input_file: Mapped[Optional[bytes]] = mapped_column(LargeBinary)  # Uploaded file, cleared when the job finishes
+    result: Mapped[Optional[str]] = mapped_column(Text)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    __table_args__ = (Index("ix_jobs_claim", "queue", "status", "priority", "created_at"),)
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}')>"
+
+class DocumentSummary(Base):
+    """
+    A stored summary of a document, so it is generated once per model and prompt.
+
+    `prompt_version` identifies the prompts and parameters that produced it and
+    `input_hash` the text that was summarized; a summary whose input hash no
+    longer matches the document is stale and is regenerated.
+    """
+    __tablename__ = "document_summaries"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    document_id: Mapped[int] = mapped_column(Integer, ForeignKey("documents.id"), nullable=False)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(64), nullable=False)
+    input_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index("ix_document_summaries_key", "document_id", "model", "prompt_version", unique=True),
+    )
+
+    def __repr__(self):
+        return f"<DocumentSummary(id={self.id}, document_id={self.document_id}, model='{self.model}')>"
+
+class ChunkSummary(Base):
+    """
+    A partial summary of a group of consecutive chunks, keyed by their content.
+
+    Shared by every document containing the same chunks, so re-ingesting an
+    edited document only summarizes the groups whose text changed.
+    """
+    __tablename__ = "chunk_summaries"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # SHA-256 of the hashes of the chunks in the group
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(64), nullable=False)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index("ix_chunk_summaries_key", "content_hash", "model", "prompt_version", unique=True),
+    )
+
+    def __repr__(self):
+        return f"<ChunkSummary(id={self.id}, content_hash='{self.content_hash[:12]}')>"
+
+class ABNTOutput(Base):
+    """
+    A stored ABNT formatting of a text, keyed by the SHA-256 of the extracted text.
+    """
+    __tablename__ = "abnt_outputs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(64), nullable=False)
+    formatted_text: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index("ix_abnt_outputs_key", "content_hash", "model", "prompt_version", unique=True),
+    )
 
     def __repr__(self):
-        return f"<TextChunk(id={self.id}, document_id={self.document_id})>" 
\ No newline at end of file
+        return f"<ABNTOutput(id={self.id}, content_hash='{self.content_hash[:12]}')>"
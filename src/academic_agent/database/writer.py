@@ -0,0 +1,106 @@
+"""
+Single-writer queue for SQLite.
+
+SQLite allows one writer at a time; when several threads write at once the
+losers spin on the busy timeout and may still fail with "database is locked".
+Engines registered with `enable_single_writer` instead send every write
+transaction made through a `@single_writer` function to one dedicated thread
+per database, which runs them one after another. Readers are unaffected (in
+WAL mode they never block the writer).
+"""
+
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Callable, Optional, TypeVar
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+_writers: "weakref.WeakKeyDictionary[Engine, SingleWriter]" = weakref.WeakKeyDictionary()
+_writers_lock = threading.Lock()
+
+
+class SingleWriter:
+    """
+    Runs write transactions one at a time on a dedicated thread.
+
+    Args:
+        name (str): Name of the writer thread.
+    """
+
+    def __init__(self, name: str = "sqlite-writer"):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._local = threading.local()
+
+    def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Runs `fn` on the writer thread and waits for its result.
+
+        Calls made from the writer thread itself (e.g. one crud write calling
+        another) run inline, so nesting cannot deadlock.
+        """
+        if getattr(self._local, "active", False):
+            return fn(*args, **kwargs)
+        return self._executor.submit(self._run_marked, fn, *args, **kwargs).result()
+
+    def shutdown(self) -> None:
+        """Stops the writer thread after the queued writes."""
+        self._executor.shutdown(wait=True)
+
+    def _run_marked(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        self._local.active = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._local.active = False
+
+
+def enable_single_writer(engine: Engine) -> SingleWriter:
+    """Routes the `@single_writer` functions called with sessions on `engine` through one writer thread."""
+    with _writers_lock:
+        writer = _writers.get(engine)
+        if writer is None:
+            writer = _writers[engine] = SingleWriter()
+        return writer
+
+
+def shutdown_single_writer(engine: Engine) -> None:
+    """
+    Stops the writer thread of `engine` once its queued writes are done.
+
+    Later writes on the engine run directly on the calling thread. Call it
+    when the application shuts down so no write is lost and no thread leaks.
+    """
+    with _writers_lock:
+        writer = _writers.pop(engine, None)
+    if writer is not None:
+        writer.shutdown()
+
+
+def get_single_writer(db: Session) -> Optional[SingleWriter]:
+    """Returns the writer of the session's engine, or None if writes run directly."""
+    bind = db.get_bind()
+    engine = bind if isinstance(bind, Engine) else getattr(bind, "engine", None)
+    return _writers.get(engine) if engine is not None else None
+
+
+def single_writer(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Decorates a write function taking the session as its first argument so
+    it runs on the engine's writer thread, if the engine has one.
+
+    The session is only used by one thread at a time: the caller waits while
+    the writer thread runs the function.
+    """
+    @wraps(fn)
+    def wrapper(db: Session, *args, **kwargs) -> T:
+        writer = get_single_writer(db)
+        if writer is None:
+            return fn(db, *args, **kwargs)
+        return writer.run(fn, db, *args, **kwargs)
+
+    return wrapper
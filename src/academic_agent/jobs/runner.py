@@ -0,0 +1,273 @@
+"""
+Background execution of long-running workflows.
+
+Jobs are stored in the `jobs` table, so their status and results survive the
+request that created them. A `JobRunner` owns a fixed number of worker threads
+per queue; each worker claims the next job of its queue (highest priority
+first) and runs it either in the worker thread itself or, with the "process"
+executor, in a shared process pool. Giving every queue its own workers means a
+large batch backlog can never take the slots reserved for interactive jobs.
+Workflows store their results through the runner's session factory; a process
+worker, which cannot receive it, opens the same database from its URL.
+
+Jobs found "running" when a runner starts were abandoned by a stopped or
+crashed process and are queued again. A database error in a worker is logged
+and the worker carries on, so the queue keeps draining.
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Literal, Optional, TYPE_CHECKING, cast, get_args
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..database import crud
+from ..database.database import SessionLocal, build_engine
+from ..validation import schemas
+from ..workflows.abnt_workflow import run_abnt_workflow
+from ..workflows.summarization_workflow import run_summarization_workflow
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+ExecuteFn = Callable[[str, Dict, Optional[bytes]], str]
+JobExecutor = Literal["thread", "process"]
+
+DEFAULT_QUEUES = "interactive:4,batch:2"
+
+_client: Optional["OpenAI"] = None
+_session_factories: Dict[str, sessionmaker] = {}  # By database URL, in process workers
+
+
+def _get_client() -> "OpenAI":
+    """Returns this process's OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI(max_retries=0)  # The LLM governor retries
+    return _client
+
+
+def _session_factory_for(database_url: str) -> sessionmaker:
+    """Returns this process's session factory for a database, creating its engine on first use."""
+    factory = _session_factories.get(database_url)
+    if factory is None:
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=build_engine(database_url))
+        _session_factories[database_url] = factory
+    return factory
+
+
+def execute_job(
+    kind: str,
+    params: Dict,
+    input_file: Optional[bytes] = None,
+    session_factory: Optional[Callable[[], Session]] = None,
+    database_url: Optional[str] = None,
+) -> str:
+    """
+    Runs the workflow of a job and returns its output.
+
+    This is a module-level function so it can be sent to a process pool.
+
+    Args:
+        kind (str): The workflow to run ("abnt" or "summarize").
+        params (Dict): The workflow parameters.
+        input_file (Optional[bytes]): The uploaded file, for workflows that read one.
+        session_factory (Optional[Callable[[], Session]]): Creates the session
+            the workflow stores its results with; `SessionLocal` by default.
+        database_url (Optional[str]): The database to open instead, in a
+            process worker, where a session factory cannot be sent.
+
+    Returns:
+        str: The workflow output.
+    """
+    if session_factory is None:
+        session_factory = _session_factory_for(database_url) if database_url else SessionLocal
+    if kind == "abnt":
+        with session_factory() as db:
+            return run_abnt_workflow(
+                _get_client(), schemas.ABNTWorkflowParams(**params, file_content=input_file), db=db
+            )
+    if kind == "summarize":
+        with session_factory() as db:
+            return run_summarization_workflow(_get_client(), db, schemas.SummarizationWorkflowParams(**params))
+    raise ValueError(f"Unknown job kind: {kind}")
+
+
+def _execute_with(session_factory: sessionmaker, executor: JobExecutor) -> ExecuteFn:
+    """Binds `execute_job` to the runner's database, by URL for process workers."""
+    bind = session_factory.kw.get("bind")
+    if executor == "process" and bind is not None:
+        return functools.partial(execute_job, database_url=bind.url.render_as_string(hide_password=False))
+    return functools.partial(execute_job, session_factory=session_factory)
+
+
+def parse_queues(spec: str) -> Dict[str, int]:
+    """
+    Parses a queue specification such as "interactive:4,batch:2".
+
+    Returns:
+        Dict[str, int]: The number of workers of each queue.
+    """
+    queues = {}
+    for item in spec.split(","):
+        name, _, workers = item.strip().partition(":")
+        if not name or not workers.isdigit() or int(workers) < 1:
+            raise ValueError(f"Invalid queue specification: {item!r}")
+        queues[name] = int(workers)
+    return queues
+
+
+class JobRunner:
+    """
+    Runs queued jobs with per-queue worker limits.
+
+    Args:
+        session_factory (sessionmaker): Creates the sessions used to claim and finish jobs.
+        queues (Dict[str, int]): The number of workers of each queue.
+        execute (Optional[ExecuteFn]): Runs a job; by default `execute_job`,
+            on the database of `session_factory`.
+        executor (JobExecutor): Where jobs run, "thread" or "process". Processes
+            sidestep the GIL for CPU-heavy parsing, at the cost of pickling
+            the inputs and the output.
+        poll_interval (float): How often idle workers look for jobs queued by
+            other processes. Jobs submitted through `notify` start at once.
+        recover_on_start (bool): Queue again the jobs of this runner's queues
+            left "running" by a previous process. Disable it when several
+            processes run workers for the same queues, as the jobs of a live
+            process would run twice.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        queues: Dict[str, int],
+        execute: Optional[ExecuteFn] = None,
+        executor: JobExecutor = "thread",
+        poll_interval: float = 1.0,
+        recover_on_start: bool = True,
+    ):
+        if executor not in get_args(JobExecutor):
+            raise ValueError(f"Unsupported job executor: {executor}")
+        self.session_factory = session_factory
+        self.queues = queues
+        self.execute = execute if execute is not None else _execute_with(session_factory, executor)
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self.recover_on_start = recover_on_start
+
+        self._wakeup = threading.Condition()
+        self._submitted = 0  # Bumped by notify, so a worker never sleeps through a new job
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls, session_factory: sessionmaker) -> "JobRunner":
+        """
+        Builds a runner configured through JOB_QUEUES (e.g. "interactive:4,batch:2"),
+        JOB_EXECUTOR ("thread" or "process"), JOB_POLL_INTERVAL_SECONDS and
+        JOB_RECOVER_ON_START.
+
+        Raises:
+            ValueError: If JOB_QUEUES or JOB_EXECUTOR is invalid.
+        """
+        executor = os.getenv("JOB_EXECUTOR", "thread")
+        if executor not in get_args(JobExecutor):
+            raise ValueError(f"Invalid JOB_EXECUTOR: {executor!r}. Use 'thread' or 'process'.")
+        return cls(
+            session_factory,
+            queues=parse_queues(os.getenv("JOB_QUEUES", DEFAULT_QUEUES)),
+            executor=cast(JobExecutor, executor),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL_SECONDS", 1.0)),
+            recover_on_start=os.getenv("JOB_RECOVER_ON_START", "true").lower() not in ("0", "false", "no"),
+        )
+
+    def start(self) -> None:
+        """Starts the worker threads (and the process pool, if configured)."""
+        self._stopping.clear()
+        if self.recover_on_start:
+            with self.session_factory() as db:
+                recovered = crud.requeue_running_jobs(db, list(self.queues))
+            if recovered:
+                logger.warning("Recovered %d job(s) left running by a previous process.", recovered)
+        if self.executor == "process":
+            self._pool = ProcessPoolExecutor(max_workers=sum(self.queues.values()))
+        for queue, workers in self.queues.items():
+            for n in range(workers):
+                thread = threading.Thread(target=self._work, args=(queue,), name=f"job-{queue}-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops the workers after their current job.
+
+        Jobs still running when `timeout` expires are abandoned in the
+        "running" state.
+        """
+        self._stopping.set()
+        self.notify()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def notify(self) -> None:
+        """Wakes idle workers up, e.g. right after a job is queued."""
+        with self._wakeup:
+            self._submitted += 1
+            self._wakeup.notify_all()
+
+    def submit(self, db: Session, job: schemas.JobCreate, input_file: Optional[bytes] = None):
+        """
+        Queues a job and wakes the workers up.
+
+        Raises:
+            ValueError: If the job targets a queue this runner does not serve.
+        """
+        if job.queue not in self.queues:
+            raise ValueError(f"Unknown queue: {job.queue}. Available queues: {', '.join(self.queues)}.")
+        db_job = crud.create_job(db, job, input_file=input_file)
+        self.notify()
+        return db_job
+
+    def _work(self, queue: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._work_once(queue)
+            except Exception:
+                logger.exception("Job worker for queue %r failed; retrying.", queue)
+                self._stopping.wait(self.poll_interval)
+
+    def _work_once(self, queue: str) -> None:
+        """Claims and runs one job of the queue, or waits for one."""
+        with self.session_factory() as db:
+            submitted = self._submitted
+            job = crud.claim_next_job(db, queue)
+            if job is None:
+                with self._wakeup:
+                    if not self._stopping.is_set() and submitted == self._submitted:
+                        self._wakeup.wait(self.poll_interval)
+                return
+
+            job_id, kind, params, input_file = job.id, job.kind, json.loads(job.params), job.input_file
+            db.expunge_all()
+            try:
+                if self._pool is not None:
+                    result = self._pool.submit(self.execute, kind, params, input_file).result()
+                else:
+                    result = self.execute(kind, params, input_file)
+            except Exception as e:
+                crud.finish_job(db, job_id, error=str(e) or type(e).__name__)
+            else:
+                crud.finish_job(db, job_id, result=result)
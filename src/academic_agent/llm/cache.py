@@ -0,0 +1,267 @@
+"""
+Persistent cache for LLM responses.
+
+Responses are keyed on everything that determines a completion (model, system
+prompt, a hash of the input, temperature and max_tokens) and stored in a local
+SQLite file, with a small in-process LRU tier in front of it. Entries expire
+after a TTL and the least recently used ones are evicted when the store grows
+past its size limits. Hits served by the in-process tier are written back to
+the disk rows' `accessed_at` in batches, at the latest before an eviction, so
+the hottest keys are not the first to be evicted.
+
+The number and total size of the stored entries are tracked as they are
+written, so a write only scans the table when it has to evict. Expired entries
+are swept, and the totals re-read from disk (another process may share the
+file), at most every `EXPIRY_SWEEP_SECONDS`.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Minimum time between two sweeps of the expired entries, in seconds.
+EXPIRY_SWEEP_SECONDS = 60.0
+
+
+@dataclass
+class CacheStats:
+    """Counters describing how the cache has been used since it was created."""
+    hits: int = 0
+    hot_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LLMResponseCache:
+    """
+    A two-tier (memory + SQLite) LRU cache for completion texts.
+
+    Args:
+        path (str): The SQLite file backing the cache.
+        ttl_seconds (float): How long an entry stays valid after it is written.
+        max_entries (int): Maximum number of entries kept on disk.
+        max_bytes (int): Maximum total size of the cached texts on disk.
+        hot_size (int): Number of entries kept in the in-process tier.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 10_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        hot_size: int = 256,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hot_size = hot_size
+        self.stats = CacheStats()
+
+        self._hot: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self._pending_touches: Dict[str, float] = {}  # Hot hits not yet written to `accessed_at`
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+        self._entries, self._bytes = self._count_stored()
+        self._next_sweep = 0.0
+
+    @staticmethod
+    def make_key(
+        model: str,
+        system_prompt: str,
+        user_input: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """
+        Builds the cache key for a completion.
+
+        The input is hashed on its own first so long documents do not have to
+        be kept around in memory as part of the key.
+        """
+        input_hash = hashlib.sha256(user_input.encode("utf-8")).hexdigest()
+        payload = json.dumps([model, system_prompt, input_hash, temperature, max_tokens])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def key_for_request(cls, request: Dict[str, Any]) -> str:
+        """Builds the cache key for a `chat.completions.create` argument dict."""
+        messages = request["messages"]
+        system_prompt = "".join(m["content"] for m in messages if m["role"] == "system")
+        user_input = "\n".join(m["content"] for m in messages if m["role"] != "system")
+        return cls.make_key(
+            request["model"], system_prompt, user_input, request.get("temperature"), request.get("max_tokens")
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached text for `key`, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            hot = self._hot.get(key)
+            if hot is not None:
+                value, created_at = hot
+                if now - created_at < self.ttl_seconds:
+                    self._hot.move_to_end(key)
+                    self._touch(key, now)
+                    self.stats.hits += 1
+                    self.stats.hot_hits += 1
+                    return value
+                del self._hot[key]
+
+            row = self._conn.execute(
+                "SELECT value, created_at, size FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._entries -= 1
+                    self._bytes -= row[2]
+                self.stats.misses += 1
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._remember(key, row[0], row[1])
+            self.stats.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Stores `value` under `key`, evicting expired and least recently used entries.
+        """
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            if replaced is None:
+                self._entries += 1
+            else:
+                self._bytes -= replaced[0]
+            self._bytes += size
+            self._remember(key, value, now)
+            self._evict(now)
+
+    def clear(self) -> None:
+        """Removes every entry from both tiers."""
+        with self._lock:
+            self._hot.clear()
+            self._pending_touches.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._entries = self._bytes = 0
+
+    def close(self) -> None:
+        """Writes the pending access times and closes the underlying SQLite connection."""
+        with self._lock:
+            self._flush_touches()
+            self._conn.close()
+
+    def _touch(self, key: str, now: float) -> None:
+        self._pending_touches[key] = now
+        if len(self._pending_touches) >= self.hot_size:
+            self._flush_touches()
+
+    def _flush_touches(self) -> None:
+        if self._pending_touches:
+            self._conn.executemany(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._pending_touches.items()],
+            )
+            self._pending_touches.clear()
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._hot[key] = (value, created_at)
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def _count_stored(self) -> "tuple[int, int]":
+        count, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+        return count, total_bytes
+
+    def _evict(self, now: float) -> None:
+        evicted = 0
+        if now >= self._next_sweep:
+            evicted = self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl_seconds,)
+            ).rowcount
+            self._entries, self._bytes = self._count_stored()
+            self._next_sweep = now + EXPIRY_SWEEP_SECONDS
+
+        if self._entries > self.max_entries or self._bytes > self.max_bytes:
+            self._flush_touches()  # Recency must include the hits served from memory
+            rows = self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at ASC")
+            stale_keys = []
+            for key, size in rows:  # Read lazily along the index, up to the last entry to evict
+                if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+                    break
+                stale_keys.append((key,))
+                self._entries -= 1
+                self._bytes -= size
+            rows.close()
+            self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale_keys)
+            for (key,) in stale_keys:
+                self._hot.pop(key, None)
+            evicted += len(stale_keys)
+
+        self.stats.evictions += evicted
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """
+    Returns the process-wide response cache, creating it on first use.
+
+    Configured through LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_ENTRIES and LLM_CACHE_MAX_BYTES. Returns None when disabled.
+    """
+    global _default_cache
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache(
+                path=os.getenv("LLM_CACHE_PATH", "./llm_cache.db"),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10_000)),
+                max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+            )
+        return _default_cache
+
+
+def set_response_cache(cache: Optional[LLMResponseCache]) -> None:
+    """Replaces the process-wide response cache (mainly for tests)."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
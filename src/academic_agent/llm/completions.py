@@ -0,0 +1,201 @@
+"""
+Shared entry point for chat completions made by the workflows.
+
+Workflows build the `chat.completions.create` arguments and a function that
+turns the API response into text; this module decides whether the call can be
+answered from the response cache and records fresh results in it. Streaming
+calls forward the text deltas as they arrive and cache the final text.
+
+Every API call is recorded in the LLM metrics (latency, calls in flight,
+tokens from `response.usage` and, for streams, the time to the first token)
+and goes through the LLM governor, which paces it under the RPM/TPM limits and
+retries transient errors. Identical non-streaming requests that miss the cache
+at the same time share a single API call. The async variants read and write
+the cache (a SQLite file) on a worker thread, off the event loop.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, TYPE_CHECKING
+
+from ..utils import metrics
+from .cache import LLMResponseCache, get_response_cache
+from .governor import get_governor
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+ExtractFn = Callable[[Any], str]
+
+
+def create_completion(
+    client: "OpenAI", request: Dict[str, Any], extract: ExtractFn, use_cache: bool = True
+) -> str:
+    """
+    Runs a chat completion, going through the response cache when enabled.
+
+    Args:
+        client (OpenAI): The OpenAI client instance.
+        request (Dict[str, Any]): Keyword arguments for `chat.completions.create`.
+        extract (ExtractFn): Validates the API response and returns its text.
+                             Errors raised here are never cached.
+        use_cache (bool): Set to False to bypass the cache for this request.
+
+    Returns:
+        str: The completion text.
+    """
+    cache = get_response_cache() if use_cache else None
+    governor = get_governor()
+    key = LLMResponseCache.key_for_request(request) if cache or governor.coalesce else None
+    if cache and key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    def send():
+        with metrics.track_llm_call("chat"):
+            return client.chat.completions.create(**request)
+
+    def fetch() -> str:
+        response = governor.call(send, request=request)
+        metrics.record_usage(getattr(response, "usage", None))
+        text = extract(response)
+        if cache and key is not None and text:
+            cache.set(key, text)
+        return text
+
+    return governor.coalesce_call(key, fetch) if key else fetch()
+
+
+async def acreate_completion(
+    client: "AsyncOpenAI", request: Dict[str, Any], extract: ExtractFn, use_cache: bool = True
+) -> str:
+    """
+    Async variant of `create_completion`.
+
+    Args:
+        client (AsyncOpenAI): The async OpenAI client instance.
+        request (Dict[str, Any]): Keyword arguments for `chat.completions.create`.
+        extract (ExtractFn): Validates the API response and returns its text.
+        use_cache (bool): Set to False to bypass the cache for this request.
+
+    Returns:
+        str: The completion text.
+    """
+    cache = get_response_cache() if use_cache else None
+    governor = get_governor()
+    key = LLMResponseCache.key_for_request(request) if cache or governor.coalesce else None
+    if cache and key is not None:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+
+    async def send():
+        with metrics.track_llm_call("chat"):
+            return await client.chat.completions.create(**request)
+
+    async def fetch() -> str:
+        response = await governor.acall(send, request=request)
+        metrics.record_usage(getattr(response, "usage", None))
+        text = extract(response)
+        if cache and key is not None and text:
+            await asyncio.to_thread(cache.set, key, text)
+        return text
+
+    return await governor.acoalesce_call(key, fetch) if key else await fetch()
+
+
+async def astream_completion(
+    client: "AsyncOpenAI", request: Dict[str, Any], use_cache: bool = True, strip: bool = False
+) -> AsyncIterator[str]:
+    """
+    Runs a chat completion with `stream=True`, yielding the text deltas.
+
+    A cached response is yielded as a single delta. Otherwise the complete
+    text is cached once the stream ends; if the consumer stops early (e.g.
+    the client disconnected) the stream is closed and nothing is cached.
+
+    Args:
+        client (AsyncOpenAI): The async OpenAI client instance.
+        request (Dict[str, Any]): Keyword arguments for `chat.completions.create`.
+        use_cache (bool): Set to False to bypass the cache for this request.
+        strip (bool): Strip leading and trailing whitespace from the text, as
+                      the non-streaming extract functions of some workflows do.
+
+    Yields:
+        str: The non-empty text deltas, in order.
+
+    Raises:
+        ValueError: If the stream ends without any text.
+    """
+    cache = get_response_cache() if use_cache else None
+    key = LLMResponseCache.key_for_request(request) if cache else None
+    if cache and key is not None:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            yield cached
+            return
+
+    start = time.perf_counter()
+    outcome = "error"
+    metrics.LLM_IN_FLIGHT.inc()
+    try:
+        # The final chunk then carries the usage, which is otherwise not reported for streams.
+        stream = await get_governor().acall(
+            lambda: client.chat.completions.create(**request, stream=True, stream_options={"include_usage": True}),
+            request=request,
+        )
+
+        async def deltas() -> AsyncIterator[str]:
+            first = True
+            async for chunk in stream:
+                metrics.record_usage(getattr(chunk, "usage", None))
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if first:
+                        metrics.LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start)
+                        first = False
+                    yield delta
+
+        parts = []
+        try:
+            async for delta in astrip_stream(deltas()) if strip else deltas():
+                parts.append(delta)
+                yield delta
+            outcome = "success"
+        except (GeneratorExit, asyncio.CancelledError):
+            outcome = "cancelled"  # The consumer stopped reading, e.g. the client disconnected
+            raise
+        finally:
+            await stream.close()
+    finally:
+        metrics.LLM_IN_FLIGHT.dec()
+        metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, operation="stream", outcome=outcome)
+
+    text = "".join(parts)
+    if not text:
+        raise ValueError("Failed to get a valid response from the API.")
+    if cache and key is not None:
+        await asyncio.to_thread(cache.set, key, text)
+
+
+async def astrip_stream(deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Strips leading and trailing whitespace from a stream of text deltas.
+
+    The concatenated output equals ``"".join(deltas).strip()``; trailing
+    whitespace is only held back until more text arrives.
+    """
+    started = False
+    pending = ""
+    async for delta in deltas:
+        if not started:
+            delta = delta.lstrip()
+            if not delta:
+                continue
+            started = True
+        text = pending + delta
+        body = text.rstrip()
+        pending = text[len(body):]
+        if body:
+            yield body
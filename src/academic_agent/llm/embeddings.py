@@ -0,0 +1,193 @@
+"""
+Pluggable text embedders.
+
+An embedder turns a list of texts into a float32 matrix with one row per text.
+`OpenAIEmbedder` calls the embeddings API in batches; `HashingEmbedder` is a
+deterministic, dependency-free local embedder used in tests and offline runs.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import List, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+
+from ..utils import metrics
+from ..utils.chunking import count_tokens
+from .governor import get_governor
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder:
+    """
+    Base class for embedders.
+
+    Subclasses implement `_embed_batch`; `embed` splits the input into batches
+    of at most `batch_size` texts so each provider call stays within its limits.
+
+    Attributes:
+        model_name (str): Identifies the vector space. Vectors produced by
+                          different models must never be compared.
+        dimensions (int): The length of each vector.
+        batch_size (int): Maximum number of texts sent in one provider call.
+    """
+
+    model_name: str = ""
+    dimensions: int = 0
+    batch_size: int = 64
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embeds the texts, batching the provider calls.
+
+        Args:
+            texts (Sequence[str]): The texts to embed.
+
+        Returns:
+            np.ndarray: A float32 array of shape (len(texts), dimensions).
+        """
+        if not texts:
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        batches = [
+            self._embed_batch(list(texts[start:start + self.batch_size]))
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        return np.vstack(batches).astype(np.float32, copy=False)
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class OpenAIEmbedder(Embedder):
+    """
+    Embeds texts with the OpenAI embeddings API.
+
+    Args:
+        client (Optional[OpenAI]): The client to use. Created on first use if omitted.
+        model_name (str): The embedding model.
+        dimensions (int): The vector length returned by the model.
+        batch_size (int): Maximum number of texts per API call.
+    """
+
+    def __init__(
+        self,
+        client: Optional["OpenAI"] = None,
+        model_name: str = "text-embedding-3-small",
+        dimensions: int = 1536,
+        batch_size: int = 128,
+    ):
+        self._client = client
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(max_retries=0)  # The governor retries
+
+        def send():
+            with metrics.track_llm_call("embedding"):
+                return self._client.embeddings.create(model=self.model_name, input=texts)
+
+        response = get_governor().call(send, tokens=sum(count_tokens(text) for text in texts))
+        metrics.record_usage(getattr(response, "usage", None))
+        data = sorted(response.data, key=lambda item: item.index)
+        return np.array([item.embedding for item in data], dtype=np.float32)
+
+
+class HashingEmbedder(Embedder):
+    """
+    A deterministic bag-of-words embedder based on feature hashing.
+
+    Each lower-cased word is hashed to a signed bucket, so texts sharing words
+    get similar vectors. It needs no network access or model weights.
+
+    Args:
+        dimensions (int): The vector length.
+        batch_size (int): Batch size reported to callers (there is no provider limit).
+    """
+
+    def __init__(self, dimensions: int = 256, batch_size: int = 256):
+        self.model_name = f"hashing-{dimensions}"
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+_default_embedder: Optional[Embedder] = None
+_default_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> Optional[Embedder]:
+    """
+    Returns the process-wide embedder, creating it on first use.
+
+    Configured through EMBEDDING_BACKEND ("auto", "openai", "hashing" or
+    "none"), EMBEDDING_MODEL, EMBEDDING_DIMENSIONS and EMBEDDING_BATCH_SIZE.
+    The default, "auto", uses OpenAI only when OPENAI_API_KEY is set, so a
+    local install without a key still ingests documents, just without
+    semantic search. Returns None when embeddings are disabled.
+    """
+    global _default_embedder
+    backend = os.getenv("EMBEDDING_BACKEND", "auto").lower()
+    if backend == "auto":
+        if not os.getenv("OPENAI_API_KEY"):
+            _warn_embeddings_disabled()
+            return None
+        backend = "openai"
+    if backend in ("none", "false", "0"):
+        return None
+    with _default_embedder_lock:
+        if _default_embedder is None:
+            if backend == "hashing":
+                _default_embedder = HashingEmbedder(
+                    dimensions=int(os.getenv("EMBEDDING_DIMENSIONS", 256)),
+                )
+            elif backend == "openai":
+                _default_embedder = OpenAIEmbedder(
+                    model_name=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+                    dimensions=int(os.getenv("EMBEDDING_DIMENSIONS", 1536)),
+                    batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 128)),
+                )
+            else:
+                raise ValueError(f"Unsupported embedding backend: {backend}")
+        return _default_embedder
+
+
+_warned_disabled = False
+
+
+def _warn_embeddings_disabled() -> None:
+    global _warned_disabled
+    if not _warned_disabled:
+        _warned_disabled = True
+        logger.warning(
+            "OPENAI_API_KEY is not set: documents are stored without embeddings and semantic search "
+            "is disabled. Set EMBEDDING_BACKEND=hashing for local embeddings."
+        )
+
+
+def set_embedder(embedder: Optional[Embedder]) -> None:
+    """Replaces the process-wide embedder (mainly for tests)."""
+    global _default_embedder
+    with _default_embedder_lock:
+        _default_embedder = embedder
@@ -0,0 +1,394 @@
+"""
+Shared governor for OpenAI API calls.
+
+Every completion and embedding call goes through the process-wide governor,
+which:
+
+- Paces requests with token buckets for requests per minute (RPM) and tokens
+  per minute (TPM), so bursts are smoothed out on our side instead of being
+  answered with 429s by the provider. A request's tokens are estimated from
+  its prompt and `max_tokens`, and corrected with the actual usage afterwards.
+- Retries rate-limit, server and connection errors with jittered exponential
+  backoff, waiting at least as long as the provider's Retry-After asks.
+- Coalesces identical in-flight requests: concurrent callers asking for the
+  same completion share a single API call and its result.
+- Bounds the wait queue. A call that would wait longer than the queue timeout,
+  or that arrives when too many calls are already waiting, fails at once with
+  an `LLMOverloadedError` that the API turns into a 429 or 503.
+
+The OpenAI SDK retries on its own as well; clients used with the governor
+should be created with `max_retries=0` so attempts are not multiplied.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from ..utils import metrics
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+RETRYABLE_ERROR_NAMES = frozenset({"APIConnectionError", "APITimeoutError"})
+
+# Completion tokens assumed for requests without max_tokens.
+DEFAULT_COMPLETION_TOKENS = 1000
+
+RESERVATIONS = metrics.REGISTRY.register(metrics.Histogram(
+    "academic_agent_llm_governor_wait_seconds",
+    "Time calls waited for rate-limit capacity before being sent.",
+))
+RETRIES = metrics.REGISTRY.register(metrics.Counter(
+    "academic_agent_llm_retries_total",
+    "OpenAI API calls retried after a retryable error.",
+))
+REJECTIONS = metrics.REGISTRY.register(metrics.Counter(
+    "academic_agent_llm_rejected_total",
+    "Calls rejected by the governor without reaching the API.",
+    ["reason"],
+))
+COALESCED = metrics.REGISTRY.register(metrics.Counter(
+    "academic_agent_llm_coalesced_total",
+    "Calls answered by sharing an identical in-flight request.",
+))
+
+
+class LLMOverloadedError(Exception):
+    """
+    Raised when a call cannot be made in time: the wait queue is full (503)
+    or the provider's rate limit leaves no capacity (429).
+
+    Attributes:
+        status_code (int): The HTTP status the API should answer with.
+        retry_after (Optional[float]): Seconds after which a retry may succeed.
+    """
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMRateLimitError(LLMOverloadedError):
+    """The call would exceed the rate limit for longer than the queue timeout allows."""
+
+    status_code = 429
+
+
+class TokenBucket:
+    """
+    A token bucket refilled at `per_minute / 60` tokens per second.
+
+    Capacity is reserved up front: taking more than is available drives the
+    level negative and returns how long the caller must wait, so callers are
+    served in arrival order without polling.
+
+    Args:
+        per_minute (float): The sustained rate.
+        burst (Optional[float]): The bucket size; one minute's worth by default.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens (at most the capacity) are available."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """Returns over-reserved tokens (or takes more, if `amount` is negative)."""
+        self.level = min(self.capacity, self.level + amount)
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """Estimates the tokens a chat request will consume: its prompt plus `max_tokens`."""
+    from ..utils.chunking import count_tokens
+
+    prompt = sum(count_tokens(str(message.get("content", ""))) for message in request.get("messages", []))
+    return prompt + int(request.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an API error is worth retrying (rate limits, server and connection errors)."""
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Reads the Retry-After (or retry-after-ms) header of an API error's response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):  # e.g. an HTTP date instead of seconds
+        return None
+    return None
+
+
+class LLMGovernor:
+    """
+    Rate limits, retries and coalesces API calls. See the module docstring.
+
+    Args:
+        rpm (float): Requests per minute; 0 disables the limit.
+        tpm (float): Tokens per minute; 0 disables the limit.
+        max_retries (int): Retries of a retryable error before giving up.
+        backoff_base (float): Base of the exponential backoff, in seconds.
+        backoff_max (float): Upper bound of a single backoff, in seconds.
+        max_waiting (int): Calls allowed to wait for capacity at the same time.
+        max_wait_seconds (float): Longest a call may wait for capacity (or a Retry-After).
+        coalesce (bool): Whether identical in-flight requests share one call.
+    """
+
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        max_waiting: int = 1000,
+        max_wait_seconds: float = 30.0,
+        coalesce: bool = True,
+    ):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_waiting = max_waiting
+        self.max_wait_seconds = max_wait_seconds
+        self.coalesce = coalesce
+
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._inflight: Dict[Tuple[Any, str], Any] = {}
+
+    @classmethod
+    def from_env(cls) -> "LLMGovernor":
+        """
+        Builds a governor configured through LLM_RPM_LIMIT, LLM_TPM_LIMIT,
+        LLM_MAX_RETRIES, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS,
+        LLM_QUEUE_MAX_WAITING, LLM_QUEUE_TIMEOUT_SECONDS and LLM_COALESCE_ENABLED.
+        """
+        return cls(
+            rpm=float(os.getenv("LLM_RPM_LIMIT", 0)),
+            tpm=float(os.getenv("LLM_TPM_LIMIT", 0)),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", 3)),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 0.5)),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 30)),
+            max_waiting=int(os.getenv("LLM_QUEUE_MAX_WAITING", 1000)),
+            max_wait_seconds=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", 30)),
+            coalesce=os.getenv("LLM_COALESCE_ENABLED", "true").lower() not in ("0", "false", "no"),
+        )
+
+    # --- Rate limiting ---
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserves capacity for one request and returns how long to wait before sending it."""
+        buckets = [(bucket, amount) for bucket, amount in ((self.requests, 1), (self.tokens, tokens)) if bucket]
+        if not buckets:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            wait = max(bucket.wait_time(amount, now) for bucket, amount in buckets)
+            if wait > self.max_wait_seconds:
+                REJECTIONS.inc(reason="timeout")
+                raise LLMRateLimitError(
+                    f"The LLM rate limit is exhausted; capacity frees up in {wait:.1f}s.", retry_after=wait
+                )
+            if wait > 0 and self._waiting >= self.max_waiting:
+                REJECTIONS.inc(reason="queue_full")
+                raise LLMOverloadedError("Too many LLM calls are waiting; try again shortly.", retry_after=wait)
+            for bucket, amount in buckets:
+                bucket.take(amount, now)
+            if wait > 0:
+                self._waiting += 1
+        RESERVATIONS.observe(wait)
+        return wait
+
+    def _done_waiting(self) -> None:
+        with self._lock:
+            self._waiting -= 1
+
+    def _settle(self, estimated: int, response: Any) -> None:
+        """Corrects the TPM bucket with the tokens the response actually used."""
+        actual = getattr(getattr(response, "usage", None), "total_tokens", None)
+        if self.tokens and isinstance(actual, int):
+            with self._lock:
+                self.tokens.give_back(estimated - actual)
+
+    def _retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """How long to wait before retrying after `error`, or None to give up."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        delay = max(backoff, retry_after_seconds(error) or 0.0)
+        return delay if delay <= self.max_wait_seconds else None
+
+    def _give_up(self, error: BaseException) -> BaseException:
+        """The error to raise once retries are exhausted: provider 429s become LLMRateLimitError."""
+        if getattr(error, "status_code", None) == 429:
+            retry_after = retry_after_seconds(error)
+            return LLMRateLimitError(f"The LLM provider is rate limiting requests: {error}", retry_after=retry_after)
+        return error
+
+    def call(self, fn: Callable[[], T], request: Optional[Dict[str, Any]] = None, tokens: Optional[int] = None) -> T:
+        """
+        Makes an API call under the rate limits, retrying retryable errors.
+
+        Args:
+            fn (Callable[[], T]): Makes the call.
+            request (Optional[Dict[str, Any]]): The chat request, to estimate its tokens.
+            tokens (Optional[int]): The tokens of the call, when there is no chat request.
+
+        Returns:
+            T: What `fn` returned.
+
+        Raises:
+            LLMOverloadedError: If the call cannot be made in time.
+        """
+        estimated = tokens if tokens is not None else estimate_tokens(request) if request else 0
+        attempt = 0
+        while True:
+            wait = self._reserve(estimated)
+            if wait:
+                try:
+                    time.sleep(wait)
+                finally:
+                    self._done_waiting()
+            try:
+                response = fn()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._give_up(e) from e
+                RETRIES.inc()
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._settle(estimated, response)
+            return response
+
+    async def acall(
+        self, fn: Callable[[], Awaitable[T]], request: Optional[Dict[str, Any]] = None, tokens: Optional[int] = None
+    ) -> T:
+        """Async variant of `call`."""
+        estimated = tokens if tokens is not None else estimate_tokens(request) if request else 0
+        attempt = 0
+        while True:
+            wait = self._reserve(estimated)
+            if wait:
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self._done_waiting()
+            try:
+                response = await fn()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._give_up(e) from e
+                RETRIES.inc()
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._settle(estimated, response)
+            return response
+
+    # --- Coalescing ---
+
+    def coalesce_call(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Runs `fn` unless an identical call (same `key`) is already in flight
+        in another thread, in which case its result is shared.
+        """
+        if not self.coalesce:
+            return fn()
+        slot = (None, key)
+        with self._lock:
+            future = self._inflight.get(slot)
+            leader = future is None
+            if leader:
+                future = self._inflight[slot] = Future()
+        if not leader:
+            COALESCED.inc()
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(slot, None)
+
+    async def acoalesce_call(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Async variant of `coalesce_call`.
+
+        The shared call runs in its own task, so a caller that is cancelled
+        (e.g. its client disconnected) does not cancel it for the others.
+        """
+        if not self.coalesce:
+            return await fn()
+        loop = asyncio.get_running_loop()
+        slot = (loop, key)
+        with self._lock:
+            task = self._inflight.get(slot)
+            if task is None:
+                task = self._inflight[slot] = loop.create_task(fn())
+                task.add_done_callback(lambda _: self._forget(slot))
+            else:
+                COALESCED.inc()
+        return await asyncio.shield(task)
+
+    def _forget(self, slot: Tuple[Any, str]) -> None:
+        with self._lock:
+            self._inflight.pop(slot, None)
+
+
+_default_governor: Optional[LLMGovernor] = None
+_default_governor_lock = threading.Lock()
+
+
+def get_governor() -> LLMGovernor:
+    """Returns the process-wide governor, creating it from the environment on first use."""
+    global _default_governor
+    with _default_governor_lock:
+        if _default_governor is None:
+            _default_governor = LLMGovernor.from_env()
+        return _default_governor
+
+
+def set_governor(governor: Optional[LLMGovernor]) -> None:
+    """Replaces the process-wide governor (mainly for tests); None rebuilds it from the environment."""
+    global _default_governor
+    with _default_governor_lock:
+        _default_governor = governor
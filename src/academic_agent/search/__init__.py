@@ -0,0 +1 @@
+# This file makes src/academic_agent/search a Python package. 
\ No newline at end of file
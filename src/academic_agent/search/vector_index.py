@@ -0,0 +1,188 @@
+"""
+In-process similarity index over stored chunk embeddings.
+
+Embeddings are stored in `TextChunk.embedding` as packed little-endian float32
+bytes. A `VectorIndex` keeps the normalized vectors of one vector space (one
+embedding model) in a single NumPy matrix, so a top-k cosine search is one
+matrix-vector product. The index is loaded from the database on first use and
+then kept up to date by appending the chunks of each new document.
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+VECTOR_DTYPE = np.dtype("<f4")
+
+# (chunk_id, document_id, packed embedding), as returned by crud.iter_chunk_embeddings
+EmbeddingRow = Tuple[int, int, Optional[bytes]]
+
+
+def pack_vector(vector: np.ndarray) -> bytes:
+    """Packs a vector as little-endian float32 bytes for storage."""
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def unpack_vector(data: bytes) -> np.ndarray:
+    """Unpacks a vector stored by `pack_vector` (without copying)."""
+    return np.frombuffer(data, dtype=VECTOR_DTYPE)
+
+
+class SearchHit(NamedTuple):
+    chunk_id: int
+    document_id: int
+    score: float
+
+
+class VectorIndex:
+    """
+    A growable matrix of unit vectors with their chunk and document IDs.
+
+    Storage grows by doubling, so appending the chunks of a new document does
+    not copy the whole matrix every time. All methods are thread-safe.
+
+    Args:
+        dimensions (int): The vector length. Stored vectors of any other
+                          length (e.g. from another model) are ignored.
+    """
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self.loaded = False
+        self._vectors = np.empty((0, dimensions), dtype=np.float32)
+        self._chunk_ids = np.empty(0, dtype=np.int64)
+        self._document_ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        self._known_ids: set = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def ensure_loaded(self, load_rows: Callable[[], Iterable[EmbeddingRow]]) -> None:
+        """
+        Loads the stored embeddings the first time it is called.
+
+        Args:
+            load_rows (Callable[[], Iterable[EmbeddingRow]]): Returns the stored
+                (chunk_id, document_id, embedding) rows, e.g. a closure over
+                `crud.iter_chunk_embeddings`.
+        """
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                self._append(load_rows())
+                self.loaded = True
+
+    def add(self, rows: Iterable[EmbeddingRow]) -> int:
+        """
+        Appends newly stored embeddings, skipping chunks already indexed.
+
+        Does nothing until the index has been loaded, since loading will pick
+        the rows up from the database anyway.
+
+        Returns:
+            int: The number of vectors added.
+        """
+        with self._lock:
+            if not self.loaded:
+                return 0
+            return self._append(rows)
+
+    def search(self, query: np.ndarray, top_k: int, document_id: Optional[int] = None) -> List[SearchHit]:
+        """
+        Returns the `top_k` chunks most similar to `query` by cosine similarity.
+
+        Args:
+            query (np.ndarray): The query vector.
+            top_k (int): The maximum number of hits.
+            document_id (Optional[int]): Restricts the search to one document.
+
+        Returns:
+            List[SearchHit]: The hits, best first.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if query.shape != (self.dimensions,):
+            raise ValueError(f"Query vector has shape {query.shape}, expected ({self.dimensions},).")
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        with self._lock:
+            size = self._size
+            vectors, chunk_ids, document_ids = self._vectors, self._chunk_ids, self._document_ids
+
+        if not size or top_k <= 0:
+            return []
+        scores = vectors[:size] @ query
+        if document_id is not None:
+            scores = np.where(document_ids[:size] == document_id, scores, -np.inf)
+        k = min(top_k, size)
+        top = np.argpartition(-scores, k - 1)[:k] if k < size else np.arange(size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            SearchHit(int(chunk_ids[i]), int(document_ids[i]), float(scores[i]))
+            for i in top
+            if np.isfinite(scores[i])
+        ]
+
+    def _append(self, rows: Iterable[EmbeddingRow]) -> int:
+        width = self.dimensions * VECTOR_DTYPE.itemsize
+        new = [
+            (chunk_id, document_id, embedding)
+            for chunk_id, document_id, embedding in rows
+            if embedding is not None and len(embedding) == width and chunk_id not in self._known_ids
+        ]
+        if not new:
+            return 0
+
+        self._reserve(self._size + len(new))
+        end = self._size + len(new)
+        block = np.frombuffer(b"".join(embedding for _, _, embedding in new), dtype=VECTOR_DTYPE)
+        block = block.reshape(len(new), self.dimensions)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        self._vectors[self._size:end] = block / np.where(norms == 0, 1.0, norms)
+        self._chunk_ids[self._size:end] = [chunk_id for chunk_id, _, _ in new]
+        self._document_ids[self._size:end] = [document_id for _, document_id, _ in new]
+        self._known_ids.update(chunk_id for chunk_id, _, _ in new)
+        self._size = end
+        return len(new)
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= len(self._vectors):
+            return
+        capacity = max(capacity, 2 * len(self._vectors), 1024)
+        # Searches read the arrays without the lock, so they are replaced, never resized in place.
+        vectors = np.empty((capacity, self.dimensions), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        chunk_ids = np.empty(capacity, dtype=np.int64)
+        chunk_ids[:self._size] = self._chunk_ids[:self._size]
+        document_ids = np.empty(capacity, dtype=np.int64)
+        document_ids[:self._size] = self._document_ids[:self._size]
+        self._vectors, self._chunk_ids, self._document_ids = vectors, chunk_ids, document_ids
+
+
+_indexes: Dict[str, VectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vector_index(model_name: str, dimensions: int) -> VectorIndex:
+    """
+    Returns the process-wide index for an embedding model, creating it if needed.
+
+    Each embedding model defines its own vector space (corpus), so each gets
+    its own index.
+    """
+    with _indexes_lock:
+        index = _indexes.get(model_name)
+        if index is None or index.dimensions != dimensions:
+            index = _indexes[model_name] = VectorIndex(dimensions)
+        return index
+
+
+def reset_vector_indexes() -> None:
+    """Drops every process-wide index (mainly for tests)."""
+    with _indexes_lock:
+        _indexes.clear()
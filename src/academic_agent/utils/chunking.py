@@ -0,0 +1,316 @@
+"""
+Utilities for splitting extracted text into chunks.
+"""
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+from .file_parser import TextSegment
+
+PARAGRAPH_SEPARATOR = "\n\n"
+
+DEFAULT_MAX_TOKENS = 512
+DEFAULT_OVERLAP_TOKENS = 64
+
+# Sentence ends followed by whitespace; the whitespace opens the next sentence.
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…:;])(?=\s)")
+
+
+class Paragraph(NamedTuple):
+    """A paragraph of text and the range of pages it spans."""
+    text: str
+    page_start: Optional[int]
+    page_end: Optional[int]
+
+
+def iter_paragraphs(segments: Iterable[TextSegment]) -> Iterator[Paragraph]:
+    """
+    Splits a stream of text segments into paragraphs on blank lines.
+
+    The result is the same as `"".join(texts).split("\\n\\n")`, including
+    separators that straddle two segments, but only the paragraph currently
+    being assembled is kept in memory.
+
+    Args:
+        segments (Iterable[TextSegment]): The extracted text, in order.
+
+    Yields:
+        Paragraph: Each paragraph with the first and last page it touches.
+    """
+    pending: list[str] = []
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+    for segment in segments:
+        text = segment.text
+        if not text:
+            continue
+        if pending and pending[-1].endswith("\n") and text.startswith("\n"):
+            # The separator is split across the segment boundary.
+            pending[-1] = pending[-1][:-1]
+            text = text[1:]
+            yield Paragraph("".join(pending), page_start, page_end)
+            pending, page_start = [], segment.page
+
+        parts = text.split(PARAGRAPH_SEPARATOR)
+        for part in parts[:-1]:
+            pending.append(part)
+            yield Paragraph("".join(pending), page_start if page_start is not None else segment.page, segment.page)
+            pending, page_start = [], segment.page
+
+        pending.append(parts[-1])
+        if page_start is None:
+            page_start = segment.page
+        page_end = segment.page
+
+    yield Paragraph("".join(pending), page_start, page_end)
+
+
+# Numbered headings ("2.1 Metodologia") or short all-caps lines ("INTRODUÇÃO").
+HEADING_PATTERN = re.compile(r"^(\d{1,2}(\.\d{1,2})*\.?\s+\S.*|[^a-zà-ÿ]*[A-ZÀ-Ý][^a-zà-ÿ]*)$")
+MAX_HEADING_CHARS = 100
+
+
+def _is_heading(piece: str) -> bool:
+    """Checks whether a paragraph looks like a section heading."""
+    line = piece.strip().split("\n", 1)[0].strip()
+    return 0 < len(line) <= MAX_HEADING_CHARS and bool(HEADING_PATTERN.match(line))
+
+
+def _split_oversized(piece: str, max_chars: int) -> list[str]:
+    """Splits a paragraph longer than `max_chars` on line breaks, then by length."""
+    if len(piece) <= max_chars:
+        return [piece]
+    parts: list[str] = []
+    for line in re.split(r"(?<=\n)", piece):
+        parts.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+    return [part for part in parts if part]
+
+
+def split_sections(text: str, max_chars: int) -> list[str]:
+    """
+    Splits text into segments of at most `max_chars`, on paragraph boundaries.
+
+    Paragraphs are packed greedily. A heading starts a new segment once the
+    current one is at least half full, so sections tend to stay together.
+    Separators are kept with the preceding paragraph, so `"".join(result)`
+    returns the original text.
+
+    Args:
+        text (str): The text to split.
+        max_chars (int): The maximum length of each segment.
+
+    Returns:
+        list[str]: The segments, in order.
+    """
+    pieces: list[str] = []
+    for paragraph in re.split(r"(?<=\n\n)", text):
+        pieces.extend(_split_oversized(paragraph, max_chars))
+
+    segments: list[str] = []
+    current: list[str] = []
+    size = 0
+    for piece in pieces:
+        starts_section = _is_heading(piece) and size >= max_chars // 2
+        if current and (size + len(piece) > max_chars or starts_section):
+            segments.append("".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece)
+    if current:
+        segments.append("".join(current))
+    return segments
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Loads the tiktoken encoding, if tiktoken is installed and usable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # Not installed, or the encoding could not be downloaded.
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens in `text`.
+
+    Uses tiktoken when it is available; otherwise falls back to the usual
+    estimate of about four characters per token.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+class Chunk(NamedTuple):
+    """A chunk of a document with its token count, character span and pages."""
+    text: str
+    token_count: int
+    char_start: int
+    char_end: int
+    page_start: Optional[int]
+    page_end: Optional[int]
+
+
+class _Unit(NamedTuple):
+    """The smallest piece the chunker packs: a paragraph, sentence or word run."""
+    text: str  # Raw text, including the separator that follows it
+    start: int
+    tokens: int
+    page_start: Optional[int]
+    page_end: Optional[int]
+
+
+def _split_to_fit(
+    text: str, start: int, max_tokens: int, count: Callable[[str], int]
+) -> Iterator[tuple[str, int, int]]:
+    """
+    Splits an oversized paragraph into sentences, and oversized sentences into
+    runs of words, yielding (text, start offset, token count) for each piece.
+    """
+    offset = start
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence_tokens = count(sentence)
+        if sentence_tokens <= max_tokens:
+            yield sentence, offset, sentence_tokens
+        else:
+            run: list[str] = []
+            run_start, run_tokens = offset, 0
+            for word in re.findall(r"\s*\S+\s*", sentence) or [sentence]:
+                word_tokens = count(word)
+                if run and run_tokens + word_tokens > max_tokens:
+                    joined = "".join(run)
+                    yield joined, run_start, run_tokens
+                    run_start += len(joined)
+                    run, run_tokens = [], 0
+                run.append(word)
+                run_tokens += word_tokens
+            if run:
+                yield "".join(run), run_start, run_tokens
+        offset += len(sentence)
+
+
+def _iter_units(
+    segments: Iterable[TextSegment], max_tokens: int, count: Callable[[str], int]
+) -> Iterator[_Unit]:
+    offset = 0
+    for paragraph in iter_paragraphs(segments):
+        raw = paragraph.text + PARAGRAPH_SEPARATOR
+        # Separators are counted too, so the budget holds for the joined text.
+        tokens = count(raw)
+        if tokens <= max_tokens:
+            # Blank paragraphs are kept so chunk text matches the original span.
+            yield _Unit(raw, offset, tokens, paragraph.page_start, paragraph.page_end)
+        else:
+            for piece, piece_start, piece_tokens in _split_to_fit(raw, offset, max_tokens, count):
+                yield _Unit(piece, piece_start, piece_tokens, paragraph.page_start, paragraph.page_end)
+        offset += len(raw)
+
+
+def _make_chunk(units: Iterable[_Unit], count: Callable[[str], int]) -> Optional[Chunk]:
+    units = list(units)
+    raw = "".join(unit.text for unit in units)
+    text = raw.strip()
+    if not text:
+        return None
+    content_units = [unit for unit in units if unit.text.strip()]
+    char_start = units[0].start + (len(raw) - len(raw.lstrip()))
+    return Chunk(
+        text=text,
+        token_count=count(text),
+        char_start=char_start,
+        char_end=char_start + len(text),
+        page_start=content_units[0].page_start,
+        page_end=content_units[-1].page_end,
+    )
+
+
+def iter_chunks(
+    segments: Iterable[TextSegment],
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    count: Callable[[str], int] = count_tokens,
+) -> Iterator[Chunk]:
+    """
+    Packs a stream of text segments into chunks of at most `max_tokens` tokens.
+
+    Whole paragraphs are packed together whenever they fit; a paragraph too
+    large for one chunk is split at sentence boundaries, and only a sentence
+    too large on its own is split between words. Consecutive chunks share up
+    to `overlap_tokens` tokens of trailing units as context.
+
+    Args:
+        segments (Iterable[TextSegment]): The extracted text, in order.
+        max_tokens (int): The token budget of each chunk.
+        overlap_tokens (int): How many tokens of the previous chunk to repeat.
+        count (Callable[[str], int]): The tokenizer used for the budget.
+
+    Yields:
+        Chunk: Each chunk with its token count, its [char_start, char_end)
+               span in the joined text, and the pages it covers.
+    """
+    window: deque[_Unit] = deque()
+    window_tokens = 0
+    fresh = False  # Whether the window holds units not yet emitted
+
+    for unit in _iter_units(segments, max_tokens, count):
+        if window and window_tokens + unit.tokens > max_tokens:
+            if fresh:
+                chunk = _make_chunk(window, count)
+                if chunk:
+                    yield chunk
+            # Keep the trailing units that fit in the overlap budget.
+            kept, kept_tokens = [], 0
+            for previous in reversed(window):
+                if kept_tokens + previous.tokens > overlap_tokens:
+                    break
+                kept.append(previous)
+                kept_tokens += previous.tokens
+            window = deque(reversed(kept))
+            window_tokens = kept_tokens
+            while window and window_tokens + unit.tokens > max_tokens:
+                window_tokens -= window.popleft().tokens
+        window.append(unit)
+        window_tokens += unit.tokens
+        fresh = True
+
+    if window and fresh:
+        chunk = _make_chunk(window, count)
+        if chunk:
+            yield chunk
+
+
+def extract_chunks(
+    segments: Iterable[TextSegment],
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> tuple[str, list[Chunk]]:
+    """
+    Consumes a segment stream once, collecting the full text and its chunks.
+
+    The text is joined a single time at the end instead of being concatenated
+    page by page, and chunks are built as the pages arrive rather than by
+    re-scanning the full text afterwards.
+
+    Args:
+        segments (Iterable[TextSegment]): The extracted text, in order.
+        max_tokens (int): The token budget of each chunk.
+        overlap_tokens (int): How many tokens consecutive chunks share.
+
+    Returns:
+        tuple[str, list[Chunk]]: The full text and its chunks.
+    """
+    pieces: list[str] = []
+
+    def tap(stream: Iterable[TextSegment]) -> Iterator[TextSegment]:
+        for segment in stream:
+            pieces.append(segment.text)
+            yield segment
+
+    chunks = list(iter_chunks(tap(segments), max_tokens=max_tokens, overlap_tokens=overlap_tokens))
+    return "".join(pieces), chunks
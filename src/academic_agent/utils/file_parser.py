@@ -2,16 +2,155 @@
 Utilities for parsing text from different file formats.
 """
 
+import hashlib
+import io
 import os
-import fitz  # PyMuPDF
-import docx
+import tempfile
+import zipfile
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Tuple, Union
 
-def read_text_from_file(file_path: str) -> str:
+# The parser backends (PyMuPDF, python-docx) are imported on first use: they
+# take hundreds of milliseconds to load and most importers never parse a file.
+
+# A file to parse: a filesystem path, the raw bytes, or a binary file-like object.
+FileSource = Union[str, os.PathLike, bytes, BinaryIO]
+
+PDF_MAGIC = b"%PDF-"
+ZIP_MAGIC = b"PK\x03\x04"
+SNIFF_SIZE = 1024
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class TextSegment(NamedTuple):
+    """
+    A piece of extracted text and the page it came from.
+
+    PDFs yield one segment per page. DOCX files yield one segment per paragraph;
+    their page number is derived from the page breaks seen so far, since Word
+    documents have no fixed layout.
+    """
+    text: str
+    page: Optional[int]
+
+
+def _docx_page_breaks(paragraph) -> int:
+    """Counts the page breaks inside a DOCX paragraph."""
+    explicit = len(paragraph._p.xpath('.//w:br[@w:type="page"]'))
+    rendered = len(paragraph._p.xpath('.//w:lastRenderedPageBreak'))
+    # Word writes a rendered break after a manual one, so don't count both.
+    return max(explicit, rendered)
+
+
+def _is_docx(stream: BinaryIO) -> bool:
+    """Checks whether a ZIP archive is a Word document."""
+    try:
+        with zipfile.ZipFile(stream) as archive:
+            return "word/document.xml" in archive.namelist()
+    except zipfile.BadZipFile:
+        return False
+    finally:
+        stream.seek(0)
+
+
+def _detect_stream_format(stream: BinaryIO, label: str) -> str:
+    """Sniffs the magic bytes of a seekable stream positioned at its start."""
+    header = stream.read(SNIFF_SIZE)
+    stream.seek(0)
+    # PDF readers accept the signature anywhere in the first kilobyte.
+    if PDF_MAGIC in header:
+        return "pdf"
+    if header.startswith(ZIP_MAGIC) and _is_docx(stream):
+        return "docx"
+    raise ValueError(f"Unsupported file format: {label}. Please use .pdf or .docx.")
+
+
+def detect_format(source: FileSource) -> str:
+    """
+    Detects whether a file is a PDF or a DOCX by looking at its content.
+
+    The filename is never consulted, so uploads with a wrong or missing
+    extension are still parsed correctly.
+
+    Args:
+        source (FileSource): A path, raw bytes or a seekable binary file object.
+
+    Returns:
+        str: Either "pdf" or "docx".
+
+    Raises:
+        FileNotFoundError: If `source` is a path that does not exist.
+        ValueError: If the content is neither a PDF nor a DOCX.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"File not found at: {source}")
+        with open(source, "rb") as f:
+            return _detect_stream_format(f, os.path.splitext(os.fsdecode(source))[1] or "unknown")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return _detect_stream_format(io.BytesIO(source), "unknown")
+
+    position = source.tell()
+    try:
+        return _detect_stream_format(source, "unknown")
+    finally:
+        source.seek(position)
+
+
+def iter_text_segments(source: FileSource) -> Iterator[TextSegment]:
+    """
+    Lazily yields the text of a .docx or .pdf file, one page or paragraph at a time.
+
+    Only the current page is held in memory, so callers can process very
+    large documents without materializing the whole text. The format is
+    detected from the content, and in-memory sources are parsed directly
+    without going through a temporary file.
+
+    Args:
+        source (FileSource): The path to the file, its raw bytes, or a
+                             seekable binary file object.
+
+    Yields:
+        TextSegment: The text of each PDF page or DOCX paragraph, in order,
+                     with its 1-based page number.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the file format is not supported.
+    """
+    file_format = detect_format(source)
+
+    if file_format == "pdf":
+        import fitz  # PyMuPDF
+
+        if isinstance(source, (str, os.PathLike)):
+            pdf = fitz.open(source)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            pdf = fitz.open(stream=source, filetype="pdf")
+        else:
+            pdf = fitz.open(stream=source.read(), filetype="pdf")
+        with pdf:
+            for page_number, page in enumerate(pdf, start=1):
+                yield TextSegment(page.get_text(), page_number)  # type: ignore
+    else:
+        import docx
+
+        if isinstance(source, (str, os.PathLike)):
+            doc = docx.Document(os.fsdecode(source))
+        else:
+            doc = docx.Document(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+        page_number = 1
+        for para in doc.paragraphs:
+            yield TextSegment(para.text + "\n", page_number)
+            page_number += _docx_page_breaks(para)
+
+
+def read_text_from_file(source: FileSource) -> str:
     """
     Reads text content from a .docx or .pdf file.
 
     Args:
-        file_path (str): The path to the file.
+        source (FileSource): The path to the file, its raw bytes, or a
+                             seekable binary file object.
 
     Returns:
         str: The extracted text from the file.
@@ -20,21 +159,45 @@ def read_text_from_file(file_path: str) -> str:
         FileNotFoundError: If the file does not exist.
         ValueError: If the file format is not supported.
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found at: {file_path}")
+    return "".join(segment.text for segment in iter_text_segments(source))
 
-    _, extension = os.path.splitext(file_path)
-    text = ""
 
-    if extension.lower() == ".pdf":
-        with fitz.open(file_path) as doc:
-            for page in doc:
-                text += page.get_text()  # type: ignore
-    elif extension.lower() == ".docx":
-        doc = docx.Document(file_path)
-        for para in doc.paragraphs:
-            text += para.text + "\n"
-    else:
-        raise ValueError(f"Unsupported file format: {extension}. Please use .pdf or .docx.")
+def read_and_hash(stream: BinaryIO, spool_threshold: int) -> Tuple[FileSource, str]:
+    """
+    Reads a binary stream once, computing its SHA-256 digest on the way.
+
+    Streams up to `spool_threshold` bytes are returned in memory; larger ones
+    are copied block by block to a temporary file, whose path is returned
+    instead (the caller deletes it). Either way the content is read only once.
+
+    Args:
+        stream (BinaryIO): The stream to read, from its current position.
+        spool_threshold (int): The largest size kept in memory, in bytes.
 
-    return text 
\ No newline at end of file
+    Returns:
+        Tuple[FileSource, str]: The content (bytes or a temporary file path)
+                                and its hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    spool = None
+    try:
+        while block := stream.read(READ_BLOCK_SIZE):
+            digest.update(block)
+            if spool is None and len(buffer) + len(block) > spool_threshold:
+                spool = tempfile.NamedTemporaryFile(delete=False)
+                spool.write(buffer)
+                buffer = bytearray()
+            if spool is None:
+                buffer += block
+            else:
+                spool.write(block)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        raise
+    if spool is None:
+        return bytes(buffer), digest.hexdigest()
+    spool.close()
+    return spool.name, digest.hexdigest()
@@ -0,0 +1,27 @@
+"""
+Content hashes used to key stored workflow results.
+"""
+
+import hashlib
+import json
+from typing import Any, Iterable
+
+
+def text_hash(text: str) -> str:
+    """Returns the hex SHA-256 digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def combined_hash(hashes: Iterable[str]) -> str:
+    """Returns one digest for an ordered sequence of digests, e.g. of a document's chunks."""
+    return text_hash("\n".join(hashes))
+
+
+def prompt_version(*parts: Any) -> str:
+    """
+    Derives a version identifier from everything that shapes an LLM output.
+
+    Pass the prompts and generation parameters; changing any of them changes
+    the version, so results stored under the old one are no longer reused.
+    """
+    return text_hash(json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str))[:16]
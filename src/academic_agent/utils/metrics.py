@@ -0,0 +1,310 @@
+"""
+Process-wide metrics exposed in the Prometheus text format.
+
+A small, dependency-free implementation of the three Prometheus metric types
+the app needs: counters, gauges (optionally computed when scraped) and
+histograms with fixed buckets. Updates take one lock acquisition and a few
+additions, so the hot paths can be instrumented unconditionally.
+
+The metrics of the app are defined at the bottom of this module; `/metrics`
+serves `REGISTRY.render()`.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+MetricT = TypeVar("MetricT", bound="_Metric")
+
+# Seconds; covers sub-millisecond DB writes up to multi-minute LLM calls.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base class: a named metric with a fixed set of label names."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels_text(self, key: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. tokens consumed."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items()) or ([((), 0.0)] if not self.labelnames else [])
+        for key, value in items:
+            yield f"{self.name}{self._labels_text(key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down, e.g. calls in flight.
+
+    Unlabelled gauges can instead be computed when scraped with `set_function`,
+    for values owned by another object (such as a connection pool).
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Optional[Callable[[], float]]) -> None:
+        """Computes the (unlabelled) value with `function` at every scrape; None clears it."""
+        if self.labelnames:
+            raise ValueError("Only unlabelled gauges can be computed on scrape.")
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterable[str]:
+        if self._function is not None:
+            try:
+                yield f"{self.name} {_format_value(float(self._function()))}"
+            except Exception:  # A broken callback must not take /metrics down.
+                pass
+            return
+        with self._lock:
+            items = sorted(self._values.items()) or ([((), 0.0)] if not self.labelnames else [])
+        for key, value in items:
+            yield f"{self.name}{self._labels_text(key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """
+    Observations counted in cumulative buckets, e.g. stage durations.
+
+    Args:
+        buckets (Sequence[float]): The upper bounds of the buckets; +Inf is implied.
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative, last is +Inf), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            state[0][index] += 1
+            state[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes the wall time spent in the block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def sum(self, **labels: str) -> float:
+        state = self._values.get(self._key(labels))
+        return state[1][0] if state else 0.0
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{self._labels_text(key, ('le', _format_value(bound)))} {cumulative}"
+            yield f"{self.name}_sum{self._labels_text(key)} {_format_value(total)}"
+            yield f"{self.name}_count{self._labels_text(key)} {cumulative}"
+
+
+class Registry:
+    """A collection of metrics rendered together."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: MetricT) -> MetricT:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+def time_iterator(iterator: Iterable[T], on_done: Callable[[float], None]) -> Iterator[T]:
+    """
+    Yields from `iterator`, adding up only the time spent producing items.
+
+    Used to split the time of a streaming pipeline between its producer (e.g.
+    the PDF parser) and its consumer (the chunker). `on_done` receives the
+    total once the iterator is exhausted or closed.
+    """
+    elapsed = 0.0
+    items = iter(iterator)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                return
+            elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        on_done(elapsed)
+
+
+# --- Metrics of the app ---
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "academic_agent_stage_duration_seconds",
+    "Time spent in each stage of request processing (upload, parse, chunk, embed, db_write).",
+    ["stage"],
+))
+LLM_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "academic_agent_llm_request_duration_seconds",
+    "Latency of OpenAI API calls, until the full response was received.",
+    ["operation", "outcome"],
+))
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = REGISTRY.register(Histogram(
+    "academic_agent_llm_time_to_first_token_seconds",
+    "Time from sending a streaming completion request to its first text delta.",
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "academic_agent_llm_tokens_total",
+    "Tokens reported in the usage of OpenAI API responses.",
+    ["type"],
+))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "academic_agent_llm_requests_in_flight",
+    "OpenAI API calls currently in progress.",
+))
+DB_POOL_CHECKED_OUT = REGISTRY.register(Gauge(
+    "academic_agent_db_pool_checked_out_connections",
+    "Database connections currently checked out of the pool.",
+))
+DB_POOL_SIZE = REGISTRY.register(Gauge(
+    "academic_agent_db_pool_size",
+    "Configured size of the database connection pool.",
+))
+
+
+def record_usage(usage) -> None:
+    """Adds the prompt and completion tokens of an API response's `usage` to LLM_TOKENS."""
+    for token_type in ("prompt", "completion"):
+        count = getattr(usage, f"{token_type}_tokens", None)
+        if isinstance(count, int) and count > 0:
+            LLM_TOKENS.inc(count, type=token_type)
+
+
+@contextmanager
+def track_llm_call(operation: str) -> Iterator[None]:
+    """Counts an API call as in flight and observes its latency and outcome."""
+    start = time.perf_counter()
+    outcome = "error"
+    LLM_IN_FLIGHT.inc()
+    try:
+        yield
+        outcome = "success"
+    finally:
+        LLM_IN_FLIGHT.dec()
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, operation=operation, outcome=outcome)
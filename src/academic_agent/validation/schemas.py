@@ -2,17 +2,22 @@
 Pydantic schemas for data validation.
 """
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 # --- TextChunk Schemas ---
 
 class TextChunkBase(BaseModel):
     content: str
-    
+    token_count: Optional[int] = None
+    char_start: Optional[int] = None
+    char_end: Optional[int] = None
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
 class TextChunkCreate(TextChunkBase):
-    pass
+    embedding: Optional[bytes] = None  # Packed float32 vector; never returned by the API
 
 class TextChunk(TextChunkBase):
     id: int
@@ -28,6 +33,7 @@ class DocumentBase(BaseModel):
     title: str
     source: Optional[str] = None
     content: str
+    content_hash: Optional[str] = None  # SHA-256 of the uploaded file
 
 class DocumentCreate(DocumentBase):
     pass
@@ -40,22 +46,201 @@ class Document(DocumentBase):
     class Config:
         from_attributes = True
 
+class DocumentView(BaseModel):
+    """A projection of a document.
+
+    The "metadata" view only has the fields up to `chunk_count`; the
+    "content" view adds `content` and the "full" view adds `content` and
+    `chunks`. Fields outside the requested view are omitted from responses.
+    """
+    id: int
+    title: str
+    source: Optional[str] = None
+    content_hash: Optional[str] = None
+    created_at: datetime.datetime
+    chunk_count: int
+    content: Optional[str] = None
+    chunks: Optional[List[TextChunk]] = None
+
+class DocumentPage(BaseModel):
+    """A page of documents; pass `next_cursor` as `after` to get the next one."""
+    items: List[DocumentView]
+    next_cursor: Optional[int] = None
+
+class TextChunkPage(BaseModel):
+    """A page of text chunks; pass `next_cursor` as `after` to get the next one."""
+    items: List[TextChunk]
+    next_cursor: Optional[int] = None
+
+DocumentViewName = Literal["metadata", "content", "full"]
+
+class BatchIngestResult(BaseModel):
+    """The outcome of one file of a batch upload.
+
+    `status` is "created" for a new document, "existing" when the same file
+    was already stored (or appears earlier in the batch) and "failed" when
+    the file could not be parsed, in which case `error` says why.
+    """
+    filename: str
+    status: Literal["created", "existing", "failed"]
+    document_id: Optional[int] = None
+    chunk_count: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchIngestResponse(BaseModel):
+    """Per-file results of a batch upload, in upload order."""
+    results: List[BatchIngestResult]
+    created: int
+    existing: int
+    failed: int
+
 # --- Workflow Schemas ---
 
 class ABNTWorkflowParams(BaseModel):
-    """Parameters for the ABNT formatting workflow."""
-    file_path: str
+    """Parameters for the ABNT formatting workflow.
+
+    The file is given either by path or, for uploads parsed in memory, as raw bytes.
+    Texts longer than `segment_chars` are formatted in segments, at most
+    `max_concurrency` at a time, each seeing the last `overlap_chars` of the
+    previous segment as context. API errors are retried by the LLM governor
+    (LLM_MAX_RETRIES).
+    """
+    file_path: Optional[str] = None
+    file_content: Optional[bytes] = None
     model_name: str = "gpt-4.1-nano"
+    use_cache: bool = True  # Set to False to force a fresh LLM call
+    segment_chars: int = Field(default=8_000, ge=100)
+    overlap_chars: int = Field(default=400, ge=0)
+    max_concurrency: int = Field(default=8, ge=1)
+
+    @model_validator(mode="after")
+    def check_file_source(self) -> "ABNTWorkflowParams":
+        if self.file_path is None and self.file_content is None:
+            raise ValueError("Either 'file_path' or 'file_content' must be provided.")
+        return self
+
+    @property
+    def file_source(self):
+        """The in-memory content if present, otherwise the file path."""
+        return self.file_content if self.file_content is not None else self.file_path
 
 class ABNTWorkflowResponse(BaseModel):
     """Response model for the ABNT formatting workflow."""
     formatted_text: str
 
+class WritingWorkflowParams(BaseModel):
+    """Parameters for the writing workflow.
+
+    `mode="long_form"` first asks for an outline of `sections` sections, then
+    writes every section concurrently (at most `max_concurrency` calls at a
+    time, each up to `section_max_tokens`) with the outline as shared context.
+    With `consistency_pass`, each section is then revised against its
+    neighbours, also concurrently, before the sections are joined.
+    """
+    prompt: str = Field(min_length=1)
+    model_name: str = "gpt-4.1-nano"
+    use_cache: bool = True  # Set to False to force a fresh LLM call
+    mode: Literal["single", "long_form"] = "single"
+    sections: int = Field(default=5, ge=1, le=20)
+    section_max_tokens: int = Field(default=1000, ge=50)
+    max_concurrency: int = Field(default=8, ge=1)
+    consistency_pass: bool = True
+
 class SummarizationWorkflowParams(BaseModel):
-    """Parameters for the summarization workflow."""
+    """Parameters for the summarization workflow.
+
+    `mode="hierarchical"` summarizes the document's stored chunks as a tree:
+    groups of up to `fan_out` parts are summarized concurrently (at most
+    `max_concurrency` calls at a time) and reduced level by level, for at most
+    `max_depth` levels, until the parts fit in `max_input_chars`.
+    """
     document_id: int
     model_name: str = "gpt-4.1-nano"
+    use_cache: bool = True  # Set to False to force a fresh LLM call
+    mode: Literal["single", "hierarchical"] = "single"
+    fan_out: int = Field(default=8, ge=2)
+    max_depth: int = Field(default=3, ge=1)
+    max_concurrency: int = Field(default=8, ge=1)
+    max_input_chars: int = Field(default=12_000, ge=1)
 
 class SummarizationWorkflowResponse(BaseModel):
     """Response model for the summarization workflow."""
-    summary: str 
\ No newline at end of file
+    summary: str
+
+class SearchParams(BaseModel):
+    """Parameters for the semantic search over stored chunks.
+
+    Returns the `top_k` chunks most similar to `query`, optionally restricted
+    to a single document.
+    """
+    query: str = Field(min_length=1)
+    top_k: int = Field(default=5, ge=1, le=100)
+    document_id: Optional[int] = None
+
+class SearchResult(BaseModel):
+    """A chunk returned by the search, with its cosine similarity to the query."""
+    chunk_id: int
+    document_id: int
+    score: float
+    content: str
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+class SearchResponse(BaseModel):
+    """Response model for the semantic search."""
+    results: List[SearchResult]
+
+class KeywordSearchParams(BaseModel):
+    """Parameters for the keyword (full-text) search.
+
+    Every word of `query` must appear in a hit. `scope` selects whether text
+    chunks or whole documents are searched; results are ranked by relevance
+    and paginated with `limit` and `offset`.
+    """
+    query: str = Field(min_length=1)
+    scope: Literal["chunks", "documents"] = "chunks"
+    document_id: Optional[int] = None
+    limit: int = Field(default=20, ge=1, le=100)
+    offset: int = Field(default=0, ge=0)
+
+class KeywordSearchResult(BaseModel):
+    """A document or chunk matching the keyword search."""
+    document_id: int
+    chunk_id: Optional[int] = None
+    title: str
+    snippet: str
+    score: float
+
+class KeywordSearchResponse(BaseModel):
+    """Response model for the keyword search."""
+    results: List[KeywordSearchResult]
+    has_more: bool
+
+# --- Job Schemas ---
+
+class JobBase(BaseModel):
+    kind: Literal["abnt", "summarize"]
+    queue: str = "interactive"
+    priority: int = 0  # Higher runs first within the queue
+
+class JobCreate(JobBase):
+    params: str  # Workflow parameters as JSON
+
+class Job(JobBase):
+    id: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    cancel_requested: bool = False
+    result: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime.datetime
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class SummarizationJobRequest(BaseModel):
+    """Request body for running the summarization workflow as a background job."""
+    params: SummarizationWorkflowParams
+    queue: str = "interactive"
+    priority: int = 0
@@ -1,24 +1,168 @@
 """
 Workflow for formatting text from a DOCX or PDF file according to ABNT standards.
+
+Long documents are split on section/paragraph boundaries into segments that
+are formatted concurrently and reassembled in order. Each segment carries the
+end of the previous one as read-only context. Transient API errors are retried
+per call by the LLM governor, so a failure only repeats the request of the
+segment that hit it; any other error fails the workflow.
+
+`astream_abnt_workflow` streams the formatted text: the first segment is
+forwarded as it is generated while the following ones are buffered until
+their turn.
+
+Given a database session, the formatted text is stored by the hash of the
+extracted text, the model and the prompt version, and formatting the same
+text again returns the stored result without calling the LLM.
 """
 
-from openai import OpenAI
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, NoReturn, Optional, TYPE_CHECKING, Union
 
+from sqlalchemy.orm import Session
+
+from ..llm.completions import acreate_completion, astream_completion, create_completion
+from ..database import crud
+from ..llm.governor import LLMOverloadedError
+from ..utils.hashing import prompt_version, text_hash
 from ..validation import schemas
+from ..utils.chunking import split_sections
 from ..utils.file_parser import read_text_from_file
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+SYSTEM_PROMPT = (
+    "Você é um especialista em formatação de textos acadêmicos segundo as normas da ABNT. "
+    "Sua tarefa é reformatar o texto fornecido para que ele siga estritamente as regras da ABNT, "
+    "incluindo citações, referências, formatação de parágrafos, e estrutura geral. "
+    "Não altere o conteúdo semântico, apenas a formatação."
+)
+
+SEGMENT_INSTRUCTIONS = (
+    " O texto é um trecho de um documento maior. Quando houver um contexto anterior, "
+    "use-o apenas como referência para manter a consistência: não o reformate nem o "
+    "inclua na resposta. Retorne somente o trecho formatado."
+)
+
+EMPTY_FILE_MESSAGE = "The file is empty or contains no readable text."
+
+SEGMENT_SEPARATOR = "\n\n"
+
+TEMPERATURE = 0.3
+
+
+def _build_request(
+    params: schemas.ABNTWorkflowParams, text_to_format: str, context: Optional[str] = None
+) -> dict:
+    """
+    Builds the chat completion arguments shared by the sync and async paths.
+
+    Without `context` the whole text is sent as is. With it (segmented mode)
+    the preceding text is included for reference only.
+    """
+    if context is None:
+        system_prompt, user_content = SYSTEM_PROMPT, text_to_format
+    else:
+        system_prompt = SYSTEM_PROMPT + SEGMENT_INSTRUCTIONS
+        user_content = f"Trecho a formatar:\n{text_to_format}"
+        if context:
+            user_content = f"Contexto anterior (não reformatar):\n{context}\n\n{user_content}"
+    return {
+        "model": params.model_name,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ],
+        "temperature": TEMPERATURE,
+    }
+
+
+def _extract_formatted_text(response) -> str:
+    """Validates the API response and returns the formatted text."""
+    formatted_text = response.choices[0].message.content
+    if formatted_text is None:
+        raise ValueError("Failed to get a valid response from the API.")
+    return formatted_text
+
+
+def _plan_requests(params: schemas.ABNTWorkflowParams, text_to_format: str) -> List[dict]:
+    """
+    Splits the text into segments and builds one request per segment.
+
+    A text that fits in a single segment produces the same single request as
+    before segmentation existed.
+    """
+    segments = split_sections(text_to_format, params.segment_chars)
+    if len(segments) == 1:
+        return [_build_request(params, text_to_format)]
+
+    requests = []
+    for index, segment in enumerate(segments):
+        context = segments[index - 1][-params.overlap_chars:] if index and params.overlap_chars else ""
+        requests.append(_build_request(params, segment, context=context))
+    return requests
+
+
+def _output_version(params: schemas.ABNTWorkflowParams) -> str:
+    """The version of everything that shapes the formatted text, under which it is stored."""
+    return prompt_version(
+        SYSTEM_PROMPT, SEGMENT_INSTRUCTIONS, TEMPERATURE, params.segment_chars, params.overlap_chars
+    )
+
+
+def _load_stored_output(db: Session, params: schemas.ABNTWorkflowParams, text_to_format: str) -> Optional[str]:
+    """Returns the stored formatting of the text, if any."""
+    if not params.use_cache:
+        return None
+    try:
+        return crud.get_abnt_output(db, text_hash(text_to_format), params.model_name, _output_version(params))
+    finally:
+        db.commit()  # Ends the read transaction, so no connection is held during the LLM calls
 
-def run_abnt_workflow(client: OpenAI, params: schemas.ABNTWorkflowParams) -> str:
+
+def _save_output(db: Session, params: schemas.ABNTWorkflowParams, text_to_format: str, formatted_text: str) -> None:
+    """Stores the formatted text under the hash of the text it formats."""
+    crud.save_abnt_output(db, text_hash(text_to_format), params.model_name, _output_version(params), formatted_text)
+
+
+def _reassemble(formatted_segments: List[str]) -> str:
+    """Joins the formatted segments back together in document order."""
+    if len(formatted_segments) == 1:
+        return formatted_segments[0]
+    return SEGMENT_SEPARATOR.join(segment.strip() for segment in formatted_segments)
+
+
+def _raise_segment_failure(index: int, total: int, error: Exception) -> NoReturn:
+    """
+    Re-raises a segment's error, naming the segment when there are several.
+
+    Overload errors from the LLM governor are re-raised as they are, so the
+    API can still answer them with 429/503.
+    """
+    if total == 1 or isinstance(error, LLMOverloadedError):
+        raise error
+    raise ValueError(f"Failed to format segment {index + 1} of {total}: {error}") from error
+
+
+def run_abnt_workflow(
+    client: "OpenAI", params: schemas.ABNTWorkflowParams, db: Optional[Session] = None
+) -> str:
     """
     Runs the ABNT formatting workflow on a file.
 
-    This function takes a file path, extracts the text, and uses an OpenAI model
-    to format it according to ABNT (Brazilian Association of Technical Standards) rules.
+    This function takes a file (by path or in-memory content), extracts the
+    text, and uses an OpenAI model to format it according to ABNT (Brazilian
+    Association of Technical Standards) rules. Segments are formatted on a
+    thread pool of `params.max_concurrency` workers.
 
     Args:
         client (OpenAI): The OpenAI client instance.
         params (schemas.ABNTWorkflowParams): The parameters for the workflow,
                                              validated by Pydantic.
+        db (Optional[Session]): Stores the result and reuses a stored one, if given.
 
     Returns:
         str: The text formatted according to ABNT standards.
@@ -26,29 +170,159 @@ def run_abnt_workflow(client: OpenAI, params: schemas.ABNTWorkflowParams) -> str
     Raises:
         ValueError: If the file is invalid or the API call fails.
     """
-    text_to_format = read_text_from_file(params.file_path)
+    text_to_format = read_text_from_file(params.file_source)
 
     if not text_to_format.strip():
-        return "The file is empty or contains no readable text."
+        return EMPTY_FILE_MESSAGE
+    if db is not None and (stored := _load_stored_output(db, params, text_to_format)) is not None:
+        return stored
 
-    system_prompt = (
-        "Você é um especialista em formatação de textos acadêmicos segundo as normas da ABNT. "
-        "Sua tarefa é reformatar o texto fornecido para que ele siga estritamente as regras da ABNT, "
-        "incluindo citações, referências, formatação de parágrafos, e estrutura geral. "
-        "Não altere o conteúdo semântico, apenas a formatação."
-    )
+    requests = _plan_requests(params, text_to_format)
 
-    response = client.chat.completions.create(
-        model=params.model_name,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": text_to_format},
-        ],
-        temperature=0.3,
-    )
+    def format_segment(index: int) -> str:
+        try:
+            return create_completion(client, requests[index], _extract_formatted_text, use_cache=params.use_cache)
+        except Exception as e:
+            _raise_segment_failure(index, len(requests), e)
 
-    formatted_text = response.choices[0].message.content
-    if formatted_text is None:
-        raise ValueError("Failed to get a valid response from the API.")
+    if len(requests) == 1:
+        formatted_text = format_segment(0)
+    else:
+        with ThreadPoolExecutor(max_workers=params.max_concurrency) as executor:
+            formatted_text = _reassemble(list(executor.map(format_segment, range(len(requests)))))
+
+    if db is not None:
+        _save_output(db, params, text_to_format, formatted_text)
+    return formatted_text
+
+
+async def arun_abnt_workflow(
+    client: "AsyncOpenAI", params: schemas.ABNTWorkflowParams, db: Optional[Session] = None
+) -> str:
+    """
+    Async variant of `run_abnt_workflow`.
+
+    File parsing is CPU-bound, so it runs in a worker thread; the segment
+    calls are awaited concurrently (at most `params.max_concurrency` at a
+    time), so the total time is close to that of the slowest segment.
+
+    Args:
+        client (AsyncOpenAI): The async OpenAI client instance.
+        params (schemas.ABNTWorkflowParams): The parameters for the workflow.
+        db (Optional[Session]): Stores the result and reuses a stored one, if given.
+
+    Returns:
+        str: The text formatted according to ABNT standards.
+
+    Raises:
+        ValueError: If the file is invalid or the API call fails.
+    """
+    text_to_format = await asyncio.to_thread(read_text_from_file, params.file_source)
+
+    if not text_to_format.strip():
+        return EMPTY_FILE_MESSAGE
+    if db is not None:
+        stored = await asyncio.to_thread(_load_stored_output, db, params, text_to_format)
+        if stored is not None:
+            return stored
+
+    requests = _plan_requests(params, text_to_format)
+    semaphore = asyncio.Semaphore(params.max_concurrency)
+
+    async def format_segment(index: int) -> str:
+        async with semaphore:
+            try:
+                return await acreate_completion(
+                    client, requests[index], _extract_formatted_text, use_cache=params.use_cache
+                )
+            except Exception as e:
+                _raise_segment_failure(index, len(requests), e)
+
+    formatted_text = _reassemble(list(await asyncio.gather(*(format_segment(i) for i in range(len(requests))))))
+    if db is not None:
+        await asyncio.to_thread(_save_output, db, params, text_to_format, formatted_text)
+    return formatted_text
+
+
+async def astream_abnt_workflow(
+    client: "AsyncOpenAI", params: schemas.ABNTWorkflowParams, db: Optional[Session] = None
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of `arun_abnt_workflow`.
+
+    All segments are requested concurrently (at most `params.max_concurrency`
+    at a time), as in the non-streaming workflow, but their deltas are yielded
+    in document order. The joined deltas equal the text `arun_abnt_workflow`
+    returns. As there, transient API errors are retried by the LLM governor
+    when a segment's stream is opened; an error while streaming ends the stream.
+
+    Args:
+        client (AsyncOpenAI): The async OpenAI client instance.
+        params (schemas.ABNTWorkflowParams): The parameters for the workflow.
+        db (Optional[Session]): Stores the result once the stream ends and
+                                yields a stored one as a single delta, if given.
+
+    Yields:
+        str: Pieces of the formatted text, in order.
+
+    Raises:
+        ValueError: If the file is invalid or the API call fails.
+    """
+    text_to_format = await asyncio.to_thread(read_text_from_file, params.file_source)
+
+    if not text_to_format.strip():
+        yield EMPTY_FILE_MESSAGE
+        return
+    if db is not None:
+        stored = await asyncio.to_thread(_load_stored_output, db, params, text_to_format)
+        if stored is not None:
+            yield stored
+            return
+
+    parts = []
+    async for delta in _astream_segments(client, params, _plan_requests(params, text_to_format)):
+        parts.append(delta)
+        yield delta
+    if db is not None:
+        await asyncio.to_thread(_save_output, db, params, text_to_format, "".join(parts))
+
+
+async def _astream_segments(
+    client: "AsyncOpenAI", params: schemas.ABNTWorkflowParams, requests: List[dict]
+) -> AsyncIterator[str]:
+    """Streams the formatted segments in order; see `astream_abnt_workflow`."""
+    if len(requests) == 1:
+        async for delta in astream_completion(client, requests[0], use_cache=params.use_cache):
+            yield delta
+        return
+
+    semaphore = asyncio.Semaphore(params.max_concurrency)
+    # Each segment's deltas, then None when it is done or the exception that ended it.
+    outputs: List["asyncio.Queue[Union[str, Exception, None]]"] = [asyncio.Queue() for _ in requests]
+
+    async def stream_segment(index: int) -> None:
+        async with semaphore:
+            try:
+                async for delta in astream_completion(client, requests[index], use_cache=params.use_cache, strip=True):
+                    outputs[index].put_nowait(delta)
+                outputs[index].put_nowait(None)
+            except Exception as e:
+                try:
+                    _raise_segment_failure(index, len(requests), e)
+                except Exception as failure:
+                    outputs[index].put_nowait(failure)
 
-    return formatted_text 
\ No newline at end of file
+    tasks = [asyncio.create_task(stream_segment(i)) for i in range(len(requests))]
+    try:
+        for index, output in enumerate(outputs):
+            if index:
+                yield SEGMENT_SEPARATOR
+            while (item := await output.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+    finally:
+        # Stops the remaining calls if the consumer goes away (e.g. the client disconnected).
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,366 @@
+"""
+Workflow for ingesting an uploaded file as a document with its text chunks.
+
+Uploads are content-addressed: when the SHA-256 digest of the file is given
+and a document with the same digest already exists, that document (with its
+chunks and embeddings) is returned without parsing the file again.
+
+`run_batch_ingest_workflow` ingests many files at once: parsing, which is
+CPU-bound and holds the GIL, is fanned out to a process pool sized to the
+cores (INGEST_PARSE_WORKERS), and the new documents are inserted in a single
+transaction.
+
+The time spent parsing, chunking, embedding and writing to the database is
+recorded per stage in `metrics.STAGE_SECONDS`.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database import crud, models
+from ..llm.embeddings import Embedder
+from ..search.vector_index import pack_vector
+from ..utils.chunking import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, Chunk, extract_chunks
+from ..utils import metrics
+from ..utils.file_parser import FileSource, iter_text_segments
+from ..validation import schemas
+from . import search_workflow
+
+
+class ParsedFile(NamedTuple):
+    """The text and chunks of a parsed file, with the time spent on each step."""
+    content: str
+    chunks: List[Chunk]
+    parse_seconds: float
+    chunk_seconds: float
+
+
+class BatchFile(NamedTuple):
+    """One file of a batch upload: its name, content (bytes or a path) and SHA-256 digest."""
+    filename: str
+    source: FileSource
+    content_hash: Optional[str] = None
+
+
+def parse_file(
+    source: FileSource, max_tokens: int = DEFAULT_MAX_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS
+) -> ParsedFile:
+    """
+    Extracts the text of a file and splits it into chunks.
+
+    Defined at module level and free of database access so it can run in a
+    worker process; the source must then be bytes or a path.
+
+    Args:
+        source (FileSource): The file to parse.
+        max_tokens (int): The token budget of each chunk.
+        overlap_tokens (int): The tokens repeated between consecutive chunks.
+
+    Returns:
+        ParsedFile: The text, the chunks and the parse/chunk timings.
+    """
+    # Stream the text out of the file, packing chunks as pages arrive. Parsing
+    # and chunking interleave, so the parser's share is timed per page.
+    parse_seconds = []
+    start = time.perf_counter()
+    content, chunks = extract_chunks(
+        metrics.time_iterator(iter_text_segments(source), parse_seconds.append),
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+    )
+    elapsed = time.perf_counter() - start
+    return ParsedFile(content, chunks, sum(parse_seconds), elapsed - sum(parse_seconds))
+
+
+def _record_parse(parsed: ParsedFile) -> None:
+    # Observed here rather than in `parse_file`: a worker process has its own registry.
+    metrics.STAGE_SECONDS.observe(parsed.parse_seconds, stage="parse")
+    metrics.STAGE_SECONDS.observe(parsed.chunk_seconds, stage="chunk")
+
+
+def _chunk_rows(chunks: Sequence[Chunk], vectors=None) -> List[schemas.TextChunkCreate]:
+    """Builds the rows of a document's chunks, with their packed embeddings if given."""
+    return [
+        schemas.TextChunkCreate(
+            content=chunk.text,
+            token_count=chunk.token_count,
+            char_start=chunk.char_start,
+            char_end=chunk.char_end,
+            page_start=chunk.page_start,
+            page_end=chunk.page_end,
+            embedding=pack_vector(vectors[i]) if vectors is not None else None,
+        )
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def run_ingest_workflow(
+    db: Session,
+    source: FileSource,
+    title: str,
+    source_label: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    embedder: Optional[Embedder] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> Tuple[models.Document, bool]:
+    """
+    Stores a file as a document split into chunks, unless it was already stored.
+
+    Args:
+        db (Session): The database session.
+        source (FileSource): The file to parse.
+        title (str): The title of the new document.
+        source_label (Optional[str]): Where the document came from, e.g. "upload:tese.pdf".
+        content_hash (Optional[str]): The hex SHA-256 digest of the file. When
+            given, an existing document with the same digest is returned as is.
+        embedder (Optional[Embedder]): Embeds the chunks for semantic search.
+        max_tokens (int): The token budget of each chunk.
+        overlap_tokens (int): The tokens repeated between consecutive chunks.
+
+    Returns:
+        Tuple[models.Document, bool]: The document, and whether it was created
+                                      (False for a duplicate upload).
+    """
+    if content_hash:
+        existing = crud.get_document_by_hash(db, content_hash)
+        if existing is not None:
+            return existing, False
+
+    parsed = parse_file(source, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+    _record_parse(parsed)
+    document_in = schemas.DocumentCreate(
+        title=title, source=source_label, content=parsed.content, content_hash=content_hash
+    )
+
+    # Embed the chunks in batches; they are stored as packed float32 vectors
+    vectors = None
+    if embedder:
+        with metrics.STAGE_SECONDS.time(stage="embed"):
+            vectors = embedder.embed([chunk.text for chunk in parsed.chunks])
+    chunks_in = _chunk_rows(parsed.chunks, vectors)
+
+    try:
+        with metrics.STAGE_SECONDS.time(stage="db_write"):
+            db_document = crud.create_document_with_chunks(db=db, document=document_in, chunks=chunks_in)
+    except IntegrityError:
+        # The same file was stored by a concurrent upload in the meantime.
+        existing = crud.get_document_by_hash(db, content_hash) if content_hash else None
+        if existing is None:
+            raise
+        return existing, False
+
+    # Make the new chunks searchable without reloading the index
+    if embedder:
+        search_workflow.index_document(embedder, db, db_document.id)
+    return db_document, True
+
+
+def run_batch_ingest_workflow(
+    db: Session,
+    files: Sequence[BatchFile],
+    embedder: Optional[Embedder] = None,
+    executor: Optional[Executor] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> List[schemas.BatchIngestResult]:
+    """
+    Stores many files as documents, parsing them in parallel.
+
+    Files already stored (by digest) are not parsed again, and a file repeated
+    in the batch is parsed once. The remaining files are parsed on `executor`
+    (typically `get_parse_executor()`), the chunks of all of them are embedded
+    together, and the new documents are inserted in one transaction. A file
+    that fails to parse is reported as failed without affecting the others.
+
+    Args:
+        db (Session): The database session.
+        files (Sequence[BatchFile]): The uploaded files. With a process pool
+            executor their sources must be bytes or paths.
+        embedder (Optional[Embedder]): Embeds the chunks for semantic search.
+        executor (Optional[Executor]): Where files are parsed; in the calling
+            thread when None.
+        max_tokens (int): The token budget of each chunk.
+        overlap_tokens (int): The tokens repeated between consecutive chunks.
+
+    Returns:
+        List[schemas.BatchIngestResult]: The outcome of each file, in input order.
+    """
+    results: Dict[int, schemas.BatchIngestResult] = {}  # By file index, filled as each outcome is known
+    first_with_hash: Dict[str, int] = {}
+    repeats: Dict[int, int] = {}  # Index of a repeated file -> index of its first occurrence
+    to_parse: List[int] = []
+
+    for index, file in enumerate(files):
+        if file.content_hash:
+            if file.content_hash in first_with_hash:
+                repeats[index] = first_with_hash[file.content_hash]
+                continue
+            first_with_hash[file.content_hash] = index
+            existing = crud.get_document_by_hash(db, file.content_hash)
+            if existing is not None:
+                results[index] = schemas.BatchIngestResult(
+                    filename=file.filename, status="existing", document_id=existing.id
+                )
+                continue
+        to_parse.append(index)
+
+    # Fan the parsing out; results are collected in input order
+    futures: Dict[int, Future] = {}
+    if executor is not None:
+        for index in to_parse:
+            try:
+                futures[index] = executor.submit(parse_file, files[index].source, max_tokens, overlap_tokens)
+            except BrokenProcessPool:
+                # A worker died and broke the pool; go on with a new shared pool.
+                executor = _replace_broken_executor(executor)
+                futures[index] = executor.submit(parse_file, files[index].source, max_tokens, overlap_tokens)
+    parsed: Dict[int, ParsedFile] = {}
+    for index in to_parse:
+        try:
+            if executor is not None:
+                parsed[index] = futures[index].result()
+            else:
+                parsed[index] = parse_file(files[index].source, max_tokens, overlap_tokens)
+            _record_parse(parsed[index])
+        except BrokenProcessPool:
+            # A worker died (e.g. on a malformed PDF), failing every file still in the pool.
+            if executor is not None:
+                _discard_broken_executor(executor)
+            results[index] = schemas.BatchIngestResult(
+                filename=files[index].filename, status="failed", error="The parser process crashed."
+            )
+        except Exception as e:
+            results[index] = schemas.BatchIngestResult(
+                filename=files[index].filename, status="failed", error=str(e) or type(e).__name__
+            )
+
+    # Embed every new chunk together, so the embedder sees full batches
+    vectors: Dict[int, object] = {}
+    if embedder and parsed:
+        with metrics.STAGE_SECONDS.time(stage="embed"):
+            all_vectors = embedder.embed([chunk.text for p in parsed.values() for chunk in p.chunks])
+        offset = 0
+        for index, p in parsed.items():
+            vectors[index] = all_vectors[offset:offset + len(p.chunks)]
+            offset += len(p.chunks)
+
+    items = [
+        (
+            schemas.DocumentCreate(
+                title=files[index].filename,
+                source=f"upload:{files[index].filename}",
+                content=p.content,
+                content_hash=files[index].content_hash,
+            ),
+            _chunk_rows(p.chunks, vectors.get(index)),
+        )
+        for index, p in parsed.items()
+    ]
+    try:
+        with metrics.STAGE_SECONDS.time(stage="db_write"):
+            documents = crud.create_documents_with_chunks(db, items)
+        outcomes = [(document, True) for document in documents]
+    except IntegrityError:
+        # A concurrent upload stored one of the files in the meantime; fall back to one transaction per file.
+        outcomes = [_create_unless_stored(db, document_in, chunks_in) for document_in, chunks_in in items]
+
+    for (index, p), (document, created) in zip(parsed.items(), outcomes):
+        results[index] = schemas.BatchIngestResult(
+            filename=files[index].filename,
+            status="created" if created else "existing",
+            document_id=document.id,
+            chunk_count=len(p.chunks) if created else None,
+        )
+        # Make the new chunks searchable without reloading the index
+        if embedder and created:
+            search_workflow.index_document(embedder, db, document.id)
+
+    for index, first in repeats.items():
+        original = results[first]
+        if original.status == "failed":
+            results[index] = original.model_copy(update={"filename": files[index].filename})
+        else:
+            results[index] = schemas.BatchIngestResult(
+                filename=files[index].filename, status="existing", document_id=original.document_id
+            )
+    return [results[index] for index in range(len(files))]
+
+
+def _create_unless_stored(
+    db: Session, document: schemas.DocumentCreate, chunks: List[schemas.TextChunkCreate]
+) -> Tuple[models.Document, bool]:
+    """Stores one document of a batch, unless a document with its hash exists; returns it and whether it was created."""
+    existing = crud.get_document_by_hash(db, document.content_hash) if document.content_hash else None
+    if existing is not None:
+        return existing, False
+    try:
+        return crud.create_document_with_chunks(db=db, document=document, chunks=chunks), True
+    except IntegrityError:
+        # Another upload stored the same file between the lookup and the insert.
+        existing = crud.get_document_by_hash(db, document.content_hash) if document.content_hash else None
+        if existing is None:
+            raise
+        return existing, False
+
+
+_parse_executor: Optional[ProcessPoolExecutor] = None
+_parse_executor_lock = threading.Lock()
+
+
+def get_parse_executor() -> Optional[ProcessPoolExecutor]:
+    """
+    Returns the process pool batch uploads are parsed on, starting it on first use.
+
+    Its size comes from INGEST_PARSE_WORKERS (the number of cores by
+    default); 0 disables the pool, so files are parsed in the calling thread.
+    """
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is None:
+            workers = int(os.getenv("INGEST_PARSE_WORKERS", os.cpu_count() or 1))
+            if workers <= 0:
+                return None
+            _parse_executor = ProcessPoolExecutor(max_workers=workers)
+        return _parse_executor
+
+
+def _discard_broken_executor(executor: Executor) -> bool:
+    """
+    Drops the shared parse pool if `executor` is it, so the next batch starts a new one.
+
+    A worker that dies (e.g. on a malformed PDF) breaks the whole pool, and
+    every later submit raises BrokenProcessPool. Returns False for any other
+    executor, which belongs to the caller.
+    """
+    global _parse_executor
+    with _parse_executor_lock:
+        if executor is not _parse_executor:
+            return False
+        _parse_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+    return True
+
+
+def _replace_broken_executor(executor: Executor) -> Executor:
+    """Returns a new shared parse pool in place of the broken `executor`; re-raises for other executors."""
+    replacement = get_parse_executor() if _discard_broken_executor(executor) else None
+    if replacement is None:
+        raise BrokenProcessPool("The parse executor is broken.")
+    return replacement
+
+
+def shutdown_parse_executor() -> None:
+    """Stops the parse pool, if it was started."""
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is not None:
+            _parse_executor.shutdown(cancel_futures=True)
+            _parse_executor = None
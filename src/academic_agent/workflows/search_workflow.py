@@ -0,0 +1,134 @@
+"""
+Workflows for searching the stored documents and text chunks.
+
+Semantic search embeds the query with the same embedder used at ingest time
+and matches it against the in-process vector index of that embedder's model,
+which is loaded from the database on the first search. Keyword search runs a
+ranked full-text query in the database.
+"""
+import asyncio
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from ..database import crud, fulltext
+from ..llm.embeddings import Embedder
+from ..search.vector_index import VectorIndex, get_vector_index
+from ..validation import schemas
+
+
+def _get_index(embedder: Embedder, db: Session) -> VectorIndex:
+    """Returns the embedder's vector index, loading it from the database if needed."""
+    index = get_vector_index(embedder.model_name, embedder.dimensions)
+    index.ensure_loaded(lambda: crud.iter_chunk_embeddings(db))
+    return index
+
+
+def index_document(embedder: Embedder, db: Session, document_id: int) -> int:
+    """
+    Adds the chunks of a newly stored document to the embedder's vector index.
+
+    Call this after the chunks are committed. If the index has not been
+    loaded yet this is a no-op, since the first search loads them anyway.
+    If it is being loaded, this waits for the load to finish, as the load
+    may have read the chunks before they were committed.
+
+    Returns:
+        int: The number of vectors added.
+    """
+    index = get_vector_index(embedder.model_name, embedder.dimensions)
+    # The rows are read lazily, only once `add` knows, under the index lock, that the index is loaded.
+    return index.add(crud.iter_chunk_embeddings(db, document_id=document_id))
+
+
+def run_search_workflow(
+    embedder: Embedder, db: Session, params: schemas.SearchParams
+) -> List[schemas.SearchResult]:
+    """
+    Finds the stored chunks most similar to a query.
+
+    Args:
+        embedder (Embedder): The embedder used to embed the stored chunks.
+        db (Session): The database session.
+        params (schemas.SearchParams): The parameters for the search.
+
+    Returns:
+        List[schemas.SearchResult]: The matching chunks, most similar first.
+    """
+    index = _get_index(embedder, db)
+    query_vector = embedder.embed([params.query])[0]
+    hits = index.search(query_vector, params.top_k, document_id=params.document_id)
+
+    chunks = {chunk.id: chunk for chunk in crud.get_text_chunks_by_ids(db, [hit.chunk_id for hit in hits])}
+    return [
+        schemas.SearchResult(
+            chunk_id=hit.chunk_id,
+            document_id=hit.document_id,
+            score=hit.score,
+            content=chunks[hit.chunk_id].content,
+            page_start=chunks[hit.chunk_id].page_start,
+            page_end=chunks[hit.chunk_id].page_end,
+        )
+        for hit in hits
+        if hit.chunk_id in chunks
+    ]
+
+
+async def arun_search_workflow(
+    embedder: Embedder, db: Session, params: schemas.SearchParams
+) -> List[schemas.SearchResult]:
+    """
+    Async variant of `run_search_workflow`.
+
+    Embedding the query, loading the index and the matrix product are blocking,
+    so the whole search runs in a worker thread and releases its connection
+    before returning.
+    """
+    def search_and_release() -> List[schemas.SearchResult]:
+        try:
+            return run_search_workflow(embedder, db, params)
+        finally:
+            db.commit()
+
+    return await asyncio.to_thread(search_and_release)
+
+
+def run_keyword_search_workflow(db: Session, params: schemas.KeywordSearchParams) -> schemas.KeywordSearchResponse:
+    """
+    Finds the documents or chunks containing every word of a query.
+
+    Args:
+        db (Session): The database session.
+        params (schemas.KeywordSearchParams): The parameters for the search.
+
+    Returns:
+        schemas.KeywordSearchResponse: One page of hits, most relevant first.
+    """
+    # One extra hit tells whether there is a next page without counting every match.
+    hits = fulltext.search(
+        db,
+        params.query,
+        scope=params.scope,
+        document_id=params.document_id,
+        limit=params.limit + 1,
+        offset=params.offset,
+    )
+    return schemas.KeywordSearchResponse(
+        results=[schemas.KeywordSearchResult(**hit._asdict()) for hit in hits[:params.limit]],
+        has_more=len(hits) > params.limit,
+    )
+
+
+async def arun_keyword_search_workflow(
+    db: Session, params: schemas.KeywordSearchParams
+) -> schemas.KeywordSearchResponse:
+    """
+    Async variant of `run_keyword_search_workflow`, run in a worker thread.
+    """
+    def search_and_release() -> schemas.KeywordSearchResponse:
+        try:
+            return run_keyword_search_workflow(db, params)
+        finally:
+            db.commit()
+
+    return await asyncio.to_thread(search_and_release)
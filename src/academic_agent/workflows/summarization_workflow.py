@@ -1,19 +1,243 @@
 """
 Workflow for summarizing academic content from the database.
+
+Two modes are supported:
+
+* ``single`` sends the whole document in one chat completion.
+* ``hierarchical`` summarizes groups of the document's stored text chunks in
+  parallel, then reduces those partial summaries level by level until they fit
+  in one final call. Each level runs concurrently, so wall-clock time grows
+  with the depth of the tree rather than with the length of the document.
+
+`astream_summarization_workflow` streams the final call's text as it is
+generated, so the first words arrive long before the whole summary.
+
+Results are stored in the database. The final summary is stored per document,
+model and prompt version, together with the hash of the text it summarizes,
+and is returned as is while that text is unchanged. In hierarchical mode the
+partial summaries of the first level are stored by the content hash of their
+chunk group. First-level groups also end at chunks picked by their content
+hash, so the boundaries follow the text rather than chunk positions: after a
+document is re-ingested with small edits, even ones that add or remove
+chunks, only the groups around the changed chunks are summarized again
+before the final combine.
+`use_cache=False` skips the stored results (and the response cache) but
+still stores the new ones.
 """
-from openai import OpenAI
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING, Union
+
 from sqlalchemy.orm import Session
 
 from ..database import crud
+from ..llm.completions import acreate_completion, astream_completion, create_completion
+from ..utils.hashing import combined_hash, prompt_version, text_hash
 from ..validation import schemas
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+SYSTEM_PROMPT = (
+    "Você é um assistente de pesquisa acadêmica especializado em sintetizar informações. "
+    "Sua tarefa é criar um resumo conciso e claro do texto fornecido, destacando os "
+    "principais argumentos, metodologias e conclusões."
+)
+
+REDUCE_PROMPT = (
+    "Você é um assistente de pesquisa acadêmica especializado em sintetizar informações. "
+    "Você receberá resumos parciais de trechos consecutivos de um mesmo documento. "
+    "Combine-os em um único resumo conciso e coerente, preservando a ordem das ideias e "
+    "destacando os principais argumentos, metodologias e conclusões."
+)
+
+EMPTY_DOCUMENT_MESSAGE = "The document is empty and cannot be summarized."
+
+PART_SEPARATOR = "\n\n"
+
+TEMPERATURE = 0.5
+MAX_TOKENS = 500  # Keeping max_tokens to manage cost and response size
+
+
+def _load_texts(db: Session, params: schemas.SummarizationWorkflowParams) -> List[str]:
+    """
+    Loads the texts to summarize, raising if the document does not exist.
+
+    Single mode returns the document content. Hierarchical mode returns the
+    stored chunks in order, falling back to the content if there are none.
+    """
+    document = crud.get_document(db, document_id=params.document_id)
+    if not document:
+        raise ValueError(f"Document with ID {params.document_id} not found.")
+    if params.mode == "hierarchical":
+        chunks = crud.get_text_chunks_by_document(db, document_id=params.document_id)
+        if chunks:
+            return [chunk.content for chunk in chunks]
+    return [document.content]
+
+
+def _build_request(
+    params: schemas.SummarizationWorkflowParams, text_to_summarize: str, system_prompt: str = SYSTEM_PROMPT
+) -> dict:
+    """Builds the chat completion arguments shared by the sync and async paths."""
+    return {
+        "model": params.model_name,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text_to_summarize},
+        ],
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_TOKENS,
+    }
+
+
+def _chunk_summary_version() -> str:
+    """The version of the first-level (map) prompt, under which chunk group summaries are stored."""
+    return prompt_version(SYSTEM_PROMPT, TEMPERATURE, MAX_TOKENS)
+
+
+def _summary_version(params: schemas.SummarizationWorkflowParams) -> str:
+    """The version of everything that shapes the final summary, under which it is stored."""
+    if params.mode == "single":
+        return prompt_version("single", SYSTEM_PROMPT, TEMPERATURE, MAX_TOKENS)
+    return prompt_version(
+        "hierarchical", SYSTEM_PROMPT, REDUCE_PROMPT, TEMPERATURE, MAX_TOKENS,
+        params.fan_out, params.max_depth, params.max_input_chars,
+    )
+
+
+def _group_hash(group: List[str]) -> str:
+    """The content hash a chunk group's partial summary is stored under."""
+    return combined_hash(text_hash(text) for text in group)
+
+
+class _StoredResults(NamedTuple):
+    """What the database already knows about a summarization request."""
+    input_hash: str  # Hash of the texts to summarize, stored with the summary
+    summary: Optional[str]  # The stored summary, if still valid
+    leaf_groups: List[List[str]]  # The first level of the tree; empty if there is none
+    leaf_summaries: Dict[str, str]  # Stored partial summaries of those groups, by group hash
+
+
+def _load_stored_results(
+    db: Session, params: schemas.SummarizationWorkflowParams, texts: List[str]
+) -> _StoredResults:
+    """Looks up the stored summary of the texts and, if it must be generated, the stored partials."""
+    input_hash = combined_hash(text_hash(text) for text in texts)
+    if params.use_cache:
+        stored = crud.get_document_summary(db, params.document_id, params.model_name, _summary_version(params))
+        if stored is not None and stored.input_hash == input_hash:
+            return _StoredResults(input_hash, stored.summary, [], {})
+
+    leaf_groups = _next_level(texts, params, 0) or []
+    leaf_summaries = {}
+    if leaf_groups and params.use_cache:
+        leaf_summaries = crud.get_chunk_summaries(
+            db, [_group_hash(group) for group in leaf_groups], params.model_name, _chunk_summary_version()
+        )
+    return _StoredResults(input_hash, None, leaf_groups, leaf_summaries)
+
+
+def _missing_leaves(stored: _StoredResults) -> List[int]:
+    """The indexes of the first-level groups that have no stored partial summary."""
+    return [i for i, group in enumerate(stored.leaf_groups) if _group_hash(group) not in stored.leaf_summaries]
+
+
+def _save_leaves(
+    db: Session,
+    params: schemas.SummarizationWorkflowParams,
+    stored: _StoredResults,
+    indexes: List[int],
+    summaries: List[str],
+) -> List[str]:
+    """Stores the newly generated partial summaries and returns the whole first level, in order."""
+    new = {_group_hash(stored.leaf_groups[i]): summary for i, summary in zip(indexes, summaries)}
+    crud.save_chunk_summaries(db, new, params.model_name, _chunk_summary_version())
+    known = {**stored.leaf_summaries, **new}
+    return [known[_group_hash(group)] for group in stored.leaf_groups]
+
+
+def _save_summary(
+    db: Session, params: schemas.SummarizationWorkflowParams, stored: _StoredResults, summary: str
+) -> None:
+    """Stores the final summary with the hash of the texts it summarizes."""
+    crud.save_document_summary(
+        db, params.document_id, params.model_name, _summary_version(params), stored.input_hash, summary
+    )
+
+
+def _extract_summary(response) -> str:
+    """Validates the API response and returns the stripped summary."""
+    summary = response.choices[0].message.content
+    if not summary:
+        raise ValueError("Failed to get a valid summary from the API.")
+    return summary.strip()
+
+
+def _fits(texts: List[str], max_chars: int) -> bool:
+    """Checks whether the texts joined together fit in a single request."""
+    return sum(len(t) for t in texts) + len(PART_SEPARATOR) * (len(texts) - 1) <= max_chars
+
+
+def _ends_group(text: str, fan_out: int) -> bool:
+    """Whether a chunk closes its first-level group; about one chunk in `2 * fan_out`, picked by content."""
+    return int(text_hash(text)[:8], 16) % (2 * fan_out) == 0
+
+
+def _group(texts: List[str], fan_out: int, max_chars: int, by_content: bool = False) -> List[List[str]]:
+    """
+    Packs consecutive texts into groups of at most `fan_out` items and,
+    where possible, at most `max_chars` characters.
+
+    With `by_content`, a group also ends after every text `_ends_group`
+    picks. Inserting or removing a text then only changes the groups up to
+    the next such text, instead of shifting every group after it.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for text in texts:
+        if current and (len(current) >= fan_out or size + len(text) > max_chars):
+            groups.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += len(text) + len(PART_SEPARATOR)
+        if by_content and _ends_group(text, fan_out):
+            groups.append(current)
+            current, size = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _next_level(
+    level: List[str], params: schemas.SummarizationWorkflowParams, depth: int
+) -> Optional[List[List[str]]]:
+    """
+    Plans the next level of the summarization tree.
+
+    Returns the groups to summarize, or None when the current level fits in
+    one final request (or the tree reached `max_depth`, in which case the
+    remaining partials are combined in one call even if they are too long).
+    The chunks of the first level are grouped by content; see `_group`.
+    """
+    if params.mode != "hierarchical" or depth >= params.max_depth:
+        return None
+    if _fits(level, params.max_input_chars):
+        return None
+    return _group(level, params.fan_out, params.max_input_chars, by_content=depth == 0)
+
 
 def run_summarization_workflow(
-    client: OpenAI, db: Session, params: schemas.SummarizationWorkflowParams
+    client: "OpenAI", db: Session, params: schemas.SummarizationWorkflowParams
 ) -> str:
     """
     Runs the summarization workflow on a document from the database.
 
+    In hierarchical mode each level of the tree is summarized on a thread
+    pool of `params.max_concurrency` workers.
+
     Args:
         client (OpenAI): The OpenAI client instance.
         db (Session): The database session.
@@ -25,32 +249,146 @@ def run_summarization_workflow(
     Raises:
         ValueError: If the document is not found or the API response is invalid.
     """
-    document = crud.get_document(db, document_id=params.document_id)
-    if not document:
-        raise ValueError(f"Document with ID {params.document_id} not found.")
+    texts = _load_texts(db, params)
+    if not any(text.strip() for text in texts):
+        return EMPTY_DOCUMENT_MESSAGE
+    stored = _load_stored_results(db, params, texts)
+    if stored.summary is not None:
+        return stored.summary
 
-    text_to_summarize = document.content
-    if not text_to_summarize.strip():
-        return "The document is empty and cannot be summarized."
+    def summarize(group: List[str], system_prompt: str) -> str:
+        request = _build_request(params, PART_SEPARATOR.join(group), system_prompt)
+        return create_completion(client, request, _extract_summary, use_cache=params.use_cache)
 
-    system_prompt = (
-        "Você é um assistente de pesquisa acadêmica especializado em sintetizar informações. "
-        "Sua tarefa é criar um resumo conciso e claro do texto fornecido, destacando os "
-        "principais argumentos, metodologias e conclusões."
-    )
+    level, system_prompt, depth = texts, SYSTEM_PROMPT, 0
+    with ThreadPoolExecutor(max_workers=params.max_concurrency) as executor:
+        if stored.leaf_groups:
+            missing = _missing_leaves(stored)
+            leaves = [stored.leaf_groups[i] for i in missing]
+            summaries = list(executor.map(summarize, leaves, [SYSTEM_PROMPT] * len(leaves)))
+            level = _save_leaves(db, params, stored, missing, summaries)
+            system_prompt, depth = REDUCE_PROMPT, 1
+        while (groups := _next_level(level, params, depth)) is not None:
+            level = list(executor.map(summarize, groups, [system_prompt] * len(groups)))
+            system_prompt, depth = REDUCE_PROMPT, depth + 1
 
-    response = client.chat.completions.create(
-        model=params.model_name,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": text_to_summarize},
-        ],
-        temperature=0.5,
-        max_tokens=500,  # Keeping max_tokens to manage cost and response size
-    )
-    
-    summary = response.choices[0].message.content
-    if not summary:
-        raise ValueError("Failed to get a valid summary from the API.")
-        
-    return summary.strip() 
\ No newline at end of file
+    summary = summarize(level, system_prompt)
+    _save_summary(db, params, stored, summary)
+    return summary
+
+
+async def _aplan_final_request(
+    client: "AsyncOpenAI", db: Session, params: schemas.SummarizationWorkflowParams
+) -> Union[str, Tuple[dict, _StoredResults]]:
+    """
+    Loads the document and, in hierarchical mode, summarizes every level of
+    the tree but the last.
+
+    Database work runs in worker threads so pool checkout never blocks the
+    event loop, and the read-only transaction is ended before any LLM call
+    so the pooled connection is not held while completions are awaited.
+
+    Returns:
+        Union[str, Tuple[dict, _StoredResults]]: The request for the final
+            summary and the stored results to update after it or, when no
+            call is needed, the summary to return (the stored one, or the
+            empty document message).
+    """
+    def load_and_release() -> Tuple[List[str], Optional[_StoredResults]]:
+        try:
+            texts = _load_texts(db, params)
+            if not any(text.strip() for text in texts):
+                return texts, None
+            return texts, _load_stored_results(db, params, texts)
+        finally:
+            db.commit()
+
+    texts, stored = await asyncio.to_thread(load_and_release)
+    if stored is None:
+        return EMPTY_DOCUMENT_MESSAGE
+    if stored.summary is not None:
+        return stored.summary
+
+    semaphore = asyncio.Semaphore(params.max_concurrency)
+
+    async def summarize(group: List[str], system_prompt: str) -> str:
+        request = _build_request(params, PART_SEPARATOR.join(group), system_prompt)
+        async with semaphore:
+            return await acreate_completion(client, request, _extract_summary, use_cache=params.use_cache)
+
+    level, system_prompt, depth = texts, SYSTEM_PROMPT, 0
+    if stored.leaf_groups:
+        missing = _missing_leaves(stored)
+        summaries = list(await asyncio.gather(*(summarize(stored.leaf_groups[i], SYSTEM_PROMPT) for i in missing)))
+        level = await asyncio.to_thread(_save_leaves, db, params, stored, missing, summaries)
+        system_prompt, depth = REDUCE_PROMPT, 1
+    while (groups := _next_level(level, params, depth)) is not None:
+        level = list(await asyncio.gather(*(summarize(group, system_prompt) for group in groups)))
+        system_prompt, depth = REDUCE_PROMPT, depth + 1
+
+    return _build_request(params, PART_SEPARATOR.join(level), system_prompt), stored
+
+
+async def arun_summarization_workflow(
+    client: "AsyncOpenAI", db: Session, params: schemas.SummarizationWorkflowParams
+) -> str:
+    """
+    Async variant of `run_summarization_workflow`.
+
+    The database is only used before the first LLM call (see
+    `_aplan_final_request`) and to store the results, never while a call
+    is awaited. In hierarchical mode at most `params.max_concurrency` calls
+    are in flight.
+
+    Args:
+        client (AsyncOpenAI): The async OpenAI client instance.
+        db (Session): The database session.
+        params (schemas.SummarizationWorkflowParams): The parameters for the workflow.
+
+    Returns:
+        str: The generated summary.
+
+    Raises:
+        ValueError: If the document is not found or the API response is invalid.
+    """
+    plan = await _aplan_final_request(client, db, params)
+    if isinstance(plan, str):
+        return plan
+    request, stored = plan
+    summary = await acreate_completion(client, request, _extract_summary, use_cache=params.use_cache)
+    await asyncio.to_thread(_save_summary, db, params, stored, summary)
+    return summary
+
+
+async def astream_summarization_workflow(
+    client: "AsyncOpenAI", db: Session, params: schemas.SummarizationWorkflowParams
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of `arun_summarization_workflow`.
+
+    Intermediate levels of a hierarchical summary are computed as usual; only
+    the final call is streamed. The deltas join up to the same text the
+    non-streaming workflow returns, which is cached and stored when the
+    stream ends. A stored summary is yielded as a single delta.
+
+    Args:
+        client (AsyncOpenAI): The async OpenAI client instance.
+        db (Session): The database session.
+        params (schemas.SummarizationWorkflowParams): The parameters for the workflow.
+
+    Yields:
+        str: Pieces of the summary, in order.
+
+    Raises:
+        ValueError: If the document is not found or the API response is invalid.
+    """
+    plan = await _aplan_final_request(client, db, params)
+    if isinstance(plan, str):
+        yield plan
+        return
+    request, stored = plan
+    parts = []
+    async for delta in astream_completion(client, request, use_cache=params.use_cache, strip=True):
+        parts.append(delta)
+        yield delta
+    await asyncio.to_thread(_save_summary, db, params, stored, "".join(parts))
@@ -1,7 +1,95 @@
-from typing import Dict, Any
-from openai import OpenAI
+"""
+Workflow de redação acadêmica.
 
-def run_writing_workflow(client: OpenAI, params: Dict[str, Any]) -> str:
+No modo padrão, o texto é gerado por uma única chamada ao modelo. No modo
+`long_form`, o workflow gera primeiro um roteiro de seções, depois escreve
+todas as seções em paralelo, com o roteiro como contexto comum, e por fim
+revisa cada seção em relação às vizinhas (também em paralelo) antes de juntá-las.
+Assim, o tempo total fica próximo ao de gerar uma seção, e não cresce com o
+tamanho do texto.
+"""
+
+import asyncio
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, NamedTuple, TYPE_CHECKING
+
+from ..llm.completions import acreate_completion, create_completion
+from ..llm.governor import LLMOverloadedError
+from ..validation import schemas
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "Você é um assistente de redação acadêmica."
+
+ERROR_MESSAGE = "Não foi possível gerar o texto devido a um erro no workflow."
+
+OUTLINE_PROMPT = (
+    "Você é um assistente de redação acadêmica. Planeje o texto pedido pelo usuário "
+    "em exatamente {sections} seções. Responda apenas com uma seção por linha, no formato "
+    "'Título: o que a seção deve cobrir', sem numeração nem texto adicional."
+)
+
+SECTION_PROMPT = (
+    "Você é um assistente de redação acadêmica e está escrevendo uma seção de um texto maior. "
+    "As outras seções são escritas separadamente a partir do mesmo roteiro: cubra apenas o "
+    "que cabe à sua seção, sem repetir o conteúdo das demais. Não escreva o título da seção."
+)
+
+REVISION_PROMPT = (
+    "Você é um revisor de textos acadêmicos. Revise a seção fornecida para que ela se encaixe "
+    "no texto: ajuste a transição a partir do fim da seção anterior, mantenha a terminologia "
+    "consistente com as vizinhas e remova repetições. Não acrescente conteúdo novo e não "
+    "escreva o título da seção. Retorne somente o texto revisado da seção."
+)
+
+OUTLINE_MAX_TOKENS = 500
+
+CONTEXT_CHARS = 600  # Trecho das seções vizinhas mostrado na revisão
+
+SECTION_SEPARATOR = "\n\n"
+
+# O mesmo modelo padrão do modo long_form.
+DEFAULT_MODEL_NAME = schemas.WritingWorkflowParams.model_fields["model_name"].default
+
+
+class Section(NamedTuple):
+    """Uma seção do roteiro: o título e o que ela deve cobrir."""
+    title: str
+    brief: str
+
+
+def _get_prompt(params: Dict[str, Any]) -> str:
+    """Extrai e valida o prompt dos parâmetros do workflow."""
+    prompt = params.get("prompt")
+    if not prompt:
+        raise ValueError("O parâmetro 'prompt' é obrigatório para o workflow de redação.")
+    return prompt
+
+
+def _extract_text(response) -> str:
+    """Retorna o texto da resposta da API, ou uma string vazia."""
+    content = response.choices[0].message.content
+    return content.strip() if content else ""
+
+
+def _build_request(prompt: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Monta os argumentos da chamada de chat compartilhados pelas versões síncrona e assíncrona."""
+    return {
+        "model": params.get("model_name", DEFAULT_MODEL_NAME),
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 1000  # Aumentando para permitir textos mais longos
+    }
+
+
+def run_writing_workflow(client: "OpenAI", params: Dict[str, Any]) -> str:
     """
     Executa o workflow de redação acadêmica.
 
@@ -12,30 +100,221 @@ def run_writing_workflow(client: OpenAI, params: Dict[str, Any]) -> str:
     Args:
         client (OpenAI): O cliente da API da OpenAI a ser utilizado.
         params (Dict[str, Any]): Um dicionário contendo os parâmetros para o workflow.
-                                 Deve incluir a chave 'prompt'.
+                                 Deve incluir a chave 'prompt'. A chave opcional
+                                 'model_name' escolhe o modelo, 'use_cache' (padrão
+                                 True) permite ignorar o cache, e 'mode': 'long_form'
+                                 gera textos longos por seções (ver
+                                 `schemas.WritingWorkflowParams`).
 
     Returns:
         str: O texto gerado pelo modelo.
     
     Raises:
         ValueError: Se o parâmetro 'prompt' não for fornecido.
+        LLMOverloadedError: Se o limite de chamadas ao LLM estiver esgotado.
     """
-    prompt = params.get("prompt")
-    if not prompt:
-        raise ValueError("O parâmetro 'prompt' é obrigatório para o workflow de redação.")
+    prompt = _get_prompt(params)
+    if params.get("mode") == "long_form":
+        return _run_long_form(client, schemas.WritingWorkflowParams(**params))
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-nano",
-            messages=[
-                {"role": "system", "content": "Você é um assistente de redação acadêmica."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000  # Aumentando para permitir textos mais longos
+        return create_completion(
+            client, _build_request(prompt, params), _extract_text, use_cache=params.get("use_cache", True)
         )
-        
-        content = response.choices[0].message.content
-        return content.strip() if content else ""
+    except LLMOverloadedError:
+        raise  # A API responde 429/503 em vez de devolver a mensagem de erro
+    except Exception as e:
+        logger.exception("Ocorreu um erro ao chamar a API da OpenAI no workflow de redação: %s", e)
+        return ERROR_MESSAGE
+
+
+async def arun_writing_workflow(client: "AsyncOpenAI", params: Dict[str, Any]) -> str:
+    """
+    Versão assíncrona de `run_writing_workflow`.
+
+    Args:
+        client (AsyncOpenAI): O cliente assíncrono da API da OpenAI.
+        params (Dict[str, Any]): Parâmetros do workflow; deve incluir a chave 'prompt'.
+
+    Returns:
+        str: O texto gerado pelo modelo.
+
+    Raises:
+        ValueError: Se o parâmetro 'prompt' não for fornecido.
+        LLMOverloadedError: Se o limite de chamadas ao LLM estiver esgotado.
+    """
+    prompt = _get_prompt(params)
+    if params.get("mode") == "long_form":
+        return await _arun_long_form(client, schemas.WritingWorkflowParams(**params))
+
+    try:
+        return await acreate_completion(
+            client, _build_request(prompt, params), _extract_text, use_cache=params.get("use_cache", True)
+        )
+    except LLMOverloadedError:
+        raise  # A API responde 429/503 em vez de devolver a mensagem de erro
+    except Exception as e:
+        logger.exception("Ocorreu um erro ao chamar a API da OpenAI no workflow de redação: %s", e)
+        return ERROR_MESSAGE
+
+
+# --- Modo long_form ---
+
+def _build_outline_request(params: schemas.WritingWorkflowParams) -> Dict[str, Any]:
+    """Monta a chamada que gera o roteiro de seções."""
+    return {
+        "model": params.model_name,
+        "messages": [
+            {"role": "system", "content": OUTLINE_PROMPT.format(sections=params.sections)},
+            {"role": "user", "content": params.prompt},
+        ],
+        "max_tokens": OUTLINE_MAX_TOKENS,
+    }
+
+
+def _parse_outline(text: str, max_sections: int) -> List[Section]:
+    """
+    Lê o roteiro devolvido pelo modelo, uma seção por linha.
+
+    Numeração e marcadores de lista são ignorados; uma linha sem ':' vira uma
+    seção sem descrição.
+
+    Raises:
+        ValueError: Se o roteiro não tiver nenhuma seção.
+    """
+    sections = []
+    for line in text.splitlines():
+        line = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).replace("**", "").strip("# ")
+        if not line:
+            continue
+        title, _, brief = line.partition(":")
+        sections.append(Section(title.strip(), brief.strip()))
+    if not sections:
+        raise ValueError("O modelo não devolveu um roteiro de seções.")
+    return sections[:max_sections]
+
+
+def _format_outline(sections: List[Section]) -> str:
+    """O roteiro completo, numerado, compartilhado por todas as seções."""
+    return "\n".join(
+        f"{number}. {section.title}" + (f": {section.brief}" if section.brief else "")
+        for number, section in enumerate(sections, start=1)
+    )
+
+
+def _build_section_request(
+    params: schemas.WritingWorkflowParams, sections: List[Section], index: int
+) -> Dict[str, Any]:
+    """Monta a chamada que escreve uma seção, com o pedido original e o roteiro como contexto."""
+    section = sections[index]
+    user_content = (
+        f"Pedido original:\n{params.prompt}\n\n"
+        f"Roteiro do texto:\n{_format_outline(sections)}\n\n"
+        f"Escreva a seção {index + 1} de {len(sections)}: {section.title}"
+        + (f"\nEla deve cobrir: {section.brief}" if section.brief else "")
+    )
+    return {
+        "model": params.model_name,
+        "messages": [
+            {"role": "system", "content": SECTION_PROMPT},
+            {"role": "user", "content": user_content},
+        ],
+        "max_tokens": params.section_max_tokens,
+    }
+
+
+def _build_revision_request(
+    params: schemas.WritingWorkflowParams, sections: List[Section], drafts: List[str], index: int
+) -> Dict[str, Any]:
+    """Monta a chamada que revisa uma seção, vendo o fim da anterior e o começo da seguinte."""
+    parts = [f"Roteiro do texto:\n{_format_outline(sections)}"]
+    if index > 0:
+        parts.append(f"Fim da seção anterior (não revisar):\n{drafts[index - 1][-CONTEXT_CHARS:]}")
+    if index + 1 < len(drafts):
+        parts.append(f"Começo da seção seguinte (não revisar):\n{drafts[index + 1][:CONTEXT_CHARS]}")
+    parts.append(f"Seção {index + 1} a revisar ({sections[index].title}):\n{drafts[index]}")
+    return {
+        "model": params.model_name,
+        "messages": [
+            {"role": "system", "content": REVISION_PROMPT},
+            {"role": "user", "content": "\n\n".join(parts)},
+        ],
+        "max_tokens": params.section_max_tokens,
+    }
+
+
+def _stitch(sections: List[Section], texts: List[str]) -> str:
+    """Junta as seções na ordem do roteiro, cada uma sob o seu título."""
+    return SECTION_SEPARATOR.join(
+        f"## {section.title}{SECTION_SEPARATOR}{text.strip()}" for section, text in zip(sections, texts)
+    )
+
+
+def _run_long_form(client: "OpenAI", params: schemas.WritingWorkflowParams) -> str:
+    """Gera um texto longo por seções, com as chamadas de cada etapa em paralelo numa pool de threads."""
+
+    def complete(request: Dict[str, Any]) -> str:
+        text = create_completion(client, request, _extract_text, use_cache=params.use_cache)
+        if not text:
+            raise ValueError("O modelo devolveu uma resposta vazia.")
+        return text
+
+    def revise(index: int) -> str:
+        try:
+            return complete(_build_revision_request(params, sections, drafts, index))
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
+            logger.warning("Falha ao revisar a seção %d; mantendo o rascunho: %s", index + 1, e)
+            return drafts[index]
+
+    try:
+        sections = _parse_outline(complete(_build_outline_request(params)), params.sections)
+        with ThreadPoolExecutor(max_workers=params.max_concurrency) as executor:
+            drafts = list(executor.map(
+                lambda index: complete(_build_section_request(params, sections, index)), range(len(sections))
+            ))
+            texts = list(executor.map(revise, range(len(sections)))) if params.consistency_pass else drafts
+    except LLMOverloadedError:
+        raise  # A API responde 429/503 em vez de devolver a mensagem de erro
+    except Exception as e:
+        logger.exception("Ocorreu um erro ao chamar a API da OpenAI no workflow de redação: %s", e)
+        return ERROR_MESSAGE
+    return _stitch(sections, texts)
+
+
+async def _arun_long_form(client: "AsyncOpenAI", params: schemas.WritingWorkflowParams) -> str:
+    """Versão assíncrona de `_run_long_form`, com no máximo `params.max_concurrency` chamadas simultâneas."""
+    semaphore = asyncio.Semaphore(params.max_concurrency)
+
+    async def complete(request: Dict[str, Any]) -> str:
+        async with semaphore:
+            text = await acreate_completion(client, request, _extract_text, use_cache=params.use_cache)
+        if not text:
+            raise ValueError("O modelo devolveu uma resposta vazia.")
+        return text
+
+    async def revise(index: int) -> str:
+        try:
+            return await complete(_build_revision_request(params, sections, drafts, index))
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
+            logger.warning("Falha ao revisar a seção %d; mantendo o rascunho: %s", index + 1, e)
+            return drafts[index]
+
+    try:
+        sections = _parse_outline(await complete(_build_outline_request(params)), params.sections)
+        drafts = list(await asyncio.gather(
+            *(complete(_build_section_request(params, sections, index)) for index in range(len(sections)))
+        ))
+        if params.consistency_pass:
+            texts = list(await asyncio.gather(*(revise(index) for index in range(len(sections)))))
+        else:
+            texts = drafts
+    except LLMOverloadedError:
+        raise  # A API responde 429/503 em vez de devolver a mensagem de erro
     except Exception as e:
-        print(f"Ocorreu um erro ao chamar a API da OpenAI no workflow de redação: {e}")
-        return "Não foi possível gerar o texto devido a um erro no workflow." 
\ No newline at end of file
+        logger.exception("Ocorreu um erro ao chamar a API da OpenAI no workflow de redação: %s", e)
+        return ERROR_MESSAGE
+    return _stitch(sections, texts)
@@ -1,18 +1,29 @@
+import asyncio
+import json
 import os
 import shutil
 import tempfile
 from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request
-from fastapi.responses import HTMLResponse
+from dotenv import load_dotenv
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from openai import OpenAI
 from sqlalchemy.orm import Session
 
+# Load the .env file before the package reads its settings from the environment.
+load_dotenv()
+
 from academic_agent.database import crud, database
+from academic_agent.database.writer import shutdown_single_writer
+from academic_agent.jobs.runner import JobRunner
 from academic_agent.validation import schemas
-from academic_agent.workflows import abnt_workflow, summarization_workflow
-from academic_agent.utils.file_parser import read_text_from_file
+from academic_agent.llm.embeddings import get_embedder
+from academic_agent.llm.governor import LLMOverloadedError
+from academic_agent.workflows import abnt_workflow, ingest_workflow, search_workflow, summarization_workflow
+from academic_agent.utils import metrics
+from academic_agent.utils.file_parser import FileSource, read_and_hash
 
 
 # --- App Lifespan ---
@@ -21,11 +32,22 @@ from academic_agent.utils.file_parser import read_text_from_file
 async def lifespan(app: FastAPI):
     """
     Handles startup and shutdown events.
+
+    Everything with side effects (creating the tables, building the OpenAI
+    client, starting the job workers) happens here rather than at import
+    time, so importing the app stays fast and never touches the database.
     """
     print("Starting up...")
     database.init_db()
+    app.state.llm_client = _create_llm_client()
+    job_runner.start()
     yield
     print("Shutting down...")
+    job_runner.stop(timeout=5)
+    ingest_workflow.shutdown_parse_executor()
+    shutdown_single_writer(database.engine)
+    if app.state.llm_client is not None:
+        await app.state.llm_client.close()
 
 
 # --- App Initialization ---
@@ -36,6 +58,25 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Uploads up to this size are parsed straight from memory; larger ones are
+# spooled to a temporary file so PyMuPDF can read them lazily from disk. The
+# files of one /documents/batch request share this budget.
+UPLOAD_SPOOL_THRESHOLD_BYTES = int(os.getenv("UPLOAD_SPOOL_THRESHOLD_BYTES", 50 * 1024 * 1024))
+
+# Token budget and overlap used when splitting ingested documents into chunks.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 512))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 64))
+
+# Most files accepted by one /documents/batch request.
+INGEST_BATCH_MAX_FILES = int(os.getenv("INGEST_BATCH_MAX_FILES", 500))
+
+# Background workers for the /jobs/ endpoints (JOB_QUEUES, JOB_EXECUTOR)
+job_runner = JobRunner.from_env(database.SessionLocal)
+
+# Connection pool usage, read when /metrics is scraped (not every pool class tracks it)
+metrics.DB_POOL_CHECKED_OUT.set_function(lambda: getattr(database.engine.pool, "checkedout", lambda: 0)())
+metrics.DB_POOL_SIZE.set_function(lambda: getattr(database.engine.pool, "size", lambda: 0)())
+
 # --- Template Engine Setup ---
 templates = Jinja2Templates(directory="templates")
 
@@ -50,13 +91,114 @@ def get_db_session():
     finally:
         db.close()
 
-# Initialize OpenAI client
-# Make sure to set the OPENAI_API_KEY environment variable
-try:
-    client = OpenAI()
-except Exception as e:
-    print(f"Error initializing OpenAI client: {e}")
-    client = None
+def _create_llm_client():
+    """
+    Creates the OpenAI client used by the endpoints, or None if it cannot be
+    created (e.g. OPENAI_API_KEY is not set).
+
+    The async client lets a single worker keep many LLM calls in flight
+    instead of pinning one threadpool thread per request.
+    """
+    # Imported here: the OpenAI SDK alone takes about a second to import.
+    from openai import AsyncOpenAI
+
+    try:
+        return AsyncOpenAI(max_retries=0)  # The LLM governor retries
+    except Exception as e:
+        print(f"Error initializing OpenAI client: {e}")
+        return None
+
+
+def get_llm_client(request: Request):
+    """Dependency to get the OpenAI client created at startup."""
+    client = getattr(request.app.state, "llm_client", None)
+    if client is None:
+        raise HTTPException(status_code=500, detail="OpenAI client not initialized. Check API key.")
+    return client
+
+
+def _upload_size(file: UploadFile) -> int:
+    """Returns the size of an uploaded file in bytes."""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+
+def _load_upload(file: UploadFile) -> FileSource:
+    """
+    Makes an uploaded file readable by the parser.
+
+    Small uploads are returned as bytes; uploads above
+    UPLOAD_SPOOL_THRESHOLD_BYTES are copied to a temporary file whose path is
+    returned instead. Pass the result to `_discard_upload` when done.
+    """
+    with metrics.STAGE_SECONDS.time(stage="upload"):
+        file.file.seek(0)
+        if _upload_size(file) <= UPLOAD_SPOOL_THRESHOLD_BYTES:
+            return file.file.read()
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            shutil.copyfileobj(file.file, tmp)
+            return tmp.name
+
+
+def _discard_upload(source: FileSource) -> None:
+    """Removes the temporary file created by `_load_upload` or `read_and_hash`, if any."""
+    if isinstance(source, str) and os.path.exists(source):
+        os.remove(source)
+
+
+def _document_view(
+    db: Session, document, view: schemas.DocumentViewName, chunk_count: Optional[int] = None
+) -> schemas.DocumentView:
+    """
+    Projects a document onto the requested view.
+
+    Only the fields of the view are set, so responses declared with
+    `response_model_exclude_unset=True` leave the others out, and the deferred
+    content and the chunks are only loaded when the view needs them.
+    """
+    if chunk_count is None:
+        chunk_count = crud.count_chunks_by_document(db, [document.id])[document.id]
+    fields = dict(
+        id=document.id,
+        title=document.title,
+        source=document.source,
+        content_hash=document.content_hash,
+        created_at=document.created_at,
+        chunk_count=chunk_count,
+    )
+    if view in ("content", "full"):
+        fields["content"] = document.content
+    if view == "full":
+        fields["chunks"] = [schemas.TextChunk.model_validate(chunk) for chunk in document.chunks]
+    return schemas.DocumentView(**fields)
+
+
+def _overloaded(error: LLMOverloadedError) -> HTTPException:
+    """Turns an LLM governor rejection into a 429/503 response with a Retry-After header."""
+    headers = {"Retry-After": str(max(1, round(error.retry_after)))} if error.retry_after is not None else None
+    return HTTPException(status_code=error.status_code, detail=str(error), headers=headers)
+
+
+async def _sse(deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Formats text deltas as Server-Sent Events.
+
+    Each delta is sent as a JSON-encoded `{"delta": ...}` message. The stream
+    ends with a `done` event, or an `error` event if the workflow fails
+    after the response has started.
+    """
+    try:
+        async for delta in deltas:
+            yield f"data: {json.dumps({'delta': delta})}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+    else:
+        yield "event: done\ndata: {}\n\n"
 
 
 # --- API Endpoints ---
@@ -67,100 +209,375 @@ def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics_endpoint():
+    """Exposes the stage, LLM and database pool metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.Registry.CONTENT_TYPE)
+
+
 @app.post("/format-abnt/", response_model=schemas.ABNTWorkflowResponse)
-def format_abnt_endpoint(
+async def format_abnt_endpoint(
     file: UploadFile = File(...),
+    db: Session = Depends(get_db_session),
+    client=Depends(get_llm_client),
 ):
     """
     Receives a file, formats its content according to ABNT standards,
     and returns the formatted text.
     """
-    if not client:
-        raise HTTPException(status_code=500, detail="OpenAI client not initialized. Check API key.")
-        
-    # The ABNT workflow expects a file path, so we save the uploaded file temporarily
+    source = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-        
-        params = schemas.ABNTWorkflowParams(file_path=tmp_path)
-        formatted_text = abnt_workflow.run_abnt_workflow(client, params)
+        source = await asyncio.to_thread(_load_upload, file)
+
+        if isinstance(source, str):
+            params = schemas.ABNTWorkflowParams(file_path=source)
+        else:
+            params = schemas.ABNTWorkflowParams(file_content=source)
+        formatted_text = await abnt_workflow.arun_abnt_workflow(client, params, db=db)
         
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
     finally:
-        # Clean up the temporary file
-        if 'tmp_path' in locals() and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        # Clean up the temporary file, if the upload had to be spooled to disk
+        if source is not None:
+            _discard_upload(source)
 
     return {"formatted_text": formatted_text}
 
 
-@app.post("/documents/", response_model=schemas.Document)
+@app.post("/format-abnt/stream")
+async def stream_abnt_endpoint(
+    file: UploadFile = File(...),
+    client=Depends(get_llm_client),
+):
+    """
+    Streaming variant of `/format-abnt/`: the formatted text is sent as
+    Server-Sent Events while it is generated.
+    """
+    # The upload must be read now; it is closed once this function returns.
+    source = await asyncio.to_thread(_load_upload, file)
+    if isinstance(source, str):
+        params = schemas.ABNTWorkflowParams(file_path=source)
+    else:
+        params = schemas.ABNTWorkflowParams(file_content=source)
+
+    async def events() -> AsyncIterator[str]:
+        # The session must outlive this function, so the stream owns it.
+        try:
+            with database.SessionLocal() as db:
+                async for event in _sse(abnt_workflow.astream_abnt_workflow(client, params, db=db)):
+                    yield event
+        finally:
+            _discard_upload(source)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/documents/", response_model=schemas.DocumentView, response_model_exclude_unset=True)
 def ingest_document_endpoint(
     file: UploadFile = File(...),
+    view: schemas.DocumentViewName = "metadata",
     db: Session = Depends(get_db_session),
 ):
     """
     Receives a file, extracts its content, and saves it as a new
-    document in the database.
+    document in the database. Uploading the same file again returns the
+    existing document.
+
+    Only the document's metadata is returned unless another `view` is requested.
     """
+    source = None
     try:
-        # Save uploaded file to a temporary path to be read
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-
-        # Extract text using the centralized parser
-        content = read_text_from_file(tmp_path)
+        # Read the upload once, hashing it as it streams in; large uploads go to a temporary file
+        with metrics.STAGE_SECONDS.time(stage="upload"):
+            file.file.seek(0)
+            source, content_hash = read_and_hash(file.file, UPLOAD_SPOOL_THRESHOLD_BYTES)
 
-        # Create document schema and save to DB
-        document_in = schemas.DocumentCreate(
+        # A file that was already ingested is returned without being parsed again
+        db_document, _ = ingest_workflow.run_ingest_workflow(
+            db,
+            source,
             title=file.filename or "Untitled",
-            source=f"upload:{file.filename}",
-            content=content
+            source_label=f"upload:{file.filename}",
+            content_hash=content_hash,
+            embedder=get_embedder(),
+            max_tokens=CHUNK_MAX_TOKENS,
+            overlap_tokens=CHUNK_OVERLAP_TOKENS,
         )
-        db_document = crud.create_document(db=db, document=document_in)
 
-        # Split content into chunks and save them
-        chunks = content.split('\n\n')
-        for chunk_content in chunks:
-            if chunk_content.strip():  # Ensure chunk is not just whitespace
-                chunk_schema = schemas.TextChunkCreate(content=chunk_content)
-                crud.create_text_chunk(db=db, chunk=chunk_schema, document_id=db_document.id)  # type: ignore
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred during ingestion: {str(e)}")
+    finally:
+        # Clean up the temporary file, if the upload had to be spooled to disk
+        if source is not None:
+            _discard_upload(source)
+
+    return _document_view(db, db_document, view)
+
+
+@app.post("/documents/batch", response_model=schemas.BatchIngestResponse)
+def batch_ingest_endpoint(
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db_session),
+):
+    """
+    Receives many files and saves each one as a document, reporting the
+    outcome per file. Parsing runs on a process pool sized to the cores,
+    and the new documents are inserted in a single transaction.
+    """
+    if len(files) > INGEST_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {INGEST_BATCH_MAX_FILES} files can be uploaded at once.")
+
+    batch = []
+    try:
+        # Files stay in memory while the batch fits the spool threshold; the rest are spooled to disk
+        memory_left = UPLOAD_SPOOL_THRESHOLD_BYTES
+        for file in files:
+            with metrics.STAGE_SECONDS.time(stage="upload"):
+                file.file.seek(0)
+                source, content_hash = read_and_hash(file.file, memory_left)
+            if isinstance(source, bytes):
+                memory_left -= len(source)
+            batch.append(ingest_workflow.BatchFile(file.filename or "Untitled", source, content_hash))
 
-        db.refresh(db_document)
+        results = ingest_workflow.run_batch_ingest_workflow(
+            db,
+            batch,
+            embedder=get_embedder(),
+            executor=ingest_workflow.get_parse_executor(),
+            max_tokens=CHUNK_MAX_TOKENS,
+            overlap_tokens=CHUNK_OVERLAP_TOKENS,
+        )
 
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during ingestion: {str(e)}")
     finally:
-        # Clean up the temporary file
-        if 'tmp_path' in locals() and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        for file in batch:
+            _discard_upload(file.source)
+
+    statuses = [result.status for result in results]
+    return schemas.BatchIngestResponse(
+        results=results,
+        created=statuses.count("created"),
+        existing=statuses.count("existing"),
+        failed=statuses.count("failed"),
+    )
+
+
+@app.get("/documents/", response_model=schemas.DocumentPage, response_model_exclude_unset=True)
+def list_documents_endpoint(
+    after: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    view: schemas.DocumentViewName = "metadata",
+    db: Session = Depends(get_db_session),
+):
+    """
+    Lists documents in ID order, one page at a time.
+
+    Pass the `next_cursor` of a page as `after` to get the next one. The
+    "full" view is not available here; use `/documents/{id}/chunks`.
+    """
+    if view == "full":
+        raise HTTPException(status_code=400, detail="The 'full' view is only available for a single document.")
+
+    # One extra row tells whether there is a next page.
+    documents = crud.get_documents_after(db, after_id=after, limit=limit + 1, with_content=view == "content")
+    page = documents[:limit]
+    counts = crud.count_chunks_by_document(db, [document.id for document in page])
+    return schemas.DocumentPage(
+        items=[_document_view(db, document, view, counts[document.id]) for document in page],
+        next_cursor=page[-1].id if len(documents) > limit else None,
+    )
+
+
+@app.get("/documents/{document_id}", response_model=schemas.DocumentView, response_model_exclude_unset=True)
+def get_document_endpoint(
+    document_id: int,
+    view: schemas.DocumentViewName = "metadata",
+    db: Session = Depends(get_db_session),
+):
+    """
+    Returns a document's metadata, its content ("content" view) or its
+    content and every chunk ("full" view).
+    """
+    document = crud.get_document(db, document_id=document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document with ID {document_id} not found.")
+    return _document_view(db, document, view)
+
+
+@app.get("/documents/{document_id}/chunks", response_model=schemas.TextChunkPage)
+def list_document_chunks_endpoint(
+    document_id: int,
+    after: Optional[int] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: Session = Depends(get_db_session),
+):
+    """
+    Lists a document's chunks in document order, one page at a time.
+
+    Pass the `next_cursor` of a page as `after` to get the next one.
+    """
+    if crud.get_document(db, document_id=document_id) is None:
+        raise HTTPException(status_code=404, detail=f"Document with ID {document_id} not found.")
 
-    return db_document
+    chunks = crud.get_text_chunks_after(db, document_id, after_id=after, limit=limit + 1)
+    page = chunks[:limit]
+    return schemas.TextChunkPage(
+        items=[schemas.TextChunk.model_validate(chunk) for chunk in page],
+        next_cursor=page[-1].id if len(chunks) > limit else None,
+    )
 
 
 @app.post("/summarize/", response_model=schemas.SummarizationWorkflowResponse)
-def summarize_document_endpoint(
+async def summarize_document_endpoint(
     params: schemas.SummarizationWorkflowParams,
     db: Session = Depends(get_db_session),
+    client=Depends(get_llm_client),
 ):
     """
     Summarizes the content of a document stored in the database.
     """
-    if not client:
-        raise HTTPException(status_code=500, detail="OpenAI client not initialized. Check API key.")
-    
     try:
-        summary = summarization_workflow.run_summarization_workflow(
+        summary = await summarization_workflow.arun_summarization_workflow(
             client=client, db=db, params=params
         )
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
     except ValueError as e:
         # If the document is not found, it will raise a ValueError.
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-    return {"summary": summary} 
\ No newline at end of file
+    return {"summary": summary}
+
+
+@app.post("/summarize/stream")
+async def stream_summary_endpoint(
+    params: schemas.SummarizationWorkflowParams,
+    client=Depends(get_llm_client),
+):
+    """
+    Streaming variant of `/summarize/`: the summary is sent as Server-Sent
+    Events while it is generated.
+    """
+    def document_exists() -> bool:
+        with database.SessionLocal() as db:
+            return crud.get_document(db, document_id=params.document_id) is not None
+
+    # Checked up front so a missing document is still a 404 rather than an error event.
+    if not await asyncio.to_thread(document_exists):
+        raise HTTPException(status_code=404, detail=f"Document with ID {params.document_id} not found.")
+
+    async def events() -> AsyncIterator[str]:
+        # The session must outlive this function, so the stream owns it.
+        with database.SessionLocal() as db:
+            async for event in _sse(summarization_workflow.astream_summarization_workflow(client, db, params)):
+                yield event
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/search/", response_model=schemas.SearchResponse)
+async def search_endpoint(
+    params: schemas.SearchParams,
+    db: Session = Depends(get_db_session),
+):
+    """
+    Returns the stored chunks most similar to a query.
+    """
+    embedder = get_embedder()
+    if not embedder:
+        raise HTTPException(status_code=503, detail="Embeddings are disabled. Set EMBEDDING_BACKEND to enable search.")
+
+    try:
+        results = await search_workflow.arun_search_workflow(embedder=embedder, db=db, params=params)
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+    return {"results": results}
+
+
+@app.post("/search/keyword/", response_model=schemas.KeywordSearchResponse)
+async def keyword_search_endpoint(
+    params: schemas.KeywordSearchParams,
+    db: Session = Depends(get_db_session),
+):
+    """
+    Returns the documents or chunks containing every word of a query,
+    ranked by relevance.
+    """
+    try:
+        return await search_workflow.arun_keyword_search_workflow(db=db, params=params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+
+# --- Background Jobs ---
+
+@app.post("/jobs/format-abnt/", response_model=schemas.Job, status_code=202)
+def submit_abnt_job_endpoint(
+    file: UploadFile = File(...),
+    queue: str = "interactive",
+    priority: int = 0,
+    db: Session = Depends(get_db_session),
+):
+    """
+    Queues the ABNT formatting of a file and returns the job immediately.
+    Poll `/jobs/{job_id}` for the formatted text.
+    """
+    job_in = schemas.JobCreate(kind="abnt", queue=queue, priority=priority, params="{}")
+    try:
+        return job_runner.submit(db, job_in, input_file=file.file.read())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/jobs/summarize/", response_model=schemas.Job, status_code=202)
+def submit_summarization_job_endpoint(
+    request: schemas.SummarizationJobRequest,
+    db: Session = Depends(get_db_session),
+):
+    """
+    Queues the summarization of a stored document and returns the job immediately.
+    Poll `/jobs/{job_id}` for the summary.
+    """
+    job_in = schemas.JobCreate(
+        kind="summarize", queue=request.queue, priority=request.priority, params=request.params.model_dump_json()
+    )
+    try:
+        return job_runner.submit(db, job_in)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+def get_job_endpoint(job_id: str, db: Session = Depends(get_db_session)):
+    """
+    Returns the status of a job, with its result once it has succeeded.
+    """
+    job = crud.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel", response_model=schemas.Job)
+def cancel_job_endpoint(job_id: str, db: Session = Depends(get_db_session)):
+    """
+    Cancels a job. Queued jobs never run; a running job finishes in the
+    background but its result is discarded.
+    """
+    job = crud.cancel_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
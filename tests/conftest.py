@@ -0,0 +1,46 @@
+"""
+Shared test configuration.
+"""
+
+import os
+
+# Tests use mocked LLM clients; a persistent response cache would leak results
+# between tests (and runs), so it is disabled unless a test opts in.
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+# Ingest embeds chunks; use the local deterministic embedder instead of the API.
+os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.academic_agent.database.models import Base
+
+
+@pytest.fixture
+def db_engine():
+    """
+    A fresh in-memory SQLite database with every table, dropped after the test.
+
+    StaticPool shares the one in-memory connection, so sessions opened on other
+    threads (e.g. by workflows running in worker threads) see the same data.
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    try:
+        yield engine
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine):
+    """A session on `db_engine`, closed after the test."""
+    db = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    try:
+        yield db
+    finally:
+        db.close()
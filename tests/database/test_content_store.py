@@ -0,0 +1,60 @@
+"""
+Unit tests for the compressed document body format.
+"""
+
+import pytest
+
+from src.academic_agent.database import content_store
+
+
+TEXT = "".join(f"Seção {i}: citação, análise e referências. " for i in range(500))
+
+
+@pytest.mark.parametrize("text", ["", "curto", TEXT])
+def test_round_trip(text):
+    """
+    Tests that a text decompresses back to itself, whatever its length.
+    """
+    blob = content_store.compress_text(text, block_chars=1000)
+
+    assert content_store.decompress_text(blob) == text
+    assert content_store.text_length(blob) == len(text)
+
+
+def test_compresses_repetitive_text():
+    """
+    Tests that an academic-like text takes much less space than its UTF-8 encoding.
+    """
+    assert len(content_store.compress_text(TEXT)) < len(TEXT.encode("utf-8")) / 5
+
+
+@pytest.mark.parametrize("start, end", [(0, 10), (995, 1005), (1000, 3000), (150, 150), (len(TEXT) - 5, len(TEXT) + 50)])
+def test_read_slice_matches_the_text(start, end):
+    """
+    Tests that slices within and across block boundaries match the original text.
+    """
+    blob = content_store.compress_text(TEXT, block_chars=1000)
+
+    assert content_store.read_slice(blob, start, end) == TEXT[start:end]
+
+
+def test_read_slice_only_decompresses_the_blocks_it_needs():
+    """
+    Tests that a slice decompresses only the blocks it overlaps, and reuses them through the cache.
+    """
+    blob = content_store.compress_text(TEXT, block_chars=1000)
+    cache = {}
+
+    content_store.read_slice(blob, 1990, 2010, cache=cache)
+    assert sorted(cache) == [1, 2]
+
+    cache[2] = "x" * 1000  # A cached block is used as is
+    assert content_store.read_slice(blob, 2000, 2003, cache=cache) == "xxx"
+
+
+def test_rejects_other_data():
+    """
+    Tests that a blob that was not made by compress_text is rejected.
+    """
+    with pytest.raises(ValueError):
+        content_store.decompress_text(b"plain text, not a compressed body")
@@ -2,6 +2,8 @@
 Tests for CRUD operations.
 """
 
+import pytest
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
 from src.academic_agent.database import crud
 from src.academic_agent.validation import schemas
@@ -75,4 +77,129 @@ def test_create_and_get_chunks(db_session: Session):
     chunks = crud.get_text_chunks_by_document(db=db_session, document_id=parent_doc.id)
     assert len(chunks) == 2
     assert chunks[0].content == chunk1_in.content
-    assert chunks[1].content == chunk2_in.content 
\ No newline at end of file
+    assert chunks[1].content == chunk2_in.content
+
+
+def test_create_text_chunks_bulk(db_session: Session):
+    """
+    Test inserting many chunks at once and retrieving them in order.
+    """
+    parent_doc = crud.create_document(db=db_session, document=schemas.DocumentCreate(title="Bulk", content="..."))
+    chunks_in = [schemas.TextChunkCreate(content=f"Chunk {i}") for i in range(50)]
+
+    inserted = crud.create_text_chunks_bulk(db=db_session, chunks=chunks_in, document_id=parent_doc.id)
+
+    assert inserted == 50
+    chunks = crud.get_text_chunks_by_document(db=db_session, document_id=parent_doc.id)
+    assert [c.content for c in chunks] == [c.content for c in chunks_in]
+    assert all(c.created_at is not None for c in chunks)
+
+def test_create_document_with_chunks(db_session: Session):
+    """
+    Test that a document and its chunks are created together.
+    """
+    doc_in = schemas.DocumentCreate(title="Thesis", content="A\n\nB")
+    chunks_in = [schemas.TextChunkCreate(content="A"), schemas.TextChunkCreate(content="B")]
+
+    created_doc = crud.create_document_with_chunks(db=db_session, document=doc_in, chunks=chunks_in)
+
+    assert created_doc.id is not None
+    assert [c.content for c in created_doc.chunks] == ["A", "B"]
+
+def test_create_document_with_chunks_is_atomic(db_session: Session, mocker):
+    """
+    Test that a failure while inserting chunks rolls back the document too.
+    """
+    mocker.patch.object(crud, "create_text_chunks_bulk", side_effect=RuntimeError("insert failed"))
+    doc_in = schemas.DocumentCreate(title="Broken", content="...")
+
+    with pytest.raises(RuntimeError, match="insert failed"):
+        crud.create_document_with_chunks(
+            db=db_session, document=doc_in, chunks=[schemas.TextChunkCreate(content="x")]
+        )
+
+    assert crud.get_documents(db=db_session) == []
+
+def test_bulk_chunks_store_chunker_metadata(db_session: Session):
+    """
+    Test that token counts, character spans and page ranges are persisted.
+    """
+    parent_doc = crud.create_document(db=db_session, document=schemas.DocumentCreate(title="Meta", content="Abc def"))
+    chunk_in = schemas.TextChunkCreate(
+        content="Abc def", token_count=2, char_start=0, char_end=7, page_start=1, page_end=2
+    )
+
+    crud.create_text_chunks_bulk(db=db_session, chunks=[chunk_in], document_id=parent_doc.id)
+
+    (chunk,) = crud.get_text_chunks_by_document(db=db_session, document_id=parent_doc.id)
+    assert (chunk.token_count, chunk.char_start, chunk.char_end, chunk.page_start, chunk.page_end) == (2, 0, 7, 1, 2)
+
+def test_get_documents_after_uses_an_id_cursor(db_session: Session):
+    """
+    Test keyset pagination of documents, without loading their content.
+    """
+    ids = [
+        crud.create_document(db=db_session, document=schemas.DocumentCreate(title=f"Doc {i}", content="x" * 100)).id
+        for i in range(5)
+    ]
+    db_session.expunge_all()
+
+    first = crud.get_documents_after(db=db_session, limit=2)
+    second = crud.get_documents_after(db=db_session, after_id=first[-1].id, limit=2)
+    last = crud.get_documents_after(db=db_session, after_id=second[-1].id, limit=2)
+
+    assert [d.id for d in first + second + last] == ids
+    assert "body" in inspect(first[0]).unloaded
+    assert first[0].content == "x" * 100  # Loaded on first access
+
+def test_get_documents_after_can_load_content(db_session: Session):
+    """
+    Test that the content can be loaded in the same query when it is needed.
+    """
+    crud.create_document(db=db_session, document=schemas.DocumentCreate(title="Doc", content="Texto"))
+    db_session.expunge_all()
+
+    (doc,) = crud.get_documents_after(db=db_session, with_content=True)
+
+    assert "body" not in inspect(doc).unloaded
+
+def test_get_text_chunks_after_and_counts(db_session: Session):
+    """
+    Test keyset pagination of a document's chunks and the chunk counts.
+    """
+    doc = crud.create_document_with_chunks(
+        db=db_session,
+        document=schemas.DocumentCreate(title="Doc", content="abc"),
+        chunks=[schemas.TextChunkCreate(content=c) for c in "abc"],
+    )
+    empty = crud.create_document(db=db_session, document=schemas.DocumentCreate(title="Empty", content=""))
+
+    first = crud.get_text_chunks_after(db=db_session, document_id=doc.id, limit=2)
+    rest = crud.get_text_chunks_after(db=db_session, document_id=doc.id, after_id=first[-1].id, limit=2)
+
+    assert [c.content for c in first] == ["a", "b"]
+    assert [c.content for c in rest] == ["c"]
+    assert crud.count_chunks_by_document(db=db_session, document_ids=[doc.id, empty.id]) == {doc.id: 3, empty.id: 0}
+
+
+def test_chunks_of_the_document_text_are_stored_as_offsets(db_session: Session):
+    """
+    Test that chunks that are ranges of the document text store no text of their own.
+    """
+    content = "Primeira parte.\n\nSegunda parte."
+    created_doc = crud.create_document_with_chunks(
+        db=db_session,
+        document=schemas.DocumentCreate(title="Offsets", content=content),
+        chunks=[
+            schemas.TextChunkCreate(content="Primeira parte.", char_start=0, char_end=15),
+            schemas.TextChunkCreate(content="Segunda parte.", char_start=17, char_end=31),
+            schemas.TextChunkCreate(content="Texto reescrito.", char_start=0, char_end=15),
+        ],
+    )
+    db_session.expire_all()
+
+    chunks = crud.get_text_chunks_by_document(db=db_session, document_id=created_doc.id)
+
+    assert [c.stored_content for c in chunks] == [None, None, "Texto reescrito."]
+    assert [c.content for c in chunks] == ["Primeira parte.", "Segunda parte.", "Texto reescrito."]
+    assert isinstance(chunks[0].document.body, bytes)
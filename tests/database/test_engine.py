@@ -0,0 +1,134 @@
+"""
+Tests for the engine profile and the SQLite single-writer queue.
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from src.academic_agent.database import crud
+from src.academic_agent.database.database import build_engine
+from src.academic_agent.database.models import Base
+from src.academic_agent.database.writer import (
+    SingleWriter,
+    get_single_writer,
+    shutdown_single_writer,
+    single_writer,
+)
+from src.academic_agent.validation import schemas
+
+
+def test_sqlite_file_engine_uses_wal(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "2500")
+    engine = build_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    try:
+        with engine.connect() as connection:
+            assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 2500
+    finally:
+        engine.dispose()
+
+
+def test_in_memory_engine_has_no_writer_queue():
+    engine = build_engine("sqlite://")
+    db = sessionmaker(bind=engine)()
+    try:
+        assert get_single_writer(db) is None
+    finally:
+        db.close()
+
+
+def test_single_writer_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_SINGLE_WRITER", "false")
+    engine = build_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    db = sessionmaker(bind=engine)()
+    try:
+        assert get_single_writer(db) is None
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_shutdown_single_writer_flushes_and_stops_the_thread(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        writer = get_single_writer(db)
+        crud.create_document(db, schemas.DocumentCreate(title="Antes", content="texto", content_hash="a"))
+
+        shutdown_single_writer(engine)
+
+        with pytest.raises(RuntimeError):
+            writer.run(lambda: None)
+        assert get_single_writer(db) is None
+        # Writes after the shutdown run directly on the calling thread
+        crud.create_document(db, schemas.DocumentCreate(title="Depois", content="texto", content_hash="b"))
+        assert [document.title for document in crud.get_documents(db)] == ["Antes", "Depois"]
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_hot_columns_are_indexed(db_session):
+    inspector = inspect(db_session.get_bind())
+    chunk_indexes = [index["column_names"] for index in inspector.get_indexes("text_chunks")]
+    document_indexes = [index["column_names"] for index in inspector.get_indexes("documents")]
+    assert ["document_id"] in chunk_indexes
+    assert ["created_at"] in document_indexes
+
+
+def test_single_writer_runs_writes_on_one_thread_and_nests():
+    writer = SingleWriter()
+    threads = set()
+
+    def inner():
+        threads.add(threading.current_thread().name)
+        return "inner"
+
+    def outer():
+        threads.add(threading.current_thread().name)
+        return writer.run(inner)  # Would deadlock if nested calls were queued
+
+    try:
+        assert writer.run(outer) == "inner"
+        assert len(threads) == 1
+        assert threading.current_thread().name not in threads
+    finally:
+        writer.shutdown()
+
+
+def test_concurrent_ingest_through_the_writer_queue(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    writer_threads = set()
+
+    @single_writer
+    def record_thread(db):
+        writer_threads.add(threading.get_ident())
+
+    def ingest(n):
+        with session_factory() as db:
+            record_thread(db)
+            crud.create_document_with_chunks(
+                db,
+                schemas.DocumentCreate(title=f"doc {n}", content="..."),
+                [schemas.TextChunkCreate(content=f"chunk {n}.{i}") for i in range(20)],
+            )
+
+    threads = [threading.Thread(target=ingest, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        with session_factory() as db:
+            assert len(crud.get_documents_after(db, after_id=None, limit=100)) == 8
+        assert len(writer_threads) == 1
+    finally:
+        engine.dispose()
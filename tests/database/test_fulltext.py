@@ -0,0 +1,130 @@
+"""
+Unit tests for the keyword (full-text) search index.
+"""
+
+import time
+
+from sqlalchemy.orm import Session
+
+from src.academic_agent.database import crud, fulltext
+from src.academic_agent.validation import schemas
+
+
+def _ingest(db: Session, title: str, chunks: list[str]):
+    return crud.create_document_with_chunks(
+        db,
+        schemas.DocumentCreate(title=title, content="\n\n".join(chunks)),
+        [schemas.TextChunkCreate(content=chunk) for chunk in chunks],
+    )
+
+
+def test_chunks_are_indexed_on_insert_and_ranked(db_session: Session):
+    """
+    Tests that chunks inserted through crud are searchable and ranked by BM25.
+    """
+    document = _ingest(db_session, "Tese", [
+        "Introdução ao tema da pesquisa.",
+        "A metodologia qualitativa usa entrevistas; a metodologia é descrita em detalhe.",
+        "Uma menção breve à metodologia.",
+    ])
+
+    hits = fulltext.search(db_session, "metodologia")
+
+    assert [hit.chunk_id for hit in hits] == [document.chunks[1].id, document.chunks[2].id]
+    assert hits[0].score > hits[1].score
+    assert hits[0].title == "Tese"
+    assert "[metodologia]" in hits[0].snippet
+
+
+def test_search_ignores_accents_and_operator_syntax(db_session: Session):
+    """
+    Tests that accents are folded and FTS5 syntax in the query is treated as text.
+    """
+    _ingest(db_session, "Artigo", ["Revisão sistemática da literatura."])
+
+    assert len(fulltext.search(db_session, "revisao")) == 1
+    assert len(fulltext.search(db_session, 'revisão" (literatura*')) == 1
+    assert fulltext.search(db_session, "?!") == []
+
+
+def test_search_documents_and_single_document_scope(db_session: Session):
+    """
+    Tests the document scope (title included) and the per-document chunk filter.
+    """
+    first = _ingest(db_session, "Ecologia do cerrado", ["Solos ácidos e fogo."])
+    second = _ingest(db_session, "Agronomia", ["Manejo de solos no cerrado."])
+
+    documents = fulltext.search(db_session, "cerrado", scope="documents")
+    chunks = fulltext.search(db_session, "solos", document_id=second.id)
+
+    assert {hit.document_id for hit in documents} == {first.id, second.id}
+    assert all(hit.chunk_id is None for hit in documents)
+    assert [hit.document_id for hit in chunks] == [second.id]
+
+
+def test_pagination_returns_disjoint_pages(db_session: Session):
+    """
+    Tests that limit/offset pages cover every hit exactly once.
+    """
+    _ingest(db_session, "Livro", [f"Capítulo {i} sobre citações." for i in range(7)])
+
+    pages = [fulltext.search(db_session, "citações", limit=3, offset=offset) for offset in (0, 3, 6)]
+
+    ids = [hit.chunk_id for page in pages for hit in page]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert len(set(ids)) == 7
+
+
+def test_search_is_fast_over_many_chunks(db_session: Session):
+    """
+    Tests that a ranked query over 20,000 chunks runs in milliseconds.
+    """
+    words = ["análise", "dados", "modelo", "teoria", "campo", "amostra", "variável", "hipótese"]
+    for batch in range(4):
+        _ingest(db_session, f"Corpus {batch}", [
+            f"{words[i % 8]} {words[(i * 3) % 8]} {words[(i * 5 + batch) % 8]} registro {batch}-{i}"
+            for i in range(5000)
+        ])
+    _ingest(db_session, "Alvo", ["epistemologia genética"])
+
+    start = time.perf_counter()
+    rare = fulltext.search(db_session, "epistemologia")
+    common = fulltext.search(db_session, "modelo teoria", limit=20)
+    elapsed = time.perf_counter() - start
+
+    assert len(rare) == 1 and len(common) == 20
+    assert elapsed < 0.5
+
+
+def test_chunks_stored_as_offsets_are_searchable(db_session: Session):
+    """
+    Tests that chunks read from the compressed document body are indexed and get snippets.
+    """
+    chunks = ["Introdução ao tema.", "A metodologia qualitativa."]
+    content = "\n\n".join(chunks)
+    document = crud.create_document_with_chunks(
+        db_session,
+        schemas.DocumentCreate(title="Tese", content=content),
+        [
+            schemas.TextChunkCreate(content=chunk, char_start=content.index(chunk), char_end=content.index(chunk) + len(chunk))
+            for chunk in chunks
+        ],
+    )
+
+    hits = fulltext.search(db_session, "metodologia")
+    documents = fulltext.search(db_session, "introducao", scope="documents")
+
+    assert document.chunks[1].stored_content is None
+    assert [(hit.chunk_id, hit.snippet) for hit in hits] == [(document.chunks[1].id, "A [metodologia] qualitativa.")]
+    assert documents[0].snippet.startswith("[Introdução] ao tema.")
+
+
+def test_make_snippet_cuts_around_the_first_match():
+    """
+    Tests that long texts are cut around the first matching word, marked with ellipses.
+    """
+    content = " ".join(f"palavra{i}" for i in range(40)) + " Análise final " + " ".join(f"w{i}" for i in range(40))
+
+    snippet = fulltext.make_snippet(content, "analise", max_tokens=6)
+
+    assert snippet == "…palavra39 [Análise] final w0 w1 w2…"
@@ -0,0 +1,139 @@
+"""
+Tests for upgrading databases created by older versions.
+"""
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from src.academic_agent.database import crud, fulltext, migrations
+from src.academic_agent.database.database import init_db
+from src.academic_agent.validation import schemas
+
+# The schema of the first released version, before any upgrade.
+BASELINE_DDL = [
+    """CREATE TABLE documents (
+        id INTEGER NOT NULL,
+        title VARCHAR(255) NOT NULL,
+        source VARCHAR(255),
+        content TEXT NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE text_chunks (
+        id INTEGER NOT NULL,
+        document_id INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        embedding TEXT,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(document_id) REFERENCES documents (id)
+    )""",
+    "INSERT INTO documents (id, title, content) VALUES (1, 'Tese antiga', 'Uma análise de metodologia qualitativa.')",
+    "INSERT INTO text_chunks (id, document_id, content) VALUES (1, 1, 'Uma análise')",
+    "INSERT INTO text_chunks (id, document_id, content) VALUES (2, 1, 'de metodologia qualitativa.')",
+]
+
+
+def _baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        for statement in BASELINE_DDL:
+            connection.exec_driver_sql(statement)
+    return engine
+
+
+def test_baseline_database_is_upgraded(tmp_path):
+    """
+    Tests that init_db upgrades a database with the first schema: texts are
+    compressed, old rows stay readable and searchable, and new rows can be stored.
+    """
+    engine = _baseline_engine(tmp_path)
+    try:
+        init_db(engine)
+        init_db(engine)  # A second start finds nothing to upgrade
+
+        columns = {column["name"]: column for column in inspect(engine).get_columns("text_chunks")}
+        assert "content" not in {column["name"] for column in inspect(engine).get_columns("documents")}
+        assert columns["content"]["nullable"] and "char_start" in columns
+
+        with sessionmaker(bind=engine)() as db:
+            document = crud.get_document(db, 1)
+            assert document.content == "Uma análise de metodologia qualitativa."
+            assert [chunk.content for chunk in crud.get_text_chunks_by_document(db, 1)] == [
+                "Uma análise", "de metodologia qualitativa."
+            ]
+            assert [hit.chunk_id for hit in fulltext.search(db, "metodologia")] == [2]
+            assert [hit.document_id for hit in fulltext.search(db, "analise", scope="documents")] == [1]
+
+            text = "Um estudo de caso novo."
+            new = crud.create_document_with_chunks(
+                db,
+                schemas.DocumentCreate(title="Tese nova", content=text, content_hash="a" * 64),
+                [schemas.TextChunkCreate(content=text, char_start=0, char_end=len(text))],
+            )
+            assert [hit.document_id for hit in fulltext.search(db, "estudo")] == [new.id]
+    finally:
+        engine.dispose()
+
+
+def test_old_keyword_indexes_are_rebuilt(tmp_path):
+    """
+    Tests that the FTS5 tables of versions that indexed the text columns are replaced.
+    """
+    engine = _baseline_engine(tmp_path)
+    try:
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE VIRTUAL TABLE documents_fts USING fts5(title, content, content='documents', content_rowid='id')"
+            )
+            connection.exec_driver_sql("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
+
+        init_db(engine)
+
+        with sessionmaker(bind=engine)() as db:
+            hits = fulltext.search(db, "qualitativa", scope="documents")
+            assert [(hit.document_id, hit.snippet) for hit in hits] == [
+                (1, "Uma análise de metodologia [qualitativa].")
+            ]
+    finally:
+        engine.dispose()
+
+
+def test_interrupted_upgrade_leaves_the_database_unchanged(tmp_path, mocker):
+    """
+    Tests that the SQLite rebuild is atomic: an upgrade that fails after
+    replacing `documents` but before `text_chunks` is rolled back entirely,
+    and the next start upgrades the database normally.
+    """
+    engine = _baseline_engine(tmp_path)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE VIRTUAL TABLE documents_fts USING fts5(title, content, content='documents', content_rowid='id')"
+        )
+    rebuild = migrations._rebuild_sqlite_table
+
+    def rebuild_documents_only(connection, table, transform=None):
+        if table.name == "text_chunks":
+            raise RuntimeError("interrupted")
+        rebuild(connection, table, transform)
+
+    try:
+        tables = set(inspect(engine).get_table_names())
+        mocker.patch.object(migrations, "_rebuild_sqlite_table", side_effect=rebuild_documents_only)
+        with pytest.raises(RuntimeError, match="interrupted"):
+            init_db(engine)
+
+        assert set(inspect(engine).get_table_names()) == tables
+        assert "content" in {column["name"] for column in inspect(engine).get_columns("documents")}
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("SELECT content FROM documents").scalars().all() == [
+                "Uma análise de metodologia qualitativa."
+            ]
+
+        mocker.stopall()
+        init_db(engine)
+        with sessionmaker(bind=engine)() as db:
+            assert crud.get_document(db, 1).content == "Uma análise de metodologia qualitativa."
+    finally:
+        engine.dispose()
@@ -1,5 +1,10 @@
+import asyncio
+import threading
+import time
+
 import pytest
 from src.academic_agent.core.AcademicAgent import AcademicAgent
+from src.academic_agent.validation.schemas import ABNTWorkflowParams
 from unittest.mock import MagicMock
 
 def test_academic_agent_initialization():
@@ -43,7 +48,8 @@ def test_run_task_for_abnt_formatting(mocker):
         return_value="Texto formatado em ABNT."
     )
 
-    agent = AcademicAgent()
+    db = MagicMock()
+    agent = AcademicAgent(session_factory=lambda: db)
     params = {"file_path": "/fake/path/document.docx"}
     
     result = agent.run_task("abnt_formatting", params)
@@ -51,8 +57,26 @@ def test_run_task_for_abnt_formatting(mocker):
     # Verifica se o resultado é o esperado
     assert result == "Texto formatado em ABNT."
     
-    # Verifica se a função do workflow foi chamada corretamente
-    mock_abnt_workflow.assert_called_once_with(agent.client, params)
+    # Verifica se a função do workflow foi chamada corretamente, com os parâmetros validados e uma
+    # sessão do banco (para guardar e reutilizar o resultado), fechada ao final
+    mock_abnt_workflow.assert_called_once_with(agent.client, ABNTWorkflowParams(**params), db=db.__enter__())
+    db.__exit__.assert_called_once()
+
+def test_arun_task_for_abnt_formatting_uses_a_session(mocker):
+    """
+    Testa se a versão assíncrona da formatação ABNT também recebe uma sessão do banco.
+    """
+    async def abnt(client, params, db):
+        return (client, db)
+
+    mocker.patch('src.academic_agent.core.AcademicAgent.arun_abnt_workflow', side_effect=abnt)
+    db = MagicMock()
+    agent = AcademicAgent(session_factory=lambda: db)
+
+    client, session = asyncio.run(agent.arun_task("abnt_formatting", {"file_path": "/fake/tese.pdf"}))
+
+    assert client is agent.async_client
+    assert session is db.__enter__()
 
 def test_run_task_with_invalid_task():
     """
@@ -60,4 +84,162 @@ def test_run_task_with_invalid_task():
     """
     agent = AcademicAgent()
     with pytest.raises(ValueError, match="Tarefa desconhecida: non_existent_task"):
-        agent.run_task("non_existent_task", {})
\ No newline at end of file
+        agent.run_task("non_existent_task", {})
+
+def test_run_tasks_returns_results_in_order_with_errors_and_timings(mocker):
+    """
+    Testa se run_tasks devolve os resultados na ordem das tarefas, com o erro de cada tarefa que falhou.
+    """
+    def writing(client, params):
+        time.sleep(params["delay"])
+        if params.get("fail"):
+            raise RuntimeError("falhou")
+        return params["prompt"]
+
+    mocker.patch('src.academic_agent.core.AcademicAgent.run_writing_workflow', side_effect=writing)
+
+    agent = AcademicAgent()
+    tasks = [
+        ("writing", {"prompt": "a", "delay": 0.05}),
+        ("writing", {"prompt": "b", "delay": 0.0, "fail": True}),
+        ("non_existent_task", {}),
+        ("writing", {"prompt": "d", "delay": 0.0}),
+    ]
+
+    results = agent.run_tasks(tasks, max_concurrency=4)
+
+    assert [r.index for r in results] == [0, 1, 2, 3]
+    assert results[0].ok and results[0].result == "a" and results[0].seconds >= 0.05
+    assert isinstance(results[1].error, RuntimeError)
+    assert isinstance(results[2].error, ValueError)
+    assert results[3].result == "d"
+
+def test_run_tasks_respects_max_concurrency(mocker):
+    """
+    Testa se run_tasks executa as tarefas em paralelo sem passar de max_concurrency.
+    """
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def writing(client, params):
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+        return "ok"
+
+    mocker.patch('src.academic_agent.core.AcademicAgent.run_writing_workflow', side_effect=writing)
+
+    results = AcademicAgent().run_tasks([("writing", {"prompt": str(i)}) for i in range(9)], max_concurrency=3)
+
+    assert all(r.ok for r in results)
+    assert running["peak"] == 3
+
+def test_iter_tasks_yields_results_as_they_complete(mocker):
+    """
+    Testa se iter_tasks entrega primeiro as tarefas que terminam primeiro.
+    """
+    mocker.patch(
+        'src.academic_agent.core.AcademicAgent.run_writing_workflow',
+        side_effect=lambda client, params: time.sleep(params["delay"]) or params["delay"],
+    )
+
+    results = list(AcademicAgent().iter_tasks([("writing", {"delay": 0.2}), ("writing", {"delay": 0.0})]))
+
+    assert [r.index for r in results] == [1, 0]
+
+def test_arun_tasks_runs_concurrently_and_keeps_order(mocker):
+    """
+    Testa se arun_tasks executa as tarefas no event loop, concorrentemente, e devolve os resultados em ordem.
+    """
+    async def writing(client, params):
+        await asyncio.sleep(params["delay"])
+        if params.get("fail"):
+            raise RuntimeError("falhou")
+        return params["prompt"]
+
+    mocker.patch('src.academic_agent.core.AcademicAgent.arun_writing_workflow', side_effect=writing)
+
+    agent = AcademicAgent()
+    tasks = [("writing", {"prompt": str(i), "delay": 0.1, "fail": i == 2}) for i in range(5)]
+
+    start = time.perf_counter()
+    results = asyncio.run(agent.arun_tasks(tasks))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.3
+    assert [r.result for r in results] == ["0", "1", None, "3", "4"]
+    assert isinstance(results[2].error, RuntimeError)
+
+def test_aiter_tasks_streams_results_and_shares_the_async_client(mocker):
+    """
+    Testa se aiter_tasks entrega os resultados conforme terminam, com um único cliente assíncrono.
+    """
+    clients = []
+
+    async def writing(client, params):
+        clients.append(client)
+        await asyncio.sleep(params["delay"])
+        return params["delay"]
+
+    mocker.patch('src.academic_agent.core.AcademicAgent.arun_writing_workflow', side_effect=writing)
+
+    agent = AcademicAgent()
+
+    async def collect():
+        return [r async for r in agent.aiter_tasks([("writing", {"delay": 0.1}), ("writing", {"delay": 0.0})])]
+
+    results = asyncio.run(collect())
+
+    assert [r.index for r in results] == [1, 0]
+    assert clients[0] is clients[1] is agent.async_client
+
+
+def test_aclose_closes_both_clients(mocker):
+    """
+    Testa se o agente usado com async with fecha o cliente assíncrono criado sob demanda e o síncrono.
+    """
+    async def writing(client, params):
+        return "texto"
+
+    mocker.patch('src.academic_agent.core.AcademicAgent.arun_writing_workflow', side_effect=writing)
+
+    async def run():
+        async with AcademicAgent() as agent:
+            await agent.arun_task("writing", {"prompt": "Olá"})
+            async_client = agent.async_client
+        return agent, async_client
+
+    agent, async_client = asyncio.run(run())
+
+    assert async_client.is_closed()
+    assert agent.client.is_closed()
+    assert agent.async_client is None
+
+def test_abnt_formatting_initializes_the_default_database(mocker, tmp_path):
+    """
+    Testa se, sem session_factory, o agente cria as tabelas de um banco novo
+    antes de usá-lo, e guarda nele o resultado da formatação ABNT.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.academic_agent.database import database, models
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'novo.db'}")
+    mocker.patch.object(database, "engine", engine)
+    mocker.patch.object(database, "SessionLocal", sessionmaker(bind=engine))
+    mocker.patch('src.academic_agent.workflows.abnt_workflow.read_text_from_file', return_value="Texto da tese.")
+    response = MagicMock()
+    response.choices[0].message.content = "Texto formatado."
+    agent = AcademicAgent(openai_api_key="test")
+    agent.client = MagicMock()
+    agent.client.chat.completions.create.return_value = response
+
+    try:
+        assert agent.run_task("abnt_formatting", {"file_path": "/fake/tese.docx"}) == "Texto formatado."
+        with database.SessionLocal() as db:
+            assert [output.formatted_text for output in db.query(models.ABNTOutput)] == ["Texto formatado."]
+    finally:
+        engine.dispose()
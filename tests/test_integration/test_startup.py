@@ -0,0 +1,28 @@
+"""
+Tests that importing the app is side-effect free and keeps heavy backends lazy.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+
+PROBE = (
+    "import json, sys\n"
+    "import main\n"
+    "print(json.dumps({name: name in sys.modules for name in ('openai', 'fitz', 'docx')}))\n"
+)
+
+
+def test_importing_the_app_is_lazy_and_does_not_touch_the_database(tmp_path):
+    db_path = tmp_path / "app.db"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "OPENAI_API_KEY": "fake"}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=SRC, env=env, capture_output=True, text=True, check=True
+    )
+
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    assert loaded == {"openai": False, "fitz": False, "docx": False}
+    assert not db_path.exists()
@@ -0,0 +1 @@
+# This file makes tests/test_jobs a Python package. 
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""
+Unit tests for the background job runner.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from src.academic_agent.database import crud
+from src.academic_agent.database.models import Base
+from src.academic_agent.jobs import runner as runner_module
+from src.academic_agent.jobs.runner import JobRunner, parse_queues
+from src.academic_agent.validation import schemas
+
+
+def echo_job(kind, params, input_file):
+    """Module-level so it can run in a process pool."""
+    return f"{kind}:{params['text']}:{len(input_file or b'')}"
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A file database, so each worker thread gets its own connection.
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def _job(text, queue="interactive", priority=0):
+    return schemas.JobCreate(kind="summarize", queue=queue, priority=priority, params=json.dumps({"text": text}))
+
+
+def _wait_for(session_factory, job_id, statuses=("succeeded", "failed", "cancelled"), timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with session_factory() as db:
+            job = crud.get_job(db, job_id)
+            if job.status in statuses:
+                return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not reach {statuses}")
+
+
+@pytest.fixture
+def make_runner(session_factory):
+    runners = []
+
+    def make(execute=echo_job, queues=None, **kwargs):
+        runner = JobRunner(session_factory, queues or {"interactive": 1}, execute=execute, poll_interval=5, **kwargs)
+        runners.append(runner)
+        return runner
+
+    yield make
+    for runner in runners:
+        runner.stop(timeout=5)
+
+
+def test_job_result_is_persisted(session_factory, make_runner):
+    """
+    Tests that a submitted job runs in the background and stores its result,
+    dropping the uploaded file.
+    """
+    runner = make_runner()
+    runner.start()
+    with session_factory() as db:
+        job_id = runner.submit(db, _job("olá"), input_file=b"1234").id
+
+    job = _wait_for(session_factory, job_id)
+
+    assert job.status == "succeeded"
+    assert job.result == "summarize:olá:4"
+    assert job.input_file is None
+    assert job.started_at is not None and job.finished_at is not None
+
+
+def test_failed_job_records_the_error(session_factory, make_runner):
+    """
+    Tests that an exception in the workflow marks the job as failed.
+    """
+    def fail(kind, params, input_file):
+        raise ValueError("Document with ID 9 not found.")
+
+    runner = make_runner(execute=fail)
+    runner.start()
+    with session_factory() as db:
+        job_id = runner.submit(db, _job("x")).id
+
+    job = _wait_for(session_factory, job_id)
+
+    assert (job.status, job.error, job.result) == ("failed", "Document with ID 9 not found.", None)
+
+
+def test_jobs_run_by_priority_then_age(session_factory, make_runner):
+    """
+    Tests that a single worker picks higher priorities first, oldest first among equals.
+    """
+    order = []
+    runner = make_runner(execute=lambda kind, params, input_file: order.append(params["text"]) or "")
+    with session_factory() as db:
+        ids = [
+            runner.submit(db, _job(text, priority=priority)).id
+            for text, priority in [("low", 0), ("high-1", 5), ("mid", 2), ("high-2", 5)]
+        ]
+    runner.start()
+    for job_id in ids:
+        _wait_for(session_factory, job_id)
+
+    assert order == ["high-1", "high-2", "mid", "low"]
+
+
+def test_batch_backlog_does_not_starve_interactive_jobs(session_factory, make_runner):
+    """
+    Tests that a busy batch queue leaves the interactive workers free.
+    """
+    release = threading.Event()
+
+    def execute(kind, params, input_file):
+        if params["text"].startswith("batch"):
+            release.wait(5)
+        return params["text"]
+
+    runner = make_runner(execute=execute, queues={"interactive": 1, "batch": 2})
+    runner.start()
+    with session_factory() as db:
+        batch_ids = [runner.submit(db, _job(f"batch {i}", queue="batch", priority=10)).id for i in range(10)]
+        interactive_id = runner.submit(db, _job("interactive")).id
+
+    try:
+        job = _wait_for(session_factory, interactive_id, timeout=2)
+        with session_factory() as db:
+            statuses = [crud.get_job(db, job_id).status for job_id in batch_ids]
+    finally:
+        release.set()
+
+    assert job.status == "succeeded"
+    assert statuses.count("running") == 2 and statuses.count("queued") == 8
+
+
+def test_cancel_queued_and_running_jobs(session_factory, make_runner):
+    """
+    Tests that a queued job never runs and a running job's result is discarded.
+    """
+    started, release = threading.Event(), threading.Event()
+    ran = []
+
+    def execute(kind, params, input_file):
+        ran.append(params["text"])
+        started.set()
+        release.wait(5)
+        return "done"
+
+    runner = make_runner(execute=execute)
+    runner.start()
+    with session_factory() as db:
+        running_id = runner.submit(db, _job("first")).id
+        queued_id = runner.submit(db, _job("second")).id
+        assert started.wait(5)
+
+        assert crud.cancel_job(db, queued_id).status == "cancelled"
+        assert crud.cancel_job(db, running_id).cancel_requested
+        assert crud.cancel_job(db, "missing") is None
+    release.set()
+
+    job = _wait_for(session_factory, running_id)
+    assert (job.status, job.result) == ("cancelled", None)
+    assert ran == ["first"]
+
+
+def test_process_executor_runs_jobs(session_factory, make_runner):
+    """
+    Tests that jobs can run in a process pool.
+    """
+    runner = make_runner(executor="process")
+    runner.start()
+    with session_factory() as db:
+        job_id = runner.submit(db, _job("proc"), input_file=b"ab").id
+
+    assert _wait_for(session_factory, job_id, timeout=20).result == "summarize:proc:2"
+
+
+def test_default_execute_uses_the_runner_database(session_factory, make_runner, mocker):
+    """
+    Tests that workflows store their results through the runner's session
+    factory, and that process workers are given its database URL.
+    """
+    mocker.patch.object(runner_module, "_get_client")
+    mocker.patch.object(
+        runner_module, "run_summarization_workflow", side_effect=lambda client, db, params: str(db.get_bind().url)
+    )
+    runner = make_runner(execute=None)
+    runner.start()
+    with session_factory() as db:
+        job = schemas.JobCreate(kind="summarize", queue="interactive", params=json.dumps({"document_id": 1}))
+        job_id = runner.submit(db, job).id
+
+    database_url = str(session_factory.kw["bind"].url)
+    assert _wait_for(session_factory, job_id).result == database_url
+    assert make_runner(execute=None, executor="process").execute.keywords == {"database_url": database_url}
+
+
+def test_invalid_job_executor_is_rejected(session_factory, monkeypatch):
+    """
+    Tests that a misspelled JOB_EXECUTOR fails with a clear error.
+    """
+    monkeypatch.setenv("JOB_EXECUTOR", "processes")
+    with pytest.raises(ValueError, match="JOB_EXECUTOR"):
+        JobRunner.from_env(session_factory)
+
+
+def test_unknown_queue_is_rejected(session_factory, make_runner):
+    """
+    Tests that jobs cannot be submitted to a queue without workers.
+    """
+    runner = make_runner()
+    with session_factory() as db, pytest.raises(ValueError):
+        runner.submit(db, _job("x", queue="nightly"))
+
+
+def test_parse_queues():
+    """
+    Tests the JOB_QUEUES format.
+    """
+    assert parse_queues("interactive:4, batch:1") == {"interactive": 4, "batch": 1}
+    with pytest.raises(ValueError):
+        parse_queues("batch:0")
+
+
+def test_jobs_left_running_are_recovered_on_start(session_factory, make_runner):
+    """
+    Tests that jobs abandoned in "running" by a previous process run again on start.
+    """
+    with session_factory() as db:
+        abandoned = crud.create_job(db, _job("perdido")).id
+        cancelled = crud.create_job(db, _job("cancelado")).id
+        crud.claim_next_job(db, "interactive")
+        crud.claim_next_job(db, "interactive")
+        crud.cancel_job(db, cancelled)
+
+    make_runner().start()
+
+    assert _wait_for(session_factory, abandoned).result == "summarize:perdido:0"
+    assert _wait_for(session_factory, cancelled).status == "cancelled"
+
+
+def test_worker_survives_database_errors(session_factory, make_runner, mocker):
+    """
+    Tests that a database error in a worker is logged and the worker keeps draining the queue.
+    """
+    real_claim = crud.claim_next_job
+    calls = []
+
+    def flaky_claim(db, queue):
+        calls.append(queue)
+        if len(calls) == 1:
+            raise OperationalError("UPDATE jobs", {}, Exception("database is locked"))
+        return real_claim(db, queue)
+
+    mocker.patch.object(crud, "claim_next_job", side_effect=flaky_claim)
+    with session_factory() as db:
+        job_id = crud.create_job(db, _job("depois")).id
+
+    runner = make_runner()
+    runner.poll_interval = 0.01
+    runner.start()
+
+    assert _wait_for(session_factory, job_id).status == "succeeded"
+    assert len(calls) >= 2
@@ -0,0 +1 @@
+# This file makes tests/test_llm a Python package.
@@ -0,0 +1,206 @@
+"""
+Unit tests for the LLM response cache.
+"""
+
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.academic_agent.llm import cache as cache_module
+from src.academic_agent.llm.cache import LLMResponseCache
+from src.academic_agent.llm.completions import acreate_completion, create_completion
+
+
+@pytest.fixture
+def cache(tmp_path):
+    response_cache = LLMResponseCache(path=str(tmp_path / "cache.db"), hot_size=2)
+    yield response_cache
+    response_cache.close()
+
+
+def _request(user_input: str = "Texto.", temperature: float = 0.5) -> dict:
+    return {
+        "model": "gpt-4.1-nano",
+        "messages": [{"role": "system", "content": "Sistema."}, {"role": "user", "content": user_input}],
+        "temperature": temperature,
+        "max_tokens": 500,
+    }
+
+
+def test_key_depends_on_every_parameter():
+    """
+    Tests that changing any keyed parameter changes the cache key.
+    """
+    base = LLMResponseCache.make_key("m", "sys", "input", 0.5, 500)
+
+    assert base == LLMResponseCache.make_key("m", "sys", "input", 0.5, 500)
+    assert base != LLMResponseCache.make_key("other", "sys", "input", 0.5, 500)
+    assert base != LLMResponseCache.make_key("m", "other", "input", 0.5, 500)
+    assert base != LLMResponseCache.make_key("m", "sys", "other", 0.5, 500)
+    assert base != LLMResponseCache.make_key("m", "sys", "input", 0.3, 500)
+    assert base != LLMResponseCache.make_key("m", "sys", "input", 0.5, 100)
+
+
+def test_get_and_set_counts_hits_and_misses(cache):
+    """
+    Tests the hit/miss counters across the memory and disk tiers.
+    """
+    assert cache.get("k") is None
+    cache.set("k", "valor")
+
+    assert cache.get("k") == "valor"
+    assert cache.stats.hits == 1
+    assert cache.stats.hot_hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_entries_persist_across_instances(cache):
+    """
+    Tests that a new cache on the same file serves entries from disk.
+    """
+    cache.set("k", "valor")
+
+    reopened = LLMResponseCache(path=cache.path)
+    try:
+        assert reopened.get("k") == "valor"
+        assert reopened.stats.hot_hits == 0
+    finally:
+        reopened.close()
+
+
+def test_expired_entries_are_misses(cache, mocker):
+    """
+    Tests that entries older than the TTL are not returned.
+    """
+    clock = mocker.patch.object(cache_module.time, "time", return_value=1000.0)
+    cache.set("k", "valor")
+
+    clock.return_value = 1000.0 + cache.ttl_seconds
+    assert cache.get("k") is None
+    assert cache.stats.misses == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, mocker):
+    """
+    Tests that the store evicts by last access when it exceeds max_entries.
+    """
+    clock = mocker.patch.object(cache_module.time, "time", return_value=1.0)
+    small = LLMResponseCache(path=str(tmp_path / "small.db"), max_entries=2, hot_size=0)
+    try:
+        small.set("a", "1")
+        clock.return_value = 2.0
+        small.set("b", "2")
+        clock.return_value = 3.0
+        small.get("a")  # "b" is now the least recently used entry
+        clock.return_value = 4.0
+        small.set("c", "3")
+
+        assert small.get("b") is None
+        assert small.get("a") == "1"
+        assert small.get("c") == "3"
+        assert small.stats.evictions == 1
+    finally:
+        small.close()
+
+
+def test_hot_tier_hits_count_as_recent_for_eviction(tmp_path, mocker):
+    """
+    Tests that entries served from memory are not evicted as if they were never read.
+    """
+    clock = mocker.patch.object(cache_module.time, "time", return_value=1.0)
+    small = LLMResponseCache(path=str(tmp_path / "small.db"), max_entries=2, hot_size=4)
+    try:
+        small.set("a", "1")
+        clock.return_value = 2.0
+        small.set("b", "2")
+        clock.return_value = 3.0
+        small.get("a")  # Served from memory; "b" is now the least recently used entry
+        assert small.stats.hot_hits == 1
+        clock.return_value = 4.0
+        small.set("c", "3")
+
+        reopened = LLMResponseCache(path=small.path)
+        try:
+            assert reopened.get("b") is None
+            assert reopened.get("a") == "1"
+        finally:
+            reopened.close()
+    finally:
+        small.close()
+
+
+def test_writes_do_not_rescan_the_store(tmp_path, mocker):
+    """
+    Tests that writes keep the entry totals up to date without counting the
+    table again, except for the periodic sweep of expired entries.
+    """
+    clock = mocker.patch.object(cache_module.time, "time", return_value=1.0)
+    small = LLMResponseCache(path=str(tmp_path / "small.db"), max_entries=3, hot_size=0)
+    statements = []
+    small._conn.set_trace_callback(statements.append)
+    try:
+        for key in "abcd":
+            clock.return_value += 1
+            small.set(key, "valor")
+        small.set("d", "substituído")
+
+        assert sum("COUNT(*)" in statement for statement in statements) == 1  # The first write's sweep
+        assert small.get("a") is None
+        assert small.stats.evictions == 1
+        assert (small._entries, small._bytes) == small._count_stored()
+    finally:
+        small.close()
+
+
+def test_create_completion_uses_cache_and_bypass(cache, mocker):
+    """
+    Tests that repeated requests hit the cache unless use_cache is False.
+    """
+    mocker.patch("src.academic_agent.llm.completions.get_response_cache", return_value=cache)
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices[0].message.content = "Resumo."
+    extract = lambda response: response.choices[0].message.content
+
+    assert create_completion(client, _request(), extract) == "Resumo."
+    assert create_completion(client, _request(), extract) == "Resumo."
+    assert client.chat.completions.create.call_count == 1
+
+    assert create_completion(client, _request(), extract, use_cache=False) == "Resumo."
+    assert client.chat.completions.create.call_count == 2
+
+    create_completion(client, _request(temperature=0.9), extract)
+    assert client.chat.completions.create.call_count == 3
+
+
+def test_acreate_completion_uses_the_cache_off_the_event_loop(cache, mocker):
+    """
+    Tests that the async path reads and writes the SQLite cache on a worker thread.
+    """
+    mocker.patch("src.academic_agent.llm.completions.get_response_cache", return_value=cache)
+    threads = []
+
+    def recording_thread(method):
+        def wrapper(*args):
+            threads.append(threading.get_ident())
+            return method(*args)
+        return wrapper
+
+    mocker.patch.object(cache, "get", side_effect=recording_thread(cache.get))
+    mocker.patch.object(cache, "set", side_effect=recording_thread(cache.set))
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock()
+    client.chat.completions.create.return_value.choices[0].message.content = "Resumo."
+    extract = lambda response: response.choices[0].message.content
+
+    async def run():
+        first = await acreate_completion(client, _request(), extract)
+        second = await acreate_completion(client, _request(), extract)
+        return first, second, threading.get_ident()
+
+    first, second, loop_thread = asyncio.run(run())
+
+    assert first == second == "Resumo."
+    assert client.chat.completions.create.call_count == 1
+    assert len(threads) == 3 and loop_thread not in threads
@@ -0,0 +1,47 @@
+"""
+Unit tests for the embedder configuration.
+"""
+
+import pytest
+
+from src.academic_agent.llm import embeddings
+from src.academic_agent.llm.embeddings import HashingEmbedder, OpenAIEmbedder, get_embedder, set_embedder
+
+
+@pytest.fixture(autouse=True)
+def fresh_embedder():
+    set_embedder(None)
+    yield
+    set_embedder(None)
+
+
+def test_auto_backend_without_api_key_disables_embeddings(monkeypatch, caplog):
+    """
+    Tests that the default backend stores documents without embeddings when no key is set.
+    """
+    monkeypatch.delenv("EMBEDDING_BACKEND", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(embeddings, "_warned_disabled", False)
+
+    assert get_embedder() is None
+    assert "OPENAI_API_KEY is not set" in caplog.text
+
+
+def test_auto_backend_with_api_key_uses_openai(monkeypatch):
+    """
+    Tests that the default backend uses the OpenAI embedder when a key is configured.
+    """
+    monkeypatch.delenv("EMBEDDING_BACKEND", raising=False)
+    monkeypatch.setenv("OPENAI_API_KEY", "x")
+
+    assert isinstance(get_embedder(), OpenAIEmbedder)
+
+
+def test_explicit_backend(monkeypatch):
+    """
+    Tests that EMBEDDING_BACKEND selects the embedder regardless of the key.
+    """
+    monkeypatch.setenv("EMBEDDING_BACKEND", "hashing")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    assert isinstance(get_embedder(), HashingEmbedder)
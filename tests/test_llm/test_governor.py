@@ -0,0 +1,237 @@
+"""
+Unit tests for the LLM governor.
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.academic_agent.llm import governor as governor_module
+from src.academic_agent.llm.completions import acreate_completion, create_completion
+from src.academic_agent.llm.governor import (
+    LLMGovernor,
+    LLMOverloadedError,
+    LLMRateLimitError,
+    TokenBucket,
+    retry_after_seconds,
+)
+
+
+class RateLimited(Exception):
+    """Stands in for `openai.RateLimitError`."""
+
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("Rate limit reached")
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+@pytest.fixture(autouse=True)
+def default_governor():
+    governor_module.set_governor(LLMGovernor())
+    yield
+    governor_module.set_governor(None)
+
+
+def _request(user_input: str = "Texto.") -> dict:
+    return {"model": "m", "messages": [{"role": "user", "content": user_input}], "max_tokens": 10}
+
+
+def test_token_bucket_reserves_ahead():
+    bucket = TokenBucket(per_minute=60, burst=2)
+    now = 100.0
+    bucket.updated = now
+
+    assert bucket.wait_time(1, now) == 0
+    bucket.take(2, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    bucket.take(1, now)
+    assert bucket.wait_time(1, now) == pytest.approx(2.0)
+    assert bucket.wait_time(1, now + 2) == 0
+
+
+def test_rpm_limit_paces_calls():
+    governor = LLMGovernor(rpm=600)  # 10/s, bursts of 600
+    governor.requests = TokenBucket(600, burst=1)
+
+    start = time.monotonic()
+    for _ in range(3):
+        governor.call(lambda: "ok")
+    assert time.monotonic() - start >= 0.18
+
+
+def test_tpm_is_corrected_with_actual_usage():
+    governor = LLMGovernor(tpm=1000)
+    response = SimpleNamespace(usage=SimpleNamespace(total_tokens=100))
+
+    governor.call(lambda: response, tokens=600)
+
+    assert governor.tokens.level == pytest.approx(900, abs=1)
+
+
+def test_retries_honor_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(governor_module.time, "sleep", sleeps.append)
+    governor = LLMGovernor(max_retries=3, backoff_base=0.01)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited(retry_after=2)
+        return "ok"
+
+    assert governor.call(flaky) == "ok"
+    assert len(attempts) == 3
+    assert sleeps == [2.0, 2.0]
+
+
+def test_gives_up_with_rate_limit_error(monkeypatch):
+    monkeypatch.setattr(governor_module.time, "sleep", lambda seconds: None)
+    governor = LLMGovernor(max_retries=2, backoff_base=0.01)
+    fn = MagicMock(side_effect=RateLimited(retry_after=7))
+
+    with pytest.raises(LLMRateLimitError) as excinfo:
+        governor.call(fn)
+
+    assert fn.call_count == 3
+    assert excinfo.value.retry_after == 7
+    assert excinfo.value.status_code == 429
+
+
+def test_non_retryable_errors_are_raised_at_once():
+    governor = LLMGovernor()
+    fn = MagicMock(side_effect=ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        governor.call(fn)
+    assert fn.call_count == 1
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds(RateLimited(retry_after=3)) == 3
+    error = RateLimited()
+    error.response.headers = {"retry-after-ms": "250", "retry-after": "1"}
+    assert retry_after_seconds(error) == 0.25
+    error.response.headers = {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    assert retry_after_seconds(error) is None
+
+
+def test_wait_longer_than_timeout_is_rejected():
+    governor = LLMGovernor(rpm=60, max_wait_seconds=0.5)
+    governor.requests = TokenBucket(60, burst=1)
+    governor.call(lambda: "ok")
+
+    with pytest.raises(LLMRateLimitError) as excinfo:
+        governor.call(lambda: "ok")
+    assert excinfo.value.retry_after == pytest.approx(1.0, abs=0.1)
+
+
+def test_full_queue_is_rejected():
+    governor = LLMGovernor(rpm=600, max_waiting=1)
+    governor.requests = TokenBucket(600, burst=1)
+    governor.call(lambda: "ok")
+    release = threading.Event()
+
+    waiter = threading.Thread(target=lambda: governor.call(release.wait))
+    waiter.start()
+    time.sleep(0.02)  # The first waiter is sleeping for its turn
+
+    with pytest.raises(LLMOverloadedError) as excinfo:
+        governor.call(lambda: "ok")
+    assert type(excinfo.value) is LLMOverloadedError
+    assert excinfo.value.status_code == 503
+
+    release.set()
+    waiter.join()
+
+
+def test_identical_concurrent_requests_share_one_call():
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(usage=None, text="Resumo")
+
+    client = MagicMock()
+    client.chat.completions.create = create
+
+    async def run():
+        return await asyncio.gather(*(
+            acreate_completion(client, _request(), lambda r: r.text, use_cache=False) for _ in range(20)
+        ))
+
+    assert asyncio.run(run()) == ["Resumo"] * 20
+    assert len(calls) == 1
+
+
+def test_coalesced_callers_share_the_error():
+    async def create(**kwargs):
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    client = MagicMock()
+    client.chat.completions.create = create
+
+    async def run():
+        return await asyncio.gather(
+            *(acreate_completion(client, _request(), lambda r: r, use_cache=False) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(run()))
+
+
+def test_sync_coalescing_across_threads():
+    started = threading.Event()
+    release = threading.Event()
+    client = MagicMock()
+
+    def create(**kwargs):
+        started.set()
+        release.wait()
+        return SimpleNamespace(usage=None, text="Texto")
+
+    client.chat.completions.create = MagicMock(side_effect=create)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(create_completion(client, _request(), lambda r: r.text, use_cache=False)))
+        for _ in range(5)
+    ]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["Texto"] * 5
+    assert client.chat.completions.create.call_count == 1
+
+
+def test_coalescing_can_be_disabled():
+    governor_module.set_governor(LLMGovernor(coalesce=False))
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(usage=None, text="ok")
+
+    client = MagicMock()
+    client.chat.completions.create = create
+
+    async def run():
+        await asyncio.gather(*(acreate_completion(client, _request(), lambda r: r.text, use_cache=False) for _ in range(3)))
+
+    asyncio.run(run())
+    assert len(calls) == 3
@@ -0,0 +1,107 @@
+"""
+Unit tests for the in-process vector index and the embedders.
+"""
+
+import numpy as np
+import pytest
+
+from src.academic_agent.llm.embeddings import HashingEmbedder
+from src.academic_agent.search.vector_index import VectorIndex, pack_vector, unpack_vector
+
+
+def _rows(vectors, first_id=1, document_id=1):
+    return [(first_id + i, document_id, pack_vector(v)) for i, v in enumerate(vectors)]
+
+
+def _loaded_index(rows, dimensions=3):
+    index = VectorIndex(dimensions)
+    index.ensure_loaded(lambda: rows)
+    return index
+
+
+def test_pack_round_trip_uses_float32():
+    """
+    Tests that vectors are stored as 4 bytes per component and unpacked unchanged.
+    """
+    vector = np.array([0.5, -1.25, 3.0], dtype=np.float64)
+    packed = pack_vector(vector)
+
+    assert len(packed) == 12
+    assert unpack_vector(packed).tolist() == [0.5, -1.25, 3.0]
+
+
+def test_search_ranks_by_cosine_similarity():
+    """
+    Tests that hits are ordered by cosine similarity, ignoring vector length.
+    """
+    index = _loaded_index(_rows([[1, 0, 0], [10, 10, 0], [0, 0, 1]]))
+
+    hits = index.search(np.array([1, 0.1, 0]), top_k=2)
+
+    assert [hit.chunk_id for hit in hits] == [1, 2]
+    assert hits[0].score == pytest.approx(1 / np.sqrt(1.01))
+
+
+def test_search_can_be_restricted_to_a_document():
+    """
+    Tests that the document filter excludes other documents even if they are closer.
+    """
+    index = _loaded_index(_rows([[1, 0, 0]], document_id=1) + _rows([[0, 1, 0]], first_id=2, document_id=2))
+
+    hits = index.search(np.array([1, 0, 0]), top_k=5, document_id=2)
+
+    assert [(hit.chunk_id, hit.document_id) for hit in hits] == [(2, 2)]
+
+
+def test_add_is_ignored_until_loaded_and_skips_known_chunks():
+    """
+    Tests that incremental updates wait for the lazy load and never duplicate a chunk.
+    """
+    index = VectorIndex(3)
+    assert index.add(_rows([[1, 0, 0]])) == 0
+
+    index.ensure_loaded(lambda: _rows([[1, 0, 0]]))
+    assert index.add(_rows([[1, 0, 0], [0, 1, 0]])) == 1
+    assert len(index) == 2
+
+
+def test_index_grows_past_its_initial_capacity():
+    """
+    Tests that appending many batches keeps every vector searchable.
+    """
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(3000, 8)).astype(np.float32)
+    index = VectorIndex(8)
+    index.ensure_loaded(lambda: [])
+    for start in range(0, 3000, 500):
+        index.add(_rows(vectors[start:start + 500], first_id=start + 1))
+
+    hits = index.search(vectors[2500], top_k=1)
+
+    assert len(index) == 3000
+    assert hits[0].chunk_id == 2501
+
+
+def test_vectors_of_other_dimensions_are_ignored():
+    """
+    Tests that embeddings from a model with another vector length are skipped.
+    """
+    index = _loaded_index(_rows([[1, 0, 0]]) + [(9, 1, pack_vector([1.0, 0.0]))])
+
+    assert len(index) == 1
+    with pytest.raises(ValueError):
+        index.search(np.array([1.0, 0.0]), top_k=1)
+
+
+def test_hashing_embedder_is_deterministic_and_batched():
+    """
+    Tests that the local embedder returns identical unit vectors across batches.
+    """
+    embedder = HashingEmbedder(dimensions=64, batch_size=2)
+    texts = ["metodologia qualitativa", "revisão de literatura", "metodologia qualitativa"]
+
+    vectors = embedder.embed(texts)
+
+    assert vectors.shape == (3, 64) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert np.array_equal(vectors[0], vectors[2])
@@ -0,0 +1 @@
+# This file makes tests/test_utils a Python package.
@@ -0,0 +1,147 @@
+"""
+Unit tests for the chunking utilities.
+"""
+
+import random
+
+from src.academic_agent.utils.chunking import extract_chunks, iter_chunks, iter_paragraphs, split_sections
+from src.academic_agent.utils.file_parser import TextSegment
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+def test_iter_paragraphs_matches_split_on_joined_text():
+    """
+    Tests that streaming paragraph splitting equals splitting the joined text,
+    including separators that straddle segment boundaries.
+    """
+    rng = random.Random(42)
+    for _ in range(2000):
+        segments = [
+            TextSegment("".join(rng.choice("ab\n") for _ in range(rng.randint(0, 6))), page)
+            for page in range(1, rng.randint(1, 6))
+        ]
+        expected = "".join(s.text for s in segments).split("\n\n")
+
+        assert [p.text for p in iter_paragraphs(segments)] == expected
+
+
+def test_iter_paragraphs_tracks_page_range():
+    """
+    Tests that a paragraph continuing onto the next page reports both pages.
+    """
+    segments = [TextSegment("Intro.\n\nStarts here ", 1), TextSegment("and ends here.\n\nNext.", 2)]
+
+    paragraphs = list(iter_paragraphs(segments))
+
+    assert [(p.text, p.page_start, p.page_end) for p in paragraphs] == [
+        ("Intro.", 1, 1),
+        ("Starts here and ends here.", 1, 2),
+        ("Next.", 2, 2),
+    ]
+
+
+def test_extract_chunks_returns_text_and_chunks():
+    """
+    Tests that extraction yields the full text and chunks that point back into it.
+    """
+    segments = [TextSegment("A\n\n  \n\nB\n", 1), TextSegment("\nC", 2)]
+
+    content, chunks = extract_chunks(segments, max_tokens=1, overlap_tokens=0)
+
+    assert content == "A\n\n  \n\nB\n\nC"
+    assert [c.text for c in chunks] == ["A", "B", "C"]
+    assert [content[c.char_start:c.char_end] for c in chunks] == ["A", "B", "C"]
+    assert [(c.page_start, c.page_end) for c in chunks] == [(1, 1), (1, 1), (2, 2)]
+
+
+def test_iter_chunks_packs_paragraphs_within_budget():
+    """
+    Tests that whole paragraphs are packed together up to the token budget.
+    """
+    paragraphs = [f"Paragraph {i} " + "word " * 8 for i in range(6)]
+    segments = [TextSegment("\n\n".join(paragraphs), 1)]
+
+    chunks = list(iter_chunks(segments, max_tokens=25, overlap_tokens=0, count=_word_count))
+
+    assert [c.token_count for c in chunks] == [20, 20, 20]
+    assert chunks[0].text == "\n\n".join(paragraphs[:2]).strip()
+
+
+def test_iter_chunks_splits_long_paragraphs_at_sentences():
+    """
+    Tests that a paragraph over budget is split at sentence boundaries.
+    """
+    paragraph = " ".join(f"Sentence {i} has five words." for i in range(4))
+
+    chunks = list(iter_chunks([TextSegment(paragraph, 1)], max_tokens=10, overlap_tokens=0, count=_word_count))
+
+    assert [c.text for c in chunks] == [
+        "Sentence 0 has five words. Sentence 1 has five words.",
+        "Sentence 2 has five words. Sentence 3 has five words.",
+    ]
+
+
+def test_iter_chunks_overlaps_trailing_units():
+    """
+    Tests that consecutive chunks repeat trailing units up to the overlap budget.
+    """
+    paragraphs = [f"p{i} a b c d" for i in range(4)]
+    segments = [TextSegment("\n\n".join(paragraphs), 1)]
+
+    chunks = list(iter_chunks(segments, max_tokens=10, overlap_tokens=5, count=_word_count))
+
+    assert [c.text.split("\n\n") for c in chunks] == [
+        ["p0 a b c d", "p1 a b c d"],
+        ["p1 a b c d", "p2 a b c d"],
+        ["p2 a b c d", "p3 a b c d"],
+    ]
+
+
+def test_iter_chunks_spans_match_joined_text():
+    """
+    Tests on random input that every chunk is an exact slice of the joined
+    text, within budget, and that together they cover all non-blank text.
+    """
+    rng = random.Random(7)
+    words = ["alfa", "beta.", "gama!", "\n", "\n\n", "x" * 30, "delta?"]
+    for _ in range(500):
+        segments = [
+            TextSegment(" ".join(rng.choice(words) for _ in range(rng.randint(0, 40))), page)
+            for page in range(1, rng.randint(2, 5))
+        ]
+        full_text = "".join(s.text for s in segments)
+
+        chunks = list(iter_chunks(segments, max_tokens=20, overlap_tokens=5))
+
+        covered = set()
+        for chunk in chunks:
+            assert full_text[chunk.char_start:chunk.char_end] == chunk.text
+            assert chunk.token_count <= 20
+            covered.update(range(chunk.char_start, chunk.char_end))
+        assert all(i in covered or ch.isspace() for i, ch in enumerate(full_text))
+
+
+def test_split_sections_round_trips_and_respects_limit():
+    """
+    Tests that sections never exceed max_chars and join back to the original text.
+    """
+    text = "INTRODUÇÃO\n\n" + "a " * 50 + "\n\n1.2 Método\n\n" + "b" * 300 + "\n\nfim"
+
+    sections = split_sections(text, 120)
+
+    assert "".join(sections) == text
+    assert all(len(section) <= 120 for section in sections)
+
+
+def test_split_sections_starts_new_segment_at_heading():
+    """
+    Tests that a heading opens a new segment once the current one is half full.
+    """
+    text = "x" * 120 + "\n\n2 RESULTADOS\n\nTexto dos resultados."
+
+    sections = split_sections(text, 200)
+
+    assert sections == ["x" * 120 + "\n\n", "2 RESULTADOS\n\nTexto dos resultados."]
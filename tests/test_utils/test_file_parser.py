@@ -0,0 +1,171 @@
+"""
+Unit tests for the file parser utilities.
+"""
+
+import hashlib
+import io
+import os
+import types
+import zipfile
+
+import docx
+import fitz
+import pytest
+from docx.enum.text import WD_BREAK
+
+from src.academic_agent.utils.file_parser import (
+    TextSegment,
+    detect_format,
+    iter_text_segments,
+    read_and_hash,
+    read_text_from_file,
+)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    """Creates a three-page PDF with one line of text per page."""
+    path = tmp_path / "document.pdf"
+    with fitz.open() as doc:
+        for i in range(1, 4):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Page {i} text")
+        doc.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def docx_path(tmp_path):
+    """Creates a DOCX with a manual page break after the second paragraph."""
+    path = tmp_path / "document.docx"
+    document = docx.Document()
+    document.add_paragraph("First paragraph.")
+    second = document.add_paragraph("Second paragraph.")
+    second.add_run().add_break(WD_BREAK.PAGE)
+    document.add_paragraph("Third paragraph.")
+    document.save(str(path))
+    return str(path)
+
+
+def test_iter_text_segments_pdf(pdf_path):
+    """
+    Tests that a PDF yields one segment per page with 1-based page numbers.
+    """
+    segments = list(iter_text_segments(pdf_path))
+
+    assert [s.page for s in segments] == [1, 2, 3]
+    assert all(isinstance(s, TextSegment) for s in segments)
+    assert "Page 2 text" in segments[1].text
+
+
+def test_iter_text_segments_docx_tracks_page_breaks(docx_path):
+    """
+    Tests that DOCX paragraphs after a page break are reported on the next page.
+    """
+    segments = list(iter_text_segments(docx_path))
+
+    assert [s.text for s in segments] == ["First paragraph.\n", "Second paragraph.\n", "Third paragraph.\n"]
+    assert [s.page for s in segments] == [1, 1, 2]
+
+
+def test_iter_text_segments_is_lazy(pdf_path):
+    """
+    Tests that segments are produced on demand rather than all at once.
+    """
+    segments = iter_text_segments(pdf_path)
+
+    assert isinstance(segments, types.GeneratorType)
+    assert next(segments).page == 1
+
+
+def test_read_text_from_file_joins_segments(pdf_path, docx_path):
+    """
+    Tests that read_text_from_file returns the concatenation of all segments.
+    """
+    for path in (pdf_path, docx_path):
+        assert read_text_from_file(path) == "".join(s.text for s in iter_text_segments(path))
+
+
+def test_read_text_from_file_not_found():
+    """
+    Tests that a missing file raises FileNotFoundError.
+    """
+    with pytest.raises(FileNotFoundError, match="File not found at"):
+        read_text_from_file("/invalid/path/document.pdf")
+
+
+def test_read_text_from_file_unsupported_format(tmp_path):
+    """
+    Tests that unsupported extensions raise ValueError.
+    """
+    path = tmp_path / "notes.txt"
+    path.write_text("plain text")
+
+    with pytest.raises(ValueError, match="Unsupported file format: .txt"):
+        read_text_from_file(str(path))
+
+
+def test_read_text_from_bytes_and_buffers(pdf_path, docx_path):
+    """
+    Tests that in-memory bytes and file objects parse like the file on disk.
+    """
+    for path in (pdf_path, docx_path):
+        with open(path, "rb") as f:
+            data = f.read()
+        expected = read_text_from_file(path)
+
+        assert read_text_from_file(data) == expected
+        assert read_text_from_file(io.BytesIO(data)) == expected
+
+
+def test_detect_format_ignores_extension(pdf_path, docx_path, tmp_path):
+    """
+    Tests that the format comes from the content, not the filename suffix.
+    """
+    misnamed = tmp_path / "actually_a_pdf.docx"
+    with open(pdf_path, "rb") as f:
+        misnamed.write_bytes(f.read())
+
+    assert detect_format(str(misnamed)) == "pdf"
+    assert "Page 1 text" in read_text_from_file(str(misnamed))
+    with open(docx_path, "rb") as f:
+        assert detect_format(f) == "docx"
+        assert f.tell() == 0
+
+
+def test_detect_format_rejects_unknown_content():
+    """
+    Tests that arbitrary bytes, including non-Word ZIP archives, are rejected.
+    """
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("data.txt", "not a word document")
+
+    for data in (b"plain text", archive.getvalue()):
+        with pytest.raises(ValueError, match="Unsupported file format"):
+            detect_format(data)
+
+
+@pytest.mark.parametrize("threshold", [10_000_000, 100])
+def test_read_and_hash_returns_content_and_digest(pdf_path, threshold):
+    """
+    Tests that the digest matches the file whether it is kept in memory or spooled to disk.
+    """
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+        f.seek(0)
+        source, digest = read_and_hash(f, spool_threshold=threshold)
+
+    try:
+        assert digest == hashlib.sha256(data).hexdigest()
+        if threshold > len(data):
+            assert source == data
+        else:
+            assert isinstance(source, str)
+            with open(source, "rb") as spooled:
+                assert spooled.read() == data
+        assert read_text_from_file(source) == read_text_from_file(pdf_path)
+    finally:
+        if isinstance(source, str):
+            os.remove(source)
+
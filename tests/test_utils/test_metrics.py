@@ -0,0 +1,129 @@
+"""
+Unit tests for the Prometheus metrics.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.academic_agent.llm.completions import acreate_completion, astream_completion
+from src.academic_agent.utils import metrics
+from src.academic_agent.utils.metrics import Counter, Gauge, Histogram, Registry, time_iterator
+
+
+def test_render_prometheus_text_format():
+    registry = Registry()
+    requests = registry.register(Counter("app_requests_total", "Requests.", ["route"]))
+    in_flight = registry.register(Gauge("app_in_flight", "In flight."))
+    latency = registry.register(Histogram("app_latency_seconds", "Latency.", ["route"], buckets=(0.1, 1.0)))
+
+    requests.inc(route="/a")
+    requests.inc(2, route='/b"x')
+    in_flight.set_function(lambda: 3)
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5, route="/a")
+
+    text = registry.render()
+
+    assert "# TYPE app_requests_total counter" in text
+    assert 'app_requests_total{route="/a"} 1' in text
+    assert 'app_requests_total{route="/b\\"x"} 2' in text
+    assert "app_in_flight 3" in text
+    assert 'app_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'app_latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'app_latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'app_latency_seconds_sum{route="/a"} 5.55' in text
+    assert 'app_latency_seconds_count{route="/a"} 3' in text
+    assert text.endswith("\n")
+
+
+def test_metric_validation():
+    counter = Counter("c_total", "C.", ["kind"])
+    with pytest.raises(ValueError):
+        counter.inc(kind="a", other="b")
+    with pytest.raises(ValueError):
+        counter.inc(-1, kind="a")
+
+    registry = Registry()
+    registry.register(Gauge("g", "G."))
+    with pytest.raises(ValueError):
+        registry.register(Gauge("g", "G."))
+
+
+def test_histogram_time_observes_even_on_error():
+    histogram = Histogram("h_seconds", "H.")
+    with pytest.raises(RuntimeError):
+        with histogram.time():
+            raise RuntimeError("boom")
+    assert histogram.count() == 1
+
+
+def test_time_iterator_only_counts_producer_time():
+    totals = []
+
+    def slow_producer():
+        for i in range(3):
+            yield i
+
+    items = []
+    for item in time_iterator(slow_producer(), totals.append):
+        items.append(item)
+        sum(range(100_000))  # Consumer work, not counted
+
+    assert items == [0, 1, 2]
+    assert len(totals) == 1 and totals[0] >= 0
+
+
+def test_completion_records_latency_and_usage():
+    client = MagicMock()
+    response = MagicMock()
+    response.usage = SimpleNamespace(prompt_tokens=11, completion_tokens=7)
+
+    async def create(**kwargs):
+        return response
+
+    client.chat.completions.create = create
+    prompt_before = metrics.LLM_TOKENS.value(type="prompt")
+    completion_before = metrics.LLM_TOKENS.value(type="completion")
+    calls_before = metrics.LLM_REQUEST_SECONDS.count(operation="chat", outcome="success")
+
+    text = asyncio.run(acreate_completion(client, {"model": "m", "messages": []}, lambda r: "ok", use_cache=False))
+
+    assert text == "ok"
+    assert metrics.LLM_TOKENS.value(type="prompt") == prompt_before + 11
+    assert metrics.LLM_TOKENS.value(type="completion") == completion_before + 7
+    assert metrics.LLM_REQUEST_SECONDS.count(operation="chat", outcome="success") == calls_before + 1
+    assert metrics.LLM_IN_FLIGHT.value() == 0
+
+
+def test_stream_records_time_to_first_token_and_usage():
+    class Stream:
+        async def __aiter__(self):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="Olá"))], usage=None)
+            yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=5, completion_tokens=1))
+
+        async def close(self):
+            pass
+
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        return Stream()
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    ttft_before = metrics.LLM_TIME_TO_FIRST_TOKEN_SECONDS.count()
+    completion_before = metrics.LLM_TOKENS.value(type="completion")
+
+    async def consume():
+        return [delta async for delta in astream_completion(client, {"model": "m", "messages": []}, use_cache=False)]
+
+    assert asyncio.run(consume()) == ["Olá"]
+    assert requests[0]["stream_options"] == {"include_usage": True}
+    assert metrics.LLM_TIME_TO_FIRST_TOKEN_SECONDS.count() == ttft_before + 1
+    assert metrics.LLM_TOKENS.value(type="completion") == completion_before + 1
+    assert metrics.LLM_IN_FLIGHT.value() == 0
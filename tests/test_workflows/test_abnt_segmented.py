@@ -0,0 +1,147 @@
+"""
+Unit tests for segmented (parallel) ABNT formatting.
+"""
+
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.academic_agent.validation import schemas
+from src.academic_agent.workflows.abnt_workflow import arun_abnt_workflow, run_abnt_workflow
+
+LLM_LATENCY = 0.1
+
+# Eight paragraphs of ~150 characters; with segment_chars=320 they form four segments.
+PARAGRAPHS = [f"Parágrafo {i}. " + "texto " * 22 for i in range(8)]
+LONG_TEXT = "\n\n".join(PARAGRAPHS)
+
+
+def _segment_of(kwargs) -> str:
+    return kwargs["messages"][1]["content"].split("Trecho a formatar:\n", 1)[1]
+
+
+class ServiceUnavailable(Exception):
+    """A transient API error, which the LLM governor retries."""
+    status_code = 503
+
+
+class FlakyCompletions:
+    """Formats a segment by upper-casing it; fails the first call for one segment."""
+
+    def __init__(self, fail_on: str | None = None, error: Exception = ServiceUnavailable("API timeout")):
+        self.fail_on = fail_on
+        self.error = error
+        self.calls = []
+
+    def _answer(self, kwargs):
+        self.calls.append(kwargs)
+        segment = _segment_of(kwargs)
+        if self.fail_on and self.fail_on in segment:
+            self.fail_on = None
+            raise self.error
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = segment.upper()
+        return response
+
+    async def acreate(self, **kwargs):
+        await asyncio.sleep(LLM_LATENCY)
+        return self._answer(kwargs)
+
+    def create(self, **kwargs):
+        time.sleep(LLM_LATENCY)
+        return self._answer(kwargs)
+
+
+def _client(completions: FlakyCompletions, is_async: bool):
+    client = MagicMock()
+    client.chat.completions.create = completions.acreate if is_async else completions.create
+    return client
+
+
+def _params(**overrides) -> schemas.ABNTWorkflowParams:
+    values = dict(file_path="/fake/tese.pdf", segment_chars=320, overlap_chars=50)
+    values.update(overrides)
+    return schemas.ABNTWorkflowParams(**values)
+
+
+def _expected() -> str:
+    segments = ["\n\n".join(PARAGRAPHS[i:i + 2]) for i in range(0, 8, 2)]
+    return "\n\n".join(segment.upper().strip() for segment in segments)
+
+
+@patch('src.academic_agent.workflows.abnt_workflow.read_text_from_file', return_value=LONG_TEXT)
+def test_segments_are_formatted_concurrently_and_reassembled_in_order(mock_read_file):
+    """
+    Tests that four segments run in parallel and come back in document order.
+    """
+    completions = FlakyCompletions()
+
+    start = time.perf_counter()
+    result = asyncio.run(arun_abnt_workflow(_client(completions, True), _params()))
+    elapsed = time.perf_counter() - start
+
+    assert result == _expected()
+    assert len(completions.calls) == 4
+    assert elapsed < LLM_LATENCY * 3
+
+
+@patch('src.academic_agent.workflows.abnt_workflow.read_text_from_file', return_value=LONG_TEXT)
+def test_segments_include_previous_context(mock_read_file):
+    """
+    Tests that every segment after the first sees the tail of the previous one.
+    """
+    completions = FlakyCompletions()
+
+    asyncio.run(arun_abnt_workflow(_client(completions, True), _params()))
+
+    contents = sorted((c["messages"][1]["content"] for c in completions.calls), key=lambda c: "Contexto" in c)
+    assert not contents[0].startswith("Contexto anterior")
+    assert all(c.startswith("Contexto anterior (não reformatar):\n") for c in contents[1:])
+
+
+@pytest.mark.parametrize("is_async", [True, False])
+@patch('src.academic_agent.workflows.abnt_workflow.read_text_from_file', return_value=LONG_TEXT)
+def test_only_failed_segment_is_retried(mock_read_file, is_async):
+    """
+    Tests that a transient failure re-runs (in the LLM governor) only the segment that failed.
+    """
+    completions = FlakyCompletions(fail_on="Parágrafo 4.")
+    client = _client(completions, is_async)
+
+    if is_async:
+        result = asyncio.run(arun_abnt_workflow(client, _params()))
+    else:
+        result = run_abnt_workflow(client, _params())
+
+    assert result == _expected()
+    segments = [_segment_of(c) for c in completions.calls]
+    assert len(segments) == 5
+    assert sum("Parágrafo 4." in s for s in segments) == 2
+
+
+@patch('src.academic_agent.workflows.abnt_workflow.read_text_from_file', return_value=LONG_TEXT)
+def test_segment_failure_names_the_segment_and_is_not_retried(mock_read_file):
+    """
+    Tests that a non-transient error fails at once with a ValueError naming the segment.
+    """
+    completions = FlakyCompletions(fail_on="Parágrafo 6.", error=RuntimeError("bad request"))
+
+    with pytest.raises(ValueError, match="Failed to format segment 4 of 4: bad request"):
+        asyncio.run(arun_abnt_workflow(_client(completions, True), _params()))
+    assert sum("Parágrafo 6." in _segment_of(c) for c in completions.calls) == 1
+
+
+@patch('src.academic_agent.workflows.abnt_workflow.read_text_from_file', return_value="Texto curto.")
+def test_short_text_uses_single_unsegmented_request(mock_read_file):
+    """
+    Tests that a text that fits in one segment is sent exactly as before.
+    """
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices[0].message.content = "Formatado."
+
+    assert run_abnt_workflow(client, _params()) == "Formatado."
+    _, call_kwargs = client.chat.completions.create.call_args
+    assert call_kwargs["messages"][1]["content"] == "Texto curto."
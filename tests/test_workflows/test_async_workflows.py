@@ -0,0 +1,128 @@
+"""
+Unit tests for the async workflow variants.
+"""
+
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.academic_agent.database import crud
+from src.academic_agent.database.writer import enable_single_writer, shutdown_single_writer
+from src.academic_agent.validation import schemas
+from src.academic_agent.workflows.abnt_workflow import arun_abnt_workflow
+from src.academic_agent.workflows.summarization_workflow import arun_summarization_workflow
+from src.academic_agent.workflows.writing_workflow import arun_writing_workflow
+
+LLM_LATENCY = 0.2
+
+
+class FakeAsyncCompletions:
+    """Stands in for `AsyncOpenAI().chat.completions` with a fixed latency."""
+
+    def __init__(self, content: str | None = "Resposta."):
+        self.content = content
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(LLM_LATENCY)
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = self.content
+        return response
+
+
+@pytest.fixture
+def fake_client():
+    client = MagicMock()
+    client.chat.completions = FakeAsyncCompletions()
+    return client
+
+
+@pytest.fixture(autouse=True)
+def single_writer(db_engine):
+    # Every session shares the one in-memory connection; serialize writes as the app does for SQLite.
+    enable_single_writer(db_engine)
+    yield
+    shutdown_single_writer(db_engine)
+
+
+def test_arun_writing_workflow_runs_calls_concurrently(fake_client):
+    """
+    Many writing calls awaited together should take about one LLM latency.
+    """
+    async def run_many():
+        return await asyncio.gather(*[
+            arun_writing_workflow(fake_client, {"prompt": f"Prompt {i}"}) for i in range(50)
+        ])
+
+    start = time.perf_counter()
+    results = asyncio.run(run_many())
+    elapsed = time.perf_counter() - start
+
+    assert results == ["Resposta."] * 50
+    assert len(fake_client.chat.completions.calls) == 50
+    assert elapsed < LLM_LATENCY * 5
+
+
+def test_arun_writing_workflow_no_prompt(fake_client):
+    """
+    The async variant validates the prompt like the sync one.
+    """
+    with pytest.raises(ValueError, match="O parâmetro 'prompt' é obrigatório"):
+        asyncio.run(arun_writing_workflow(fake_client, {}))
+
+
+@patch('src.academic_agent.workflows.abnt_workflow.read_text_from_file', return_value="Texto extraído.")
+def test_arun_abnt_workflow_success(mock_read_file, fake_client):
+    """
+    The async ABNT workflow parses the file and awaits the formatting call.
+    """
+    params = schemas.ABNTWorkflowParams(file_path="/fake/path/document.pdf")
+
+    result = asyncio.run(arun_abnt_workflow(fake_client, params))
+
+    assert result == "Resposta."
+    mock_read_file.assert_called_once_with(params.file_path)
+    call_kwargs = fake_client.chat.completions.calls[0]
+    assert call_kwargs["messages"][1]["content"] == "Texto extraído."
+    assert "ABNT" in call_kwargs["messages"][0]["content"]
+
+
+def test_arun_summarization_workflow_concurrent(fake_client, db_session):
+    """
+    Concurrent async summaries of a stored document overlap their LLM calls.
+    """
+    document = crud.create_document(
+        db_session, schemas.DocumentCreate(title="Doc", content="Conteúdo para resumir.")
+    )
+    params = schemas.SummarizationWorkflowParams(document_id=document.id)
+    # Each request gets its own session, as with the FastAPI dependency.
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+
+    async def run_many():
+        return await asyncio.gather(*[
+            arun_summarization_workflow(fake_client, session_factory(), params) for _ in range(20)
+        ])
+
+    start = time.perf_counter()
+    results = asyncio.run(run_many())
+    elapsed = time.perf_counter() - start
+
+    assert results == ["Resposta."] * 20
+    assert fake_client.chat.completions.calls[0]["messages"][1]["content"] == "Conteúdo para resumir."
+    assert elapsed < LLM_LATENCY * 5
+
+
+def test_arun_summarization_workflow_document_not_found(fake_client, db_session):
+    """
+    A missing document raises ValueError before any LLM call.
+    """
+    params = schemas.SummarizationWorkflowParams(document_id=999)
+
+    with pytest.raises(ValueError, match="Document with ID 999 not found."):
+        asyncio.run(arun_summarization_workflow(fake_client, db_session, params))
+    assert fake_client.chat.completions.calls == []
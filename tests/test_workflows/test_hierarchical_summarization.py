@@ -0,0 +1,159 @@
+"""
+Unit tests for the hierarchical (map-reduce) summarization mode.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.academic_agent.database import crud
+from src.academic_agent.validation import schemas
+from src.academic_agent.workflows.summarization_workflow import (
+    REDUCE_PROMPT,
+    SYSTEM_PROMPT,
+    arun_summarization_workflow,
+    run_summarization_workflow,
+)
+
+LLM_LATENCY = 0.1
+
+
+def _response(content: str):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    return response
+
+
+class RecordingCompletions:
+    """Fake `chat.completions` that tracks calls and peak concurrency."""
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _enter(self, kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            # Long enough that eight partial summaries no longer fit in one call.
+            return f"resumo {len(self.calls):02d} " + "y" * 100
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    async def acreate(self, **kwargs):
+        content = self._enter(kwargs)
+        await asyncio.sleep(LLM_LATENCY)
+        self._exit()
+        return _response(content)
+
+    def create(self, **kwargs):
+        content = self._enter(kwargs)
+        time.sleep(LLM_LATENCY)
+        self._exit()
+        return _response(content)
+
+
+@pytest.fixture
+def completions():
+    return RecordingCompletions()
+
+
+@pytest.fixture
+def async_client(completions):
+    client = MagicMock()
+    client.chat.completions.create = completions.acreate
+    return client
+
+
+@pytest.fixture
+def sync_client(completions):
+    client = MagicMock()
+    client.chat.completions.create = completions.create
+    return client
+
+
+@pytest.fixture
+def long_document(db_session):
+    """A document with 32 chunks of 100 characters each."""
+    chunks = [schemas.TextChunkCreate(content=f"{i:03d}" + "x" * 97) for i in range(32)]
+    return crud.create_document_with_chunks(
+        db_session, schemas.DocumentCreate(title="Tese", content="..."), chunks
+    )
+
+
+def _params(document_id: int, **overrides) -> schemas.SummarizationWorkflowParams:
+    values = dict(
+        document_id=document_id, mode="hierarchical", fan_out=4, max_concurrency=4, max_input_chars=450
+    )
+    values.update(overrides)
+    return schemas.SummarizationWorkflowParams(**values)
+
+
+def test_hierarchical_builds_a_tree_with_bounded_parallelism(async_client, completions, db_session, long_document):
+    """
+    Tests that 32 chunks are mapped in 11 groups (of at most 4, some ended by
+    content), reduced in 3 groups and then combined once, never exceeding
+    max_concurrency calls in flight.
+    """
+    start = time.perf_counter()
+    summary = asyncio.run(arun_summarization_workflow(async_client, db_session, _params(long_document.id)))
+    elapsed = time.perf_counter() - start
+
+    prompts = [call["messages"][0]["content"] for call in completions.calls]
+    assert prompts == [SYSTEM_PROMPT] * 11 + [REDUCE_PROMPT] * 3 + [REDUCE_PROMPT]
+    assert summary.startswith("resumo 15")
+    assert completions.peak == 4
+    # Map level (11 calls, 4 at a time) + one reduce level + final call.
+    assert elapsed < LLM_LATENCY * 7
+
+
+def test_hierarchical_keeps_document_order(async_client, completions, db_session, long_document):
+    """
+    Tests that each map call receives consecutive chunks in document order.
+    """
+    asyncio.run(arun_summarization_workflow(async_client, db_session, _params(long_document.id)))
+
+    first_group = completions.calls[0]["messages"][1]["content"].split("\n\n")
+    assert [part[:3] for part in first_group] == ["000", "001", "002", "003"]
+
+
+def test_hierarchical_respects_max_depth(async_client, completions, db_session, long_document):
+    """
+    Tests that the tree stops after max_depth levels and combines what is left.
+    """
+    asyncio.run(arun_summarization_workflow(async_client, db_session, _params(long_document.id, max_depth=1)))
+
+    assert len(completions.calls) == 12
+    assert len(completions.calls[-1]["messages"][1]["content"].split("\n\n")) == 11
+
+
+def test_hierarchical_short_document_uses_single_call(async_client, completions, db_session, long_document):
+    """
+    Tests that a document that already fits is summarized in one call.
+    """
+    asyncio.run(arun_summarization_workflow(
+        async_client, db_session, _params(long_document.id, max_input_chars=100_000)
+    ))
+
+    assert len(completions.calls) == 1
+    assert completions.calls[0]["messages"][0]["content"] == SYSTEM_PROMPT
+
+
+def test_sync_hierarchical_matches_async_plan(sync_client, completions, db_session, long_document):
+    """
+    Tests that the sync workflow runs the same tree on its thread pool.
+    """
+    summary = run_summarization_workflow(sync_client, db_session, _params(long_document.id))
+
+    assert len(completions.calls) == 15
+    assert completions.peak <= 4
+    assert summary.startswith("resumo 15")
@@ -0,0 +1,183 @@
+"""
+Unit tests for the ingest workflow and upload deduplication.
+"""
+
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+import fitz
+import pytest
+from sqlalchemy import func
+
+from src.academic_agent.database import models
+from src.academic_agent.llm.embeddings import HashingEmbedder
+from src.academic_agent.utils.file_parser import read_and_hash
+from src.academic_agent.workflows.ingest_workflow import (
+    BatchFile,
+    get_parse_executor,
+    run_batch_ingest_workflow,
+    run_ingest_workflow,
+    shutdown_parse_executor,
+)
+
+
+@pytest.fixture
+def pdf_bytes():
+    with fitz.open() as doc:
+        for i in range(5):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Capítulo {i}\n\nConteúdo do capítulo {i}.")
+        return doc.tobytes()
+
+
+def _count(db, model):
+    return db.query(func.count(model.id)).scalar()
+
+
+def _ingest(db, data, title="tese.pdf"):
+    source, digest = read_and_hash(io.BytesIO(data), spool_threshold=len(data))
+    return run_ingest_workflow(
+        db, source, title=title, content_hash=digest, embedder=HashingEmbedder(dimensions=32), max_tokens=8
+    )
+
+
+def test_ingest_stores_the_document_with_its_hash(db_session, pdf_bytes):
+    """
+    Tests that a new upload is parsed, chunked and stored with its SHA-256 digest.
+    """
+    document, created = _ingest(db_session, pdf_bytes)
+
+    assert created
+    assert document.content_hash == hashlib.sha256(pdf_bytes).hexdigest()
+    assert "Capítulo 4" in document.content
+    assert len(document.chunks) > 1
+    assert all(chunk.embedding is not None for chunk in document.chunks)
+
+
+def test_duplicate_upload_costs_only_the_hash(db_session, pdf_bytes):
+    """
+    Tests that uploading the same file again returns the stored document,
+    chunks included, without parsing, embedding or inserting anything.
+    """
+    first, _ = _ingest(db_session, pdf_bytes)
+    counts = (_count(db_session, models.Document), _count(db_session, models.TextChunk))
+
+    with patch.object(fitz, "open", side_effect=AssertionError("parsed again")), \
+            patch.object(HashingEmbedder, "embed", side_effect=AssertionError("embedded again")):
+        second, created = _ingest(db_session, pdf_bytes, title="copia.pdf")
+
+    assert not created
+    assert second.id == first.id and second.title == "tese.pdf"
+    assert [chunk.id for chunk in second.chunks] == [chunk.id for chunk in first.chunks]
+    assert (_count(db_session, models.Document), _count(db_session, models.TextChunk)) == counts
+
+
+def test_different_files_are_stored_separately(db_session, pdf_bytes):
+    """
+    Tests that a single changed byte makes a new document.
+    """
+    first, _ = _ingest(db_session, pdf_bytes)
+    second, created = _ingest(db_session, pdf_bytes + b"\n")
+
+    assert created and second.id != first.id
+
+
+def test_concurrent_duplicate_returns_the_winner(db_session, pdf_bytes):
+    """
+    Tests that losing the race on the unique hash returns the document stored first.
+    """
+    first, _ = _ingest(db_session, pdf_bytes)
+
+    # Simulate the duplicate check running before the other upload committed.
+    with patch("src.academic_agent.workflows.ingest_workflow.crud.get_document_by_hash",
+               side_effect=[None, first]):
+        second, created = _ingest(db_session, pdf_bytes)
+
+    assert not created and second.id == first.id
+    assert _count(db_session, models.Document) == 1
+
+
+def _pdf(text):
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), text)
+        return doc.tobytes()
+
+
+def _batch_file(name, data):
+    return BatchFile(name, data, hashlib.sha256(data).hexdigest())
+
+
+def test_batch_reports_each_file(db_session, pdf_bytes):
+    """
+    Tests that a batch stores new files, reuses stored and repeated ones and
+    reports unparseable files without failing the others.
+    """
+    stored, _ = _ingest(db_session, pdf_bytes)
+    new = _pdf("Uma tese nova.")
+    files = [
+        _batch_file("antiga.pdf", pdf_bytes),
+        _batch_file("nova.pdf", new),
+        _batch_file("quebrada.pdf", b"%PDF-1.4 truncated"),
+        _batch_file("nova-copia.pdf", new),
+    ]
+
+    results = run_batch_ingest_workflow(db_session, files, embedder=HashingEmbedder(dimensions=32), max_tokens=8)
+
+    assert [r.filename for r in results] == ["antiga.pdf", "nova.pdf", "quebrada.pdf", "nova-copia.pdf"]
+    assert [r.status for r in results] == ["existing", "created", "failed", "existing"]
+    assert results[0].document_id == stored.id
+    assert results[3].document_id == results[1].document_id
+    assert results[1].chunk_count == _count(db_session, models.TextChunk) - len(stored.chunks)
+    assert results[2].error
+    assert _count(db_session, models.Document) == 2
+
+
+def test_batch_parses_on_a_process_pool(db_session):
+    """
+    Tests that files parsed in worker processes are stored like the ones parsed in-thread.
+    """
+    files = [_batch_file(f"tese-{i}.pdf", _pdf(f"Tese número {i}.")) for i in range(4)]
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        results = run_batch_ingest_workflow(db_session, files, executor=executor)
+
+    assert [r.status for r in results] == ["created"] * 4
+    documents = {d.id: d for d in db_session.query(models.Document)}
+    assert all(f"Tese número {i}." in documents[r.document_id].content for i, r in enumerate(results))
+
+
+def test_batch_replaces_a_broken_parse_pool(db_session, monkeypatch):
+    """
+    Tests that a shared pool broken by a dead worker is replaced instead of failing every later batch.
+    """
+    monkeypatch.setenv("INGEST_PARSE_WORKERS", "1")
+    try:
+        broken = get_parse_executor()
+        with pytest.raises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result()
+
+        results = run_batch_ingest_workflow(db_session, [_batch_file("tese.pdf", _pdf("Tese."))], executor=broken)
+
+        assert [r.status for r in results] == ["created"]
+        assert get_parse_executor() not in (None, broken)
+    finally:
+        shutdown_parse_executor()
+
+
+def test_batch_fallback_reports_a_second_collision_as_existing(db_session, pdf_bytes):
+    """
+    Tests that a file stored by another upload during the per-file fallback is reported as existing.
+    """
+    first, _ = _ingest(db_session, pdf_bytes)
+
+    # Both lookups miss the other upload's document; the inserts then hit the unique hash.
+    with patch("src.academic_agent.workflows.ingest_workflow.crud.get_document_by_hash",
+               side_effect=[None, None, first]):
+        results = run_batch_ingest_workflow(db_session, [_batch_file("tese.pdf", pdf_bytes)])
+
+    assert [(r.status, r.document_id) for r in results] == [("existing", first.id)]
+    assert _count(db_session, models.Document) == 1
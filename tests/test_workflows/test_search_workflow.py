@@ -0,0 +1,125 @@
+"""
+Unit tests for the semantic search workflow.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.academic_agent.database import crud
+from src.academic_agent.llm.embeddings import HashingEmbedder
+from src.academic_agent.search.vector_index import get_vector_index, pack_vector, reset_vector_indexes
+from src.academic_agent.validation import schemas
+from src.academic_agent.workflows.search_workflow import (
+    arun_keyword_search_workflow,
+    arun_search_workflow,
+    index_document,
+    run_keyword_search_workflow,
+    run_search_workflow,
+)
+
+TEXTS = [
+    "A metodologia adotada foi a pesquisa qualitativa com entrevistas.",
+    "Os resultados indicam aumento da produtividade agrícola no cerrado.",
+    "A revisão de literatura aborda normas da ABNT para citações.",
+]
+
+
+@pytest.fixture
+def embedder():
+    reset_vector_indexes()
+    yield HashingEmbedder(dimensions=128)
+    reset_vector_indexes()
+
+
+def _ingest(db, embedder, texts, title="Artigo"):
+    vectors = embedder.embed(texts)
+    chunks = [
+        schemas.TextChunkCreate(content=text, embedding=pack_vector(vector), page_start=i + 1, page_end=i + 1)
+        for i, (text, vector) in enumerate(zip(texts, vectors))
+    ]
+    return crud.create_document_with_chunks(db, schemas.DocumentCreate(title=title, content="\n\n".join(texts)), chunks)
+
+
+def test_search_returns_the_most_similar_chunk(db_session, embedder):
+    """
+    Tests that the chunk sharing the query's words ranks first, with its page.
+    """
+    document = _ingest(db_session, embedder, TEXTS)
+
+    results = run_search_workflow(embedder, db_session, schemas.SearchParams(query="normas da ABNT", top_k=2))
+
+    assert len(results) == 2
+    assert results[0].content == TEXTS[2]
+    assert results[0].document_id == document.id
+    assert results[0].page_start == 3
+    assert results[0].score >= results[1].score
+
+
+def test_new_documents_are_indexed_incrementally(db_session, embedder):
+    """
+    Tests that chunks ingested after the index was loaded are found without a reload.
+    """
+    _ingest(db_session, embedder, TEXTS)
+    run_search_workflow(embedder, db_session, schemas.SearchParams(query="metodologia"))
+    index = get_vector_index(embedder.model_name, embedder.dimensions)
+    assert len(index) == 3
+
+    document = _ingest(db_session, embedder, ["Fotossíntese em plantas C4 e C3."], title="Biologia")
+    assert index_document(embedder, db_session, document.id) == 1
+
+    results = asyncio.run(
+        arun_search_workflow(embedder, db_session, schemas.SearchParams(query="fotossíntese plantas", top_k=1))
+    )
+    assert [result.document_id for result in results] == [document.id]
+
+
+def test_documents_stored_during_the_load_are_indexed(db_session, embedder):
+    """
+    Tests that a document indexed while the index is loading waits for the
+    load instead of being skipped, when the load read the chunks before it.
+    """
+    index = get_vector_index(embedder.model_name, embedder.dimensions)
+    load_started, release_load = threading.Event(), threading.Event()
+
+    def slow_load():
+        load_started.set()
+        release_load.wait(5)
+        return []  # Read before the document below was committed
+
+    loader = threading.Thread(target=index.ensure_loaded, args=(slow_load,))
+    loader.start()
+    load_started.wait(5)
+    document = _ingest(db_session, embedder, TEXTS)
+    threading.Timer(0.1, release_load.set).start()
+
+    assert index_document(embedder, db_session, document.id) == 3
+    loader.join(5)
+    assert len(index) == 3
+
+
+def test_chunks_without_embeddings_are_not_searched(db_session, embedder):
+    """
+    Tests that documents ingested with embeddings disabled are simply skipped.
+    """
+    crud.create_document_with_chunks(
+        db_session, schemas.DocumentCreate(title="Sem vetores", content="x"), [schemas.TextChunkCreate(content="x")]
+    )
+
+    assert run_search_workflow(embedder, db_session, schemas.SearchParams(query="x")) == []
+
+
+def test_keyword_search_pages_report_has_more(db_session, embedder):
+    """
+    Tests that keyword search pages through the hits and flags the last page.
+    """
+    _ingest(db_session, embedder, TEXTS + ["Mais normas da ABNT para referências."])
+
+    first = run_keyword_search_workflow(db_session, schemas.KeywordSearchParams(query="ABNT", limit=1))
+    last = asyncio.run(
+        arun_keyword_search_workflow(db_session, schemas.KeywordSearchParams(query="ABNT", limit=1, offset=1))
+    )
+
+    assert first.has_more and not last.has_more
+    assert first.results[0].chunk_id != last.results[0].chunk_id
@@ -0,0 +1,214 @@
+"""
+Unit tests for the stored summaries and ABNT outputs.
+"""
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import func
+
+from src.academic_agent.database import crud, models
+from src.academic_agent.validation import schemas
+from src.academic_agent.workflows.abnt_workflow import arun_abnt_workflow, run_abnt_workflow
+from src.academic_agent.workflows.summarization_workflow import (
+    SYSTEM_PROMPT,
+    arun_summarization_workflow,
+    astream_summarization_workflow,
+    run_summarization_workflow,
+)
+
+
+class Completions:
+    """Fake `chat.completions` answering with a numbered text per call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _response(self, kwargs):
+        self.calls.append(kwargs)
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = f"resumo {len(self.calls):02d} " + "y" * 100
+        return response
+
+    def create(self, **kwargs):
+        return self._response(kwargs)
+
+    async def acreate(self, **kwargs):
+        return self._response(kwargs)
+
+
+@pytest.fixture
+def completions():
+    return Completions()
+
+
+@pytest.fixture
+def sync_client(completions):
+    client = MagicMock()
+    client.chat.completions.create = completions.create
+    return client
+
+
+@pytest.fixture
+def async_client(completions):
+    client = MagicMock()
+    client.chat.completions.create = completions.acreate
+    return client
+
+
+def _store(db, chunk_texts, title="Tese"):
+    chunks = [schemas.TextChunkCreate(content=text) for text in chunk_texts]
+    return crud.create_document_with_chunks(db, schemas.DocumentCreate(title=title, content="..."), chunks)
+
+
+def _chunks(edited=None, inserted=None):
+    texts = [f"{i:03d}" + "x" * 97 for i in range(32)]
+    if edited is not None:
+        texts[edited] = f"{edited:03d}" + "z" * 97
+    if inserted is not None:
+        texts.insert(inserted, "new" + "q" * 97)
+    return texts
+
+
+def _params(document_id, **overrides):
+    values = dict(document_id=document_id, mode="hierarchical", fan_out=4, max_concurrency=4, max_input_chars=450)
+    values.update(overrides)
+    return schemas.SummarizationWorkflowParams(**values)
+
+
+def _map_calls(completions):
+    return [call for call in completions.calls if call["messages"][0]["content"] == SYSTEM_PROMPT]
+
+
+def test_summary_is_stored_and_reused(sync_client, completions, db_session):
+    """
+    Tests that a second request for the same summary makes no LLM call.
+    """
+    document = _store(db_session, _chunks())
+
+    first = run_summarization_workflow(sync_client, db_session, _params(document.id))
+    calls = len(completions.calls)
+    second = run_summarization_workflow(sync_client, db_session, _params(document.id))
+
+    assert second == first
+    assert len(completions.calls) == calls
+    assert db_session.query(func.count(models.DocumentSummary.id)).scalar() == 1
+
+
+def test_summary_is_keyed_by_prompt_version(sync_client, completions, db_session):
+    """
+    Tests that changing a parameter that shapes the summary generates a new one,
+    reusing the stored partial summaries of the unchanged first level.
+    """
+    document = _store(db_session, _chunks())
+    run_summarization_workflow(sync_client, db_session, _params(document.id))
+    calls = len(completions.calls)
+
+    run_summarization_workflow(sync_client, db_session, _params(document.id, max_depth=1))
+
+    assert len(completions.calls) == calls + 1  # Only the final combine
+    assert db_session.query(func.count(models.DocumentSummary.id)).scalar() == 2
+
+
+def test_edited_document_only_resummarizes_changed_chunks(async_client, completions, db_session):
+    """
+    Tests that re-ingesting a document with one edited chunk summarizes only
+    that chunk's group before the final combine.
+    """
+    original = _store(db_session, _chunks())
+    asyncio.run(arun_summarization_workflow(async_client, db_session, _params(original.id)))
+    assert len(_map_calls(completions)) == 11  # 32 chunks in groups of at most 4, some ended by content
+
+    edited = _store(db_session, _chunks(edited=5), title="Tese v2")
+    completions.calls.clear()
+    asyncio.run(arun_summarization_workflow(async_client, db_session, _params(edited.id)))
+
+    map_calls = _map_calls(completions)
+    assert len(map_calls) == 1
+    assert "005zzz" in map_calls[0]["messages"][1]["content"]
+    assert len(completions.calls) == 1 + 3 + 1  # One map, the reduce level, the final combine
+
+
+def test_inserted_chunk_does_not_shift_the_following_groups(sync_client, completions, db_session):
+    """
+    Tests that adding a chunk only summarizes its own group again, since the
+    first-level groups end at chunks picked by content rather than by position.
+    """
+    original = _store(db_session, _chunks())
+    run_summarization_workflow(sync_client, db_session, _params(original.id))
+
+    inserted = _store(db_session, _chunks(inserted=5), title="Tese v2")
+    completions.calls.clear()
+    run_summarization_workflow(sync_client, db_session, _params(inserted.id))
+
+    map_calls = _map_calls(completions)
+    assert len(map_calls) == 1
+    assert "newqqq" in map_calls[0]["messages"][1]["content"]
+
+
+def test_stale_summary_is_regenerated(sync_client, completions, db_session):
+    """
+    Tests that a stored summary whose input hash no longer matches is replaced.
+    """
+    document = _store(db_session, _chunks())
+    first = run_summarization_workflow(sync_client, db_session, _params(document.id))
+    db_session.query(models.DocumentSummary).update({"input_hash": "0" * 64})
+    db_session.commit()
+
+    second = run_summarization_workflow(sync_client, db_session, _params(document.id))
+
+    assert second != first
+    stored = db_session.query(models.DocumentSummary).one()
+    assert stored.summary == second and stored.input_hash != "0" * 64
+
+
+def test_use_cache_false_forces_a_new_summary(sync_client, completions, db_session):
+    """
+    Tests that use_cache=False ignores the stored results but replaces them,
+    partial summaries included.
+    """
+    document = _store(db_session, _chunks())
+    run_summarization_workflow(sync_client, db_session, _params(document.id))
+    calls = len(completions.calls)
+    partials = {row.content_hash: row.summary for row in db_session.query(models.ChunkSummary)}
+
+    fresh = run_summarization_workflow(sync_client, db_session, _params(document.id, use_cache=False))
+
+    assert len(completions.calls) == calls * 2
+    assert db_session.query(models.DocumentSummary).one().summary == fresh
+    db_session.expire_all()
+    refreshed = {row.content_hash: row.summary for row in db_session.query(models.ChunkSummary)}
+    assert refreshed.keys() == partials.keys()
+    assert all(refreshed[key] != partials[key] for key in partials)
+
+
+def test_stored_summary_is_streamed_at_once(sync_client, async_client, completions, db_session):
+    """
+    Tests that a stored summary is streamed as a single delta.
+    """
+    document = _store(db_session, _chunks())
+    summary = run_summarization_workflow(sync_client, db_session, _params(document.id))
+    calls = len(completions.calls)
+
+    async def collect():
+        return [delta async for delta in astream_summarization_workflow(async_client, db_session, _params(document.id))]
+
+    assert asyncio.run(collect()) == [summary]
+    assert len(completions.calls) == calls
+
+
+@patch("src.academic_agent.workflows.abnt_workflow.read_text_from_file", return_value="Texto a formatar.")
+def test_abnt_output_is_stored_and_reused(mock_read_file, sync_client, async_client, completions, db_session):
+    """
+    Tests that formatting the same text again returns the stored output.
+    """
+    params = schemas.ABNTWorkflowParams(file_path="tese.pdf")
+
+    formatted = run_abnt_workflow(sync_client, params, db=db_session)
+    again = asyncio.run(arun_abnt_workflow(async_client, params, db=db_session))
+
+    assert again == formatted
+    assert len(completions.calls) == 1
+    assert db_session.query(models.ABNTOutput).one().formatted_text == formatted
@@ -0,0 +1,218 @@
+"""
+Unit tests for the streaming completion helpers and workflows.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.academic_agent.database import crud
+from src.academic_agent.llm import cache as cache_module
+from src.academic_agent.llm.cache import LLMResponseCache
+from src.academic_agent.llm.completions import astream_completion, astrip_stream
+from src.academic_agent.validation import schemas
+from src.academic_agent.workflows.abnt_workflow import arun_abnt_workflow, astream_abnt_workflow
+from src.academic_agent.workflows.summarization_workflow import (
+    arun_summarization_workflow,
+    astream_summarization_workflow,
+)
+
+DELTA_LATENCY = 0.01
+
+PARAGRAPHS = [f"Parágrafo {i}. " + "texto " * 22 for i in range(8)]
+LONG_TEXT = "\n\n".join(PARAGRAPHS)
+
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeStream:
+    """An async iterator of completion chunks, like `openai.AsyncStream`."""
+
+    def __init__(self, pieces, fail_after=None):
+        self.pieces = pieces
+        self.fail_after = fail_after
+        self.closed = False
+
+    async def __aiter__(self):
+        for n, piece in enumerate(self.pieces):
+            if n == self.fail_after:
+                raise RuntimeError("connection reset")
+            await asyncio.sleep(DELTA_LATENCY)
+            yield _chunk(piece)
+        yield SimpleNamespace(choices=[])  # e.g. the final usage chunk
+
+    async def close(self):
+        self.closed = True
+
+
+class StreamingCompletions:
+    """
+    Answers with the upper-cased user message (or after "Trecho a formatar:"),
+    split into words, streamed or not depending on `stream`.
+    """
+
+    def __init__(self, padding="", fail=None):
+        self.padding = padding
+        self.fail = dict(fail or {})  # marker -> index of the delta at which to fail (once)
+        self.calls = []
+        self.streams = []
+
+    async def create(self, stream=False, **kwargs):
+        self.calls.append(kwargs)
+        text = kwargs["messages"][1]["content"].split("Trecho a formatar:\n", 1)[-1]
+        answer = self.padding + text.upper() + self.padding
+        if not stream:
+            await asyncio.sleep(DELTA_LATENCY)
+            response = MagicMock()
+            response.choices = [MagicMock()]
+            response.choices[0].message.content = answer
+            return response
+        fail_after = next((self.fail.pop(m) for m in list(self.fail) if m in text), None)
+        pieces = [piece + " " for piece in answer.split(" ")]
+        pieces[-1] = pieces[-1][:-1]
+        self.streams.append(FakeStream(pieces, fail_after))
+        return self.streams[-1]
+
+
+def _client(completions):
+    client = MagicMock()
+    client.chat.completions.create = completions.create
+    return client
+
+
+async def _collect(deltas):
+    return [delta async for delta in deltas]
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    response_cache = LLMResponseCache(path=str(tmp_path / "cache.db"))
+    cache_module.set_response_cache(response_cache)
+    yield response_cache
+    cache_module.set_response_cache(None)
+    response_cache.close()
+
+
+def _request(text="um dois três"):
+    return {"model": "m", "messages": [{"role": "system", "content": "s"}, {"role": "user", "content": text}]}
+
+
+def test_stream_yields_deltas_and_caches_the_final_text(response_cache, monkeypatch):
+    """
+    Tests that deltas are forwarded one by one and the joined text is cached.
+    """
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "true")
+    completions = StreamingCompletions()
+
+    first = asyncio.run(_collect(astream_completion(_client(completions), _request())))
+    second = asyncio.run(_collect(astream_completion(_client(completions), _request())))
+
+    assert first == ["UM ", "DOIS ", "TRÊS"]
+    assert second == ["UM DOIS TRÊS"]
+    assert len(completions.calls) == 1
+    assert completions.streams[0].closed
+
+
+def test_abandoned_stream_is_closed_and_not_cached(response_cache, monkeypatch):
+    """
+    Tests that a consumer stopping early closes the stream and caches nothing.
+    """
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "true")
+    completions = StreamingCompletions()
+
+    async def read_one():
+        deltas = astream_completion(_client(completions), _request())
+        first = await deltas.__anext__()
+        await deltas.aclose()
+        return first
+
+    assert asyncio.run(read_one()) == "UM "
+    assert completions.streams[0].closed
+    assert response_cache.get(LLMResponseCache.key_for_request(_request())) is None
+
+
+def test_strip_stream_matches_str_strip():
+    """
+    Tests that stripping a stream gives the same text as stripping the joined deltas.
+    """
+    async def deltas(pieces):
+        for piece in pieces:
+            yield piece
+
+    for pieces in (["  ", "\n a", "b  ", " ", "c \n", " "], ["x"], [" ", " "], ["a ", " b"]):
+        stripped = asyncio.run(_collect(astrip_stream(deltas(pieces))))
+        assert "".join(stripped) == "".join(pieces).strip()
+        assert all(stripped)
+
+
+def test_summary_stream_matches_the_summary_and_starts_early(db_session):
+    """
+    Tests that the streamed summary joins up to the regular one and that the
+    first words arrive well before the last.
+    """
+    document = crud.create_document(db_session, schemas.DocumentCreate(title="T", content=" ".join(["palavra"] * 20)))
+    params = schemas.SummarizationWorkflowParams(document_id=document.id)
+    completions = StreamingCompletions(padding="\n ")
+
+    async def timed():
+        start = time.perf_counter()
+        first_at, deltas = None, []
+        async for delta in astream_summarization_workflow(_client(completions), db_session, params):
+            first_at = first_at or time.perf_counter() - start
+            deltas.append(delta)
+        return first_at, time.perf_counter() - start, deltas
+
+    first_at, total, deltas = asyncio.run(timed())
+    summary = asyncio.run(arun_summarization_workflow(_client(completions), db_session, params))
+
+    assert "".join(deltas) == summary
+    assert len(deltas) == 20
+    assert first_at < total / 5
+
+
+def test_summary_stream_of_missing_document_raises(db_session):
+    """
+    Tests that a missing document fails before anything is streamed.
+    """
+    params = schemas.SummarizationWorkflowParams(document_id=999)
+
+    with pytest.raises(ValueError, match="not found"):
+        asyncio.run(_collect(astream_summarization_workflow(_client(StreamingCompletions()), db_session, params)))
+
+
+@patch('src.academic_agent.workflows.abnt_workflow.read_text_from_file', return_value=LONG_TEXT)
+def test_abnt_stream_matches_the_formatted_text(mock_read_file):
+    """
+    Tests that segments stream in document order and join up to the
+    non-streaming result, with all segments requested concurrently.
+    """
+    params = schemas.ABNTWorkflowParams(file_path="/fake/tese.pdf", segment_chars=320, overlap_chars=50)
+    completions = StreamingCompletions(padding=" \n")
+
+    start = time.perf_counter()
+    streamed = "".join(asyncio.run(_collect(astream_abnt_workflow(_client(completions), params))))
+    elapsed = time.perf_counter() - start
+
+    assert streamed == asyncio.run(arun_abnt_workflow(_client(completions), params))
+    # Four segments of ~50 words each, streamed concurrently rather than one after another.
+    assert elapsed < DELTA_LATENCY * 50 * 2
+
+
+@patch('src.academic_agent.workflows.abnt_workflow.read_text_from_file', return_value=LONG_TEXT)
+def test_abnt_stream_error_names_the_segment_and_is_not_retried(mock_read_file):
+    """
+    Tests that a segment failing mid-stream, before or after its first delta,
+    ends the stream with an error naming the segment, without a second call.
+    """
+    params = schemas.ABNTWorkflowParams(file_path="/fake/tese.pdf", segment_chars=320, overlap_chars=50)
+
+    for fail_after in (0, 3):
+        broken = StreamingCompletions(fail={"Parágrafo 4.": fail_after})
+        with pytest.raises(ValueError, match="segment 3 of 4"):
+            asyncio.run(_collect(astream_abnt_workflow(_client(broken), params)))
+        assert sum("Parágrafo 4." in call["messages"][1]["content"] for call in broken.calls) == 1
@@ -1,7 +1,15 @@
+import asyncio
+import time
+
 import pytest
 from unittest.mock import MagicMock
 from openai import OpenAI
-from src.academic_agent.workflows.writing_workflow import run_writing_workflow
+from src.academic_agent.workflows.writing_workflow import (
+    OUTLINE_PROMPT,
+    REVISION_PROMPT,
+    arun_writing_workflow,
+    run_writing_workflow,
+)
 
 @pytest.fixture
 def mock_openai_client():
@@ -25,6 +33,17 @@ def test_run_writing_workflow_success(mock_openai_client):
     assert result == "Texto gerado com sucesso."
     mock_openai_client.chat.completions.create.assert_called_once()
 
+def test_run_writing_workflow_uses_model_name(mock_openai_client):
+    """
+    Testa se o modo padrão usa o modelo pedido em 'model_name', como o modo long_form.
+    """
+    mock_openai_client.chat.completions.create.return_value.choices[0].message.content = "Texto."
+
+    run_writing_workflow(mock_openai_client, {"prompt": "Um prompt", "model_name": "gpt-4.1-mini"})
+
+    _, call_kwargs = mock_openai_client.chat.completions.create.call_args
+    assert call_kwargs["model"] == "gpt-4.1-mini"
+
 def test_run_writing_workflow_no_prompt(mock_openai_client):
     """
     Testa se um ValueError é levantado quando nenhum prompt é fornecido.
@@ -42,4 +61,119 @@ def test_run_writing_workflow_api_error(mock_openai_client):
     params = {"prompt": "Um prompt que causará erro"}
     result = run_writing_workflow(mock_openai_client, params)
 
-    assert result == "Não foi possível gerar o texto devido a um erro no workflow." 
\ No newline at end of file
+    assert result == "Não foi possível gerar o texto devido a um erro no workflow."
+
+
+class LongFormClient:
+    """Cliente simulado que responde ao roteiro, às seções e às revisões do modo long_form."""
+
+    def __init__(self, delay=0.0, fail_revision_of=None):
+        self.delay = delay
+        self.fail_revision_of = fail_revision_of
+        self.calls = []
+
+    def _answer(self, kwargs):
+        self.calls.append(kwargs)
+        system, user = kwargs["messages"][0]["content"], kwargs["messages"][1]["content"]
+        if system == OUTLINE_PROMPT.format(sections=3):
+            return "1. Introdução: contexto\n2. **Método**: como\n3. Conclusão: fechamento"
+        section = user.split("Seção " if system == REVISION_PROMPT else "Escreva a seção ")[-1][0]
+        if system == REVISION_PROMPT:
+            if section == self.fail_revision_of:
+                raise RuntimeError("Falha na revisão")
+            return f"revisada {section}"
+        return f"rascunho {section}"
+
+    def _response(self, kwargs):
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = self._answer(kwargs)
+        return response
+
+    def create(self, **kwargs):
+        time.sleep(self.delay)
+        return self._response(kwargs)
+
+    async def acreate(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._response(kwargs)
+
+
+def _client(fake, asynchronous=False):
+    client = MagicMock()
+    client.chat.completions.create = fake.acreate if asynchronous else fake.create
+    return client
+
+
+def test_long_form_writes_outline_sections_and_revisions():
+    """
+    Testa o modo long_form: roteiro, seções com o roteiro como contexto e revisão de cada seção.
+    """
+    fake = LongFormClient()
+    result = run_writing_workflow(_client(fake), {"prompt": "Um ensaio", "mode": "long_form", "sections": 3})
+
+    assert result == (
+        "## Introdução\n\nrevisada 1\n\n## Método\n\nrevisada 2\n\n## Conclusão\n\nrevisada 3"
+    )
+    assert len(fake.calls) == 1 + 3 + 3
+    section_request = fake.calls[1]["messages"][1]["content"]
+    assert "Um ensaio" in section_request and "3. Conclusão: fechamento" in section_request
+    revision_request = fake.calls[-1]["messages"][1]["content"]
+    assert "rascunho" in revision_request  # Vê as seções vizinhas
+
+
+def test_long_form_keeps_draft_when_revision_fails(caplog):
+    """
+    Testa se uma seção cuja revisão falha mantém o rascunho, sem derrubar o texto, e registra a falha no log.
+    """
+    fake = LongFormClient(fail_revision_of="2")
+    result = run_writing_workflow(
+        _client(fake), {"prompt": "Um ensaio", "mode": "long_form", "sections": 3}
+    )
+
+    assert "rascunho 2" in result and "revisada 1" in result and "revisada 3" in result
+    assert "Falha ao revisar a seção 2; mantendo o rascunho: Falha na revisão" in caplog.text
+
+
+def test_long_form_without_consistency_pass():
+    """
+    Testa se consistency_pass=False junta os rascunhos sem revisá-los.
+    """
+    fake = LongFormClient()
+    result = run_writing_workflow(
+        _client(fake), {"prompt": "Um ensaio", "mode": "long_form", "sections": 3, "consistency_pass": False}
+    )
+
+    assert "rascunho 3" in result and "revisada" not in result
+    assert len(fake.calls) == 1 + 3
+
+
+def test_long_form_latency_does_not_grow_with_sections():
+    """
+    Testa se as seções e as revisões são geradas em paralelo: o tempo total é de
+    três chamadas (roteiro, seção e revisão), e não cresce com o número de seções.
+    """
+    fake = LongFormClient(delay=0.1)
+    params = {"prompt": "Um ensaio", "mode": "long_form", "sections": 3}
+
+    start = time.perf_counter()
+    result = asyncio.run(arun_writing_workflow(_client(fake, asynchronous=True), params))
+    elapsed = time.perf_counter() - start
+
+    assert "revisada 3" in result
+    assert elapsed < 0.5
+
+    start = time.perf_counter()
+    run_writing_workflow(_client(LongFormClient(delay=0.1)), params)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_long_form_outline_failure_returns_error_message(mock_openai_client):
+    """
+    Testa se uma falha ao gerar o roteiro devolve a mensagem de erro do workflow.
+    """
+    mock_openai_client.chat.completions.create.side_effect = Exception("Falha na API")
+
+    result = run_writing_workflow(mock_openai_client, {"prompt": "Um ensaio", "mode": "long_form"})
+
+    assert result == "Não foi possível gerar o texto devido a um erro no workflow."